@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_cors import CORS
+import hmac
+import os
 import sys
 import time
 from pathlib import Path
@@ -7,47 +9,148 @@ from pathlib import Path
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.main.scoring_and_retrieval import VarmaRetriever, compute_confidence
+from src.main.scoring_and_retrieval import compute_confidence
+from src.main.cascade import CascadePolicy
+from src.main.registry import RetrieverRegistry, SYMPTOM_DATASET, default_registry
 from src.main.lexical_matching import _normalize_text
+from src.main.varma_metadata import CONTRAINDICATIONS, TREATMENT_METHODS, VarmaMetadataTable, metadata_table
+from src.main.varma_catalog import MAX_PAGE_SIZE, catalog_for
+from src.main.symptom_suggest import MAX_SUGGESTIONS, suggester_for
+from process_memory import memory_usage
+from varma_knowledge import current_store
+from response_utils import (
+    dumps, encode_event, etag_matches, install_compression, json_response, not_modified_response, parse_bool,
+    parse_fields, shape_symptom_search_response, stream_response, wants_event_stream
+)
 from difflib import SequenceMatcher
 
-app = Flask(__name__)
-CORS(app)
-
-# Initialize retriever once at startup
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data" / "processed" / "intermediate_outputs"
 VARMA_SYMPTOMS_JSON = DATA_DIR / "02_varma_to_symptom.json"
 SYMPTOM_TO_VARMA_JSON = DATA_DIR / "02_symptom_to_varma.json"
+SNAPSHOT_PATH = Path(os.environ.get("VARMA_SNAPSHOT", DATA_DIR.parent / "varma_retriever.snapshot"))
+
+search_bp = Blueprint('search', __name__)
+
+
+def create_app(registry: RetrieverRegistry = None, dataset: str = SYMPTOM_DATASET, eager: bool = True) -> Flask:
+    """
+    Build the backend app. The symptom-search routes and the RAG Blueprint
+    read their retriever from one registry, so a process holds a single
+    PubMedBERT copy and embedding matrix per dataset.
+    """
+    from src.rag.api_routes import rag_bp
 
-print("\n" + "="*80)
-print("INITIALIZING VARMA RETRIEVAL SYSTEM")
-print("="*80)
+    app = Flask(__name__)
+    CORS(app)
+    install_compression(app)
 
-try:
-    retriever = VarmaRetriever(
+    if registry is None:
+        registry = default_registry()
+    registry.register_dataset(
+        dataset,
         varma_symptoms_path=VARMA_SYMPTOMS_JSON,
-        symptom_to_varma_path=SYMPTOM_TO_VARMA_JSON
+        symptom_to_varma_path=SYMPTOM_TO_VARMA_JSON,
+        snapshot_path=SNAPSHOT_PATH,
+        replace=True,
+        store=current_store,
+        parallel_stages=os.environ.get("VARMA_PARALLEL_STAGES", "0") == "1",
+        cascade=CascadePolicy.from_env()
     )
-    print("\n✓ Retriever initialized successfully!")
-except FileNotFoundError as fnf_error:
-    print(f"\n✗ CRITICAL: Missing data file! {fnf_error}")
-    print(f"Ensure that '{VARMA_SYMPTOMS_JSON}' and '{SYMPTOM_TO_VARMA_JSON}' exist.")
-    retriever = None
-except Exception as e:
-    print(f"\n✗ Failed to initialize retriever: {e}")
-    retriever = None
+    app.extensions['varma_registry'] = registry
+    app.config['VARMA_DATASET'] = dataset
+
+    app.register_blueprint(search_bp)
+    app.register_blueprint(rag_bp)
+
+    if eager:
+        print("\n" + "="*80)
+        print("INITIALIZING VARMA RETRIEVAL SYSTEM")
+        print("="*80)
+        try:
+            retriever = registry.get(dataset)
+            metadata_table(retriever)
+            suggester_for(retriever)
+            print("\n✓ Retriever initialized successfully!")
+        except FileNotFoundError as fnf_error:
+            print(f"\n✗ CRITICAL: Missing data file! {fnf_error}")
+            print(f"Ensure that '{VARMA_SYMPTOMS_JSON}' and '{SYMPTOM_TO_VARMA_JSON}' exist.")
+        except Exception as e:
+            print(f"\n✗ Failed to initialize retriever: {e}")
+
+    return app
+
 
-@app.route('/api/health', methods=['GET'])
+def get_retriever():
+    """Shared retriever for the current app's dataset, or None if it cannot be built"""
+    registry = current_app.extensions['varma_registry']
+    try:
+        return registry.get(current_app.config['VARMA_DATASET'])
+    except Exception as e:
+        print(f"\n✗ Retriever unavailable: {e}")
+        return None
+
+
+@search_bp.route('/api/health', methods=['GET'])
 def health_check():
+    registry = current_app.extensions['varma_registry']
     return jsonify({
         "status": "healthy",
         "message": "Varma Intelligence Backend is running",
-        "retriever_loaded": retriever is not None
+        "retriever_loaded": registry.peek(current_app.config['VARMA_DATASET']) is not None
     })
 
-@app.route('/api/symptom-search', methods=['POST'])
+@search_bp.route('/api/metrics', methods=['GET'])
+def metrics():
+    retriever = get_retriever()
+    if retriever is None:
+        return jsonify({"error": "Retriever not initialized"}), 500
+    metrics = retriever.get_metrics()
+    metrics['process'] = {'pid': os.getpid(), 'memory': memory_usage()}
+    return jsonify(metrics), 200
+
+def admin_allowed() -> bool:
+    """
+    Admin calls need the VARMA_ADMIN_TOKEN secret as X-Admin-Token. Without
+    a token they are refused, unless VARMA_ADMIN_ALLOW_LOCAL=1 lets local
+    clients in (only safe when no proxy on this host forwards to the app).
+    """
+    token = os.environ.get("VARMA_ADMIN_TOKEN")
+    if token:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+    if os.environ.get("VARMA_ADMIN_ALLOW_LOCAL") == "1":
+        return request.remote_addr in ('127.0.0.1', '::1')
+    return False
+
+@search_bp.route('/api/admin/reload', methods=['POST'])
+def reload_dataset():
+    """
+    Rebuilds the dataset from the JSON files in the background and swaps it
+    in without dropping requests ({"wait": true} blocks until done).
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    registry = current_app.extensions['varma_registry']
+    dataset = current_app.config['VARMA_DATASET']
+    data = request.get_json(silent=True) or {}
+    wait = parse_bool(data.get('wait', request.args.get('wait', False)))
+    status = registry.reload(dataset, background=not wait)
+    if status.get('state') == 'failed':
+        return jsonify(status), 500
+    return jsonify(status), 200 if wait else 202
+
+@search_bp.route('/api/admin/reload/status', methods=['GET'])
+def reload_status():
+    """State of the last reload"""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    registry = current_app.extensions['varma_registry']
+    return jsonify(registry.reload_status(current_app.config['VARMA_DATASET'])), 200
+
+@search_bp.route('/api/symptom-search', methods=['POST'])
 def symptom_search():
+    retriever = get_retriever()
     if retriever is None:
         return jsonify({"error": "Retriever not initialized"}), 500
     
@@ -62,6 +165,12 @@ def symptom_search():
         if not symptom_query:
             return jsonify({"error": "Empty query"}), 400
         
+        latency_budget_ms = data.get('latency_budget_ms')
+        # Clients may ask for a subset of the Varma point fields and/or the
+        # compact form with symptom strings deduplicated into one table
+        fields = parse_fields(data.get('fields', request.args.get('fields')))
+        compact = parse_bool(data.get('compact', request.args.get('compact', False)))
+        
         print(f"\n{'='*80}")
         print(f"PROCESSING QUERY: '{symptom_query}'")
         print(f"{'='*80}")
@@ -76,18 +185,19 @@ def symptom_search():
             top_varmas=5,
             lexical_threshold=0.45,
             semantic_threshold=0.55,
-            verification_threshold=0.3
+            verification_threshold=0.3,
+            latency_budget_ms=float(latency_budget_ms) if latency_budget_ms else None
         )
         
         elapsed_time = time.perf_counter() - start_time
         
         # Format response for React UI
-        response = format_for_ui(result, symptom_query, elapsed_time)
+        response = format_for_ui(result, symptom_query, elapsed_time, metadata_table(retriever))
         
         print(f"\n✓ Query processed in {elapsed_time:.3f}s")
         print(f"✓ Found {len(response['varma_points'])} Varma points")
         
-        return jsonify(response), 200
+        return json_response(shape_symptom_search_response(response, fields=fields, compact=compact))
         
     except Exception as e:
         print(f"\n✗ Error processing query: {str(e)}")
@@ -95,14 +205,100 @@ def symptom_search():
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+@search_bp.route('/api/symptom-search/stream', methods=['POST'])
+def symptom_search_stream():
+    """
+    Progressive /api/symptom-search. Emits one event per pipeline stage:
+    'lexical' (first ranking, usually within milliseconds), 'semantic'
+    (refined symptom ranking, only when that stage ran) and 'final', whose
+    body is identical to the /api/symptom-search response.
+    
+    Chunked NDJSON by default; Server-Sent Events with Accept: text/event-stream
+    or ?format=sse. Accepts the same fields/compact options.
+    """
+    retriever = get_retriever()
+    if retriever is None:
+        return jsonify({"error": "Retriever not initialized"}), 500
+    
+    data = request.get_json(silent=True)
+    if not data or 'query' not in data:
+        return jsonify({"error": "No query provided"}), 400
+    
+    symptom_query = data['query'].strip()
+    if not symptom_query:
+        return jsonify({"error": "Empty query"}), 400
+    
+    latency_budget_ms = data.get('latency_budget_ms')
+    fields = parse_fields(data.get('fields', request.args.get('fields')))
+    compact = parse_bool(data.get('compact', request.args.get('compact', False)))
+    use_sse = wants_event_stream()
+    metadata = metadata_table(retriever)
+    
+    def events():
+        start_time = time.perf_counter()
+        try:
+            for stage, result in retriever.retrieve_stream(
+                query=symptom_query,
+                top_symptoms=15,
+                top_varmas=5,
+                lexical_threshold=0.45,
+                semantic_threshold=0.55,
+                verification_threshold=0.3,
+                latency_budget_ms=float(latency_budget_ms) if latency_budget_ms else None
+            ):
+                elapsed_time = time.perf_counter() - start_time
+                response = format_for_ui(result, symptom_query, elapsed_time, metadata)
+                if 'varma_points' not in result:
+                    # Semantic refinement carries symptoms only; points follow in 'final'
+                    del response['varma_points'], response['statistics']
+                response = shape_symptom_search_response(response, fields=fields, compact=compact)
+                response['stage'] = stage
+                yield encode_event(stage, response, use_sse)
+        except Exception as e:
+            print(f"\n✗ Error processing query: {str(e)}")
+            yield encode_event('error', {"stage": "error", "error": str(e)}, use_sse)
+    
+    return stream_response(stream_with_context(events()), use_sse)
+
+
+@search_bp.route('/api/symptoms/suggest', methods=['GET'])
+def suggest_symptoms():
+    """Autocomplete for the symptom box; cheap enough to call on every keystroke"""
+    retriever = get_retriever()
+    if retriever is None:
+        return jsonify({"error": "Retriever not initialized"}), 500
+    
+    query = request.args.get('q', '')
+    try:
+        limit = min(int(request.args.get('limit', 10)), MAX_SUGGESTIONS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    
+    # Suggestions for a given URL only change with the dataset. Compared with
+    # etag_matches, since compressed responses carry a -gzip/-br ETag suffix.
+    if etag_matches(request.headers.get('If-None-Match'), retriever.dataset_version):
+        response = not_modified_response(retriever.dataset_version)
+    else:
+        response = json_response({
+            "query": query,
+            "suggestions": suggester_for(retriever).suggest(query, limit=limit)
+        })
+        response.set_etag(retriever.dataset_version)
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
 # RAG Service has been moved to rag_service.py (Port 5004)
 
 
-def format_for_ui(result, query, processing_time):
+def format_for_ui(result, query, processing_time, metadata: VarmaMetadataTable = None):
     """
-    Transform your retrieval result into the format expected by React UI
+    Transform your retrieval result into the format expected by React UI.
+    Per-point presentation fields come from the dataset's metadata table.
     """
     
+    if metadata is None:
+        metadata = VarmaMetadataTable({})
+    
     varma_points = result.get("varma_points", [])
     matched_symptoms = result.get("matched_symptoms", [])
     
@@ -129,20 +325,22 @@ def format_for_ui(result, query, processing_time):
         
         # Get ALL symptoms for this Varma point from dataset
         all_syms = vp.get("all_symptoms", [])
+        varma_id = vp.get("varma_id", f"vp_{idx+1:03d}")
+        meta = metadata.get(varma_id, vp.get("varma_name", ""), all_syms)
         
         formatted_point = {
-            "id": vp.get("varma_id", f"vp_{idx+1:03d}"),
+            "id": varma_id,
             "name": vp.get("varma_name", "Unknown"),
             "confidence_score": round(confidence_score, 4),
             "match_type": primary_match_type,
-            "location": get_location_for_varma(vp.get("varma_name", "")),
+            "location": meta.location,
             "matched_symptoms": matched_syms,  # ALL matched symptoms (no limit)
             "all_symptoms": all_syms,  # ALL symptoms from dataset (no limit)
-            "coordinates": get_coordinates_for_varma(vp.get("varma_name", "")),
-            "description": get_description_for_varma_with_data(vp.get("varma_name", ""), all_syms),
-            "category": categorize_varma(vp.get("varma_name", "")),
-            "treatment_methods": get_treatment_methods(vp.get("varma_name", "")),
-            "contraindications": get_contraindications(vp.get("varma_name", "")),
+            "coordinates": meta.coordinates_dict(),
+            "description": meta.description,
+            "category": meta.category,
+            "treatment_methods": list(TREATMENT_METHODS),
+            "contraindications": list(CONTRAINDICATIONS),
             
             # Additional metadata
             "matched_symptom_count": vp.get("matched_symptom_count", 0),
@@ -168,6 +366,7 @@ def format_for_ui(result, query, processing_time):
     
     response = {
         "query": query,
+        "partial": result.get("partial", False),
         "varma_points": formatted_points,
         "statistics": {
             "total_points": total_points,
@@ -187,125 +386,67 @@ def format_for_ui(result, query, processing_time):
     
     return response
 
-def get_description_for_varma_with_data(varma_name, all_symptoms):
-    """Provide descriptions for Varma points from actual dataset symptoms - shows ALL"""
-    
-    if all_symptoms and isinstance(all_symptoms, list) and len(all_symptoms) > 0:
-        # Show ALL symptoms without limiting
-        symptoms_text = ", ".join(all_symptoms)
-        return f"This Varma point is associated with {len(all_symptoms)} signs and symptoms including: {symptoms_text}"
-    
-    # Fallback if no symptoms available
-    return f"Traditional Varma point '{varma_name}' with therapeutic significance in Siddha medicine."
-
-def get_location_for_varma(varma_name):
-    """Map Varma point names to body locations"""
-    location_map = {
-        "adhipathi": "Crown of the head",
-        "shankha": "Temple region (both sides)",
-        "krikatika": "Back of the neck",
-        "sthapani": "Between the eyebrows",
-        "apanga": "Outer corner of the eye",
-        "phana": "Nostril region",
-        "vidhura": "Behind the ear",
-        "hridaya": "Heart region",
-        "nabhi": "Navel region",
-        "basti": "Lower abdomen",
-        "guda": "Rectal region",
-        "lohitaksha": "Armpit",
-        "kakshadhara": "Shoulder region",
-        "kurpara": "Elbow joint",
-        "manibandha": "Wrist joint",
-        "kshipra": "Between thumb and index finger",
-        "tala": "Palm center",
-        "vitapa": "Groin region",
-        "janu": "Knee joint",
-        "gulpha": "Ankle joint",
-        "pada": "Foot region"
-    }
-    
-    varma_lower = varma_name.lower()
-    for key, location in location_map.items():
-        if key in varma_lower:
-            return location
-    
-    return "Body region (location varies)"
-
-def get_coordinates_for_varma(varma_name):
-    """Generate approximate coordinates for 3D visualization"""
-    coord_map = {
-        "adhipathi": {"x": 100, "y": 40},
-        "shankha": {"x": 70, "y": 45},
-        "krikatika": {"x": 100, "y": 80},
-        "sthapani": {"x": 100, "y": 50},
-        "hridaya": {"x": 100, "y": 120},
-        "nabhi": {"x": 100, "y": 160},
-        "basti": {"x": 100, "y": 180},
-        "lohitaksha": {"x": 50, "y": 100},
-        "kurpara": {"x": 40, "y": 130},
-        "manibandha": {"x": 30, "y": 160},
-        "janu": {"x": 85, "y": 240},
-        "gulpha": {"x": 85, "y": 280}
-    }
-    
-    varma_lower = varma_name.lower()
-    for key, coords in coord_map.items():
-        if key in varma_lower:
-            return coords
-    
-    import random
-    return {"x": random.randint(50, 150), "y": random.randint(80, 250)}
-
-def categorize_varma(varma_name):
-    """Categorize Varma points by body region"""
-    varma_lower = varma_name.lower()
-    
-    if any(term in varma_lower for term in ['adhipathi', 'shankha', 'sthapani', 'krikatika', 'apanga', 'phana', 'vidhura']):
-        return "Head & Neck"
-    elif any(term in varma_lower for term in ['hridaya', 'lohitaksha', 'kakshadhara', 'kurpara', 'manibandha']):
-        return "Upper Body"
-    elif any(term in varma_lower for term in ['nabhi', 'basti', 'guda', 'vitapa']):
-        return "Abdomen & Pelvis"
-    elif any(term in varma_lower for term in ['janu', 'gulpha', 'pada']):
-        return "Lower Body"
-    else:
-        return "General"
-
-def get_treatment_methods(varma_name):
-    """Provide treatment methods"""
-    return [
-        "Gentle pressure application",
-        "Herbal oil massage",
-        "Therapeutic manipulation"
-    ]
-
-def get_contraindications(varma_name):
-    """Provide contraindications"""
-    return [
-        "Acute injury or inflammation",
-        "Open wounds in the area",
-        "Consult practitioner for chronic conditions"
-    ]
-
-@app.route('/api/varma-points', methods=['GET'])
+@search_bp.route('/api/varma-points', methods=['GET'])
 def get_all_varma_points():
-    """Get all available Varma points (for future use)"""
+    """
+    Varma point catalog. Optional filters: category=, region= (body location
+    text), prefix= (name); pagination with offset=/limit=; fields= projection.
+    Responses carry an ETag/Last-Modified tied to the dataset version and
+    conditional GETs are answered with 304.
+    """
+    retriever = get_retriever()
     if retriever is None:
         return jsonify({"error": "Retriever not initialized"}), 500
     
     try:
-        all_points = []
-        for varma_name in retriever.varma_data.keys():
-            all_points.append({
-                "name": varma_name,
-                "category": categorize_varma(varma_name),
-                "location": get_location_for_varma(varma_name)
-            })
+        catalog = catalog_for(retriever)
         
-        return jsonify({"varma_points": all_points}), 200
+        if not_modified(catalog):
+            response = not_modified_response(catalog.etag)
+        else:
+            try:
+                offset = int(request.args.get('offset', 0))
+                limit = request.args.get('limit')
+                limit = min(int(limit), MAX_PAGE_SIZE) if limit else None
+            except ValueError:
+                return jsonify({"error": "offset and limit must be integers"}), 400
+            if offset < 0 or (limit is not None and limit < 1):
+                return jsonify({"error": "offset must be >= 0 and limit >= 1"}), 400
+            
+            category = request.args.get('category', '').strip() or None
+            region = request.args.get('region', '').strip() or None
+            prefix = request.args.get('prefix', '').strip() or None
+            fields = parse_fields(request.args.get('fields'))
+            
+            key = (category and category.lower(), region and region.lower(), prefix and prefix.lower(),
+                   offset, limit, tuple(fields) if fields else None)
+            body = catalog.cached(key, lambda: dumps(catalog.query(
+                category=category, region=region, prefix=prefix,
+                offset=offset, limit=limit, fields=fields
+            )))
+            response = Response(body, mimetype='application/json')
+            response.set_etag(catalog.dataset_version)
+        
+        if catalog.last_modified:
+            response.headers['Last-Modified'] = catalog.last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+def not_modified(catalog) -> bool:
+    """Conditional GET check; If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag_matches(if_none_match, catalog.etag)
+    since = request.if_modified_since
+    if since is not None and catalog.last_modified_ts is not None:
+        return catalog.last_modified_ts <= since.timestamp()
+    return False
+
+app = create_app()
+
 if __name__ == '__main__':
     print("\n" + "="*80)
     print("STARTING VARMA INTELLIGENCE BACKEND")
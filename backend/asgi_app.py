@@ -0,0 +1,288 @@
+"""
+Asyncio serving mode for the symptom-search and RAG routes.
+
+    cd backend
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5003
+
+Serves /api/symptom-search, /api/rag/query and /api/health with the same
+request and response formats as app.py and rag_service.py. Retrieval is
+CPU-bound and runs in a bounded thread pool (PyTorch releases the GIL during
+inference). RAG questions run the same pipeline as rag_service.py (answer
+cache, context packing, LLM gateway, index reload; see src/rag/src/pipeline.py)
+on a pool of their own, so waiting on the model never holds a retrieval
+thread. Each route has its own concurrency limit and bounded wait queue, so
+slow LLM calls can no longer starve symptom searches; requests beyond the
+queue get a 503.
+
+Environment:
+    VARMA_ASYNC_WORKERS       retrieval thread-pool size (default 4)
+    VARMA_SEARCH_CONCURRENCY  concurrent symptom searches (default: pool size)
+    VARMA_SEARCH_QUEUE        symptom searches allowed to wait (default 256)
+    VARMA_RAG_CONCURRENCY     concurrent RAG questions (default 2)
+    VARMA_RAG_QUEUE           RAG questions allowed to wait (default 256)
+
+The LLM gateway settings (VARMA_LLM_CONCURRENCY, VARMA_LLM_TIMEOUT, ...) are
+documented in src/rag/src/llm/gateway.py.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app import format_for_ui
+from response_utils import MIN_COMPRESS_BYTES, dumps, parse_bool, parse_fields, shape_symptom_search_response
+from src.main.registry import SYMPTOM_DATASET, default_registry
+from src.main.varma_metadata import metadata_table
+from varma_knowledge import current_store
+from src.rag.src.llm.gateway import LLM_GATEWAY, LLMOverloaded
+
+RAG_INDEX_PATH = Path(__file__).resolve().parent / "src" / "rag" / "varma_index.faiss"
+
+RETRIEVAL_WORKERS = int(os.environ.get("VARMA_ASYNC_WORKERS", 4))
+RAG_CONCURRENCY = int(os.environ.get("VARMA_RAG_CONCURRENCY", 2))
+
+_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="varma-async")
+_rag_executor = ThreadPoolExecutor(max_workers=RAG_CONCURRENCY, thread_name_prefix="varma-rag")
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Lets at most max_concurrent requests of one route run at a time and up to
+    max_waiting more wait for a slot; anything beyond that is rejected.
+    Only used from the event loop thread, so the counters need no lock.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self._semaphore = None
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded(self.name)
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'active': self.active,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'rejected': self.rejected
+        }
+
+
+limits = {
+    'symptom-search': ConcurrencyLimiter(
+        'symptom-search',
+        int(os.environ.get("VARMA_SEARCH_CONCURRENCY", RETRIEVAL_WORKERS)),
+        int(os.environ.get("VARMA_SEARCH_QUEUE", 256))
+    ),
+    'rag-query': ConcurrencyLimiter(
+        'rag-query',
+        RAG_CONCURRENCY,
+        int(os.environ.get("VARMA_RAG_QUEUE", 256))
+    )
+}
+
+
+async def run_cpu(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_rag(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_rag_executor, functools.partial(fn, *args, **kwargs))
+
+
+_rag_pipeline = None
+_rag_lock = threading.Lock()
+
+
+def get_rag_pipeline():
+    """Text-index RAG pipeline (same index as rag_service.py), built once"""
+    global _rag_pipeline
+    with _rag_lock:
+        if _rag_pipeline is None:
+            from src.rag.src.pipeline import RagPipeline
+            _rag_pipeline = RagPipeline(RAG_INDEX_PATH, store=current_store)
+    return _rag_pipeline
+
+
+def overloaded_response(name: str):
+    return JSONResponse(
+        {"error": f"Too many concurrent {name} requests, please retry"},
+        status_code=503,
+        headers={"Retry-After": "1"}
+    )
+
+
+def retry_later_response(e: LLMOverloaded):
+    """The LLM gateway's 429/503, as rag_service.py answers it"""
+    return JSONResponse(
+        {"error": str(e), "reason": e.reason},
+        status_code=e.status,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def health_check(request):
+    registry = default_registry()
+    return JSONResponse({
+        "status": "healthy",
+        "message": "Varma Intelligence Backend is running (async)",
+        "retriever_loaded": registry.peek(SYMPTOM_DATASET) is not None,
+        "rag_retriever_loaded": _rag_pipeline is not None and _rag_pipeline.retriever is not None,
+        "limits": {name: limiter.stats() for name, limiter in limits.items()}
+    })
+
+
+async def symptom_search(request):
+    data = await read_json(request)
+    if not data or 'query' not in data:
+        return JSONResponse({"error": "No query provided"}, status_code=400)
+
+    symptom_query = data['query'].strip()
+    if not symptom_query:
+        return JSONResponse({"error": "Empty query"}, status_code=400)
+
+    latency_budget_ms = data.get('latency_budget_ms')
+    fields = parse_fields(data.get('fields', request.query_params.get('fields')))
+    compact = parse_bool(data.get('compact', request.query_params.get('compact', False)))
+
+    try:
+        async with limits['symptom-search'].slot():
+            try:
+                retriever = await run_cpu(default_registry().get, SYMPTOM_DATASET)
+            except Exception as e:
+                print(f"\n✗ Retriever unavailable: {e}")
+                return JSONResponse({"error": "Retriever not initialized"}, status_code=500)
+
+            start_time = time.perf_counter()
+            result = await run_cpu(
+                retriever.retrieve,
+                query=symptom_query,
+                top_symptoms=15,
+                top_varmas=5,
+                lexical_threshold=0.45,
+                semantic_threshold=0.55,
+                verification_threshold=0.3,
+                latency_budget_ms=float(latency_budget_ms) if latency_budget_ms else None
+            )
+            elapsed_time = time.perf_counter() - start_time
+    except Overloaded as e:
+        return overloaded_response(str(e))
+    except Exception as e:
+        print(f"\n✗ Error processing query: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    response = format_for_ui(result, symptom_query, elapsed_time, metadata_table(retriever))
+    return Response(
+        dumps(shape_symptom_search_response(response, fields=fields, compact=compact)),
+        media_type="application/json"
+    )
+
+
+async def rag_query(request):
+    data = await read_json(request)
+    if not data or 'question' not in data:
+        return JSONResponse({"error": "No question provided"}, status_code=400)
+
+    question = data['question'].strip()
+    if not question:
+        return JSONResponse({"error": "Empty question"}, status_code=400)
+
+    try:
+        # Reject before queuing for a slot while the LLM queue is full
+        LLM_GATEWAY.check()
+        async with limits['rag-query'].slot():
+            pipeline = await run_rag(get_rag_pipeline)
+            rag = await run_rag(pipeline.current_retriever)
+            if rag is None:
+                return JSONResponse({"error": "Retriever not initialized"}, status_code=500)
+
+            response = await run_rag(pipeline.answer, question, rag)
+    except Overloaded as e:
+        return overloaded_response(str(e))
+    except LLMOverloaded as e:
+        print(f"⚠️ RAG Query rejected: {e}")
+        return retry_later_response(e)
+    except Exception as e:
+        print(f"✗ RAG Query Error: {str(e)}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    return JSONResponse(response)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm the symptom retriever before accepting traffic, as app.py does
+    try:
+        retriever = await run_cpu(default_registry().get, SYMPTOM_DATASET)
+        metadata_table(retriever)
+    except Exception as e:
+        print(f"\n✗ Failed to initialize retriever: {e}")
+    yield
+    _executor.shutdown(wait=False)
+    _rag_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/symptom-search', symptom_search, methods=['POST']),
+        Route('/api/rag/query', rag_query, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_BYTES)
+    ],
+    lifespan=lifespan
+)
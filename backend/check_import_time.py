@@ -0,0 +1,108 @@
+"""
+Cold-start import benchmark for the backend packages.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`.
+The check fails (exit code 1) when an import's cumulative time exceeds its
+budget, or when a heavy dependency (torch, transformers, pandas, ...) is
+pulled in eagerly instead of on first use.
+
+Usage (from backend/):
+    python check_import_time.py [--runs 5] [--scale 1.0]
+
+--scale multiplies every budget, for slower CI machines.
+
+tests/test_import_time.py runs the same check under pytest; set
+VARMA_IMPORT_TIME_SCALE to scale its budgets.
+"""
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+RAG_ROOT = BACKEND_ROOT / "src" / "rag"
+
+HEAVY_MODULES = {
+    'torch', 'transformers', 'sklearn', 'pandas',
+    'sentence_transformers', 'faiss', 'scipy'
+}
+
+# (module, directory it is imported from, budget in milliseconds)
+TARGETS = [
+    ('src.main', BACKEND_ROOT, 20),
+    ('src.main.lexical_matching', BACKEND_ROOT, 30),
+    ('src.main.scoring_and_retrieval', BACKEND_ROOT, 200),
+    ('src.retriever', RAG_ROOT, 50),
+    ('src.llm.generator', RAG_ROOT, 50),
+]
+
+
+def measure(module: str, cwd: Path):
+    """Return (cumulative import time in ms, set of imported top-level packages)"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=str(cwd),
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip()[-2000:]}")
+
+    cumulative_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        imported.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(parts[1])
+
+    if cumulative_us is None:
+        raise RuntimeError(f"no importtime entry for {module}")
+    return cumulative_us / 1000, imported
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per target (best run counts)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply every budget by this factor')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<34} {'best ms':>9} {'budget':>8}  heavy imports")
+    print('-' * 72)
+    for module, cwd, budget_ms in TARGETS:
+        budget_ms *= args.scale
+        best_ms = None
+        heavy = set()
+        for _ in range(max(args.runs, 1)):
+            elapsed_ms, imported = measure(module, cwd)
+            best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+            heavy |= imported & HEAVY_MODULES
+
+        status = 'ok'
+        if best_ms > budget_ms:
+            status = 'OVER BUDGET'
+            failures.append(f"{module}: {best_ms:.1f}ms > {budget_ms:.0f}ms")
+        if heavy:
+            status = 'EAGER HEAVY IMPORT'
+            failures.append(f"{module}: imports {', '.join(sorted(heavy))} at import time")
+        print(f"{module:<34} {best_ms:>9.1f} {budget_ms:>8.0f}  {', '.join(sorted(heavy)) or '-'}  [{status}]")
+
+    if failures:
+        print("\nImport-time regression:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        return 1
+
+    print("\n✓ All imports within budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
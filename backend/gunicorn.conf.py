@@ -0,0 +1,53 @@
+"""
+Gunicorn settings for the backend services.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:application                              # symptom search (5003)
+    VARMA_BIND=0.0.0.0:5004 gunicorn -c gunicorn.conf.py rag_wsgi:application  # RAG chat (5004)
+
+The app is preloaded in the master so model weights and embeddings are
+loaded once and shared copy-on-write by all forked workers. Each worker
+logs its memory (see process_memory.py) once it is ready, and
+GET /api/metrics reports it per worker afterwards.
+
+Environment:
+    VARMA_BIND            address to bind (default 0.0.0.0:5003)
+    WEB_CONCURRENCY       worker processes (default: half the CPUs, at least 2)
+    VARMA_THREADS         request threads per worker (default 4)
+    VARMA_TORCH_THREADS   intra-op torch threads per worker
+                          (default: CPUs / workers, so workers do not oversubscribe)
+    VARMA_TIMEOUT         worker timeout in seconds (default 120)
+"""
+
+import multiprocessing
+import os
+import sys
+
+# Do not import from 'src' here: the RAG service resolves 'src' to
+# backend/src/rag/src, and an early import would shadow it.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from process_memory import memory_usage
+
+_cpus = multiprocessing.cpu_count()
+
+bind = os.environ.get("VARMA_BIND", "0.0.0.0:5003")
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, _cpus // 2)))
+threads = int(os.environ.get("VARMA_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("VARMA_TIMEOUT", 120))
+preload_app = True
+
+
+def when_ready(server):
+    server.log.info("Master %s ready, memory: %s", os.getpid(), memory_usage())
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch_threads = int(os.environ.get("VARMA_TORCH_THREADS", max(1, _cpus // workers)))
+        torch.set_num_threads(torch_threads)
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s ready, memory: %s", worker.pid, memory_usage())
@@ -0,0 +1,37 @@
+import os
+import resource
+import sys
+from typing import Dict
+
+
+def memory_usage(pid="self") -> Dict[str, float]:
+    """
+    Memory of a process in MB. On Linux this reads /proc/<pid>/smaps_rollup:
+    'pss' (proportional set size) is the figure to size nodes with, because
+    pages shared copy-on-write with the pre-fork master (model weights,
+    mmap'd embeddings) are split between the processes sharing them.
+    Elsewhere only the peak RSS of the current process is available.
+    """
+    rollup = f"/proc/{pid}/smaps_rollup"
+    if os.path.exists(rollup):
+        fields = {}
+        with open(rollup) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+        shared = fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0)
+        private = fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0)
+        return {
+            'rss_mb': round(fields.get('Rss', 0.0), 1),
+            'pss_mb': round(fields.get('Pss', 0.0), 1),
+            'shared_mb': round(shared, 1),
+            'private_mb': round(private, 1)
+        }
+
+    if pid != "self":
+        return {}
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'max_rss_mb': round(max_rss / divisor, 1)}
@@ -1,13 +1,14 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, stream_with_context
 from flask_cors import CORS
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 # ==============================================================================
 # CONFIGURATION & PATHS
 # ==============================================================================
-# We need to add 'backend/src/rag' to sys.path so that 'import src.retriever'
+# We need to add 'backend/src/rag' to sys.path so that 'import src.pipeline'
 # (which expects to be inside backend/src/rag) works correctly and resolves
 # its own internal 'from src...' imports.
 PROJECT_ROOT = Path(__file__).resolve().parent
@@ -17,14 +18,16 @@ if str(RAG_ROOT) not in sys.path:
     sys.path.insert(0, str(RAG_ROOT))
 
 # Now we can import from the preferred RAG implementation
-from src.retriever import VarmaRetriever
-from src.llm.prompt import build_prompt
-from src.llm.generator import generate
-
-# Check for FAISS (common missing dependency on new envs)
-try:
-    import faiss
-except ImportError:
+from src.pipeline import RagPipeline
+from src.llm.generator import preload
+from src.llm.gateway import LLM_GATEWAY, LLMOverloaded
+from varma_knowledge import current_store
+from process_memory import memory_usage
+from response_utils import encode_event, retry_later_response, stream_response, wants_event_stream
+
+# Check for FAISS (common missing dependency on new envs) without importing it;
+# the index loader imports it when it is actually needed.
+if importlib.util.find_spec("faiss") is None:
     print("\n" + "!"*80)
     print("[CRITICAL ERROR] 'faiss' module not found.")
     print("Please run: pip install faiss-cpu")
@@ -41,21 +44,12 @@ print("\n" + "="*80)
 print("INITIALIZING RAG SERVICE (PORT 5004)")
 print("="*80)
 
-retriever = None
-try:
-    # VarmaRetriever defaults to loading 'varma_index.pkl'.
-    # We must provide the full path since we are running from backend/
-    index_path = RAG_ROOT / "varma_index.pkl"
-    print(f"Loading retriever index from: {index_path}")
-    
-    if not index_path.exists():
-        print(f"✗ Error: Index file not found at {index_path}")
-    else:
-        retriever = VarmaRetriever(index_path=str(index_path))
-        print("\n✓ RAG Retriever initialized successfully!")
+# VarmaRetriever defaults to loading 'varma_index.faiss' (+ varma_docs.jsonl).
+# We must provide the full path since we are running from backend/
+pipeline = RagPipeline(RAG_ROOT / "varma_index.faiss", store=current_store)
 
-except Exception as e:
-    print(f"\n✗ Failed to initialize retriever: {e}")
+# Load the LLM into the Ollama server now rather than on the first question
+preload()
 
 
 # ==============================================================================
@@ -63,17 +57,29 @@ except Exception as e:
 # ==============================================================================
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    retriever = pipeline.retriever
     return jsonify({
         "status": "healthy",
         "service": "Varma RAG Service (Text-based)",
-        "retriever_loaded": retriever is not None
+        "retriever_loaded": retriever is not None,
+        "encoder_loaded": retriever is not None and retriever.embedder.loaded
     })
 
+@app.route('/api/rag/metrics', methods=['GET'])
+def rag_metrics():
+    """Per-tier hit rates and latencies of the retrieval cascade, and answer streaming"""
+    if pipeline.retriever is None:
+        return jsonify({"error": "Retriever not initialized"}), 500
+    metrics = pipeline.get_metrics()
+    metrics['process'] = {'pid': os.getpid(), 'memory': memory_usage()}
+    return jsonify(metrics), 200
+
 @app.route('/api/rag/query', methods=['POST'])
 def rag_query():
     """RAG question answering endpoint"""
     try:
-        if retriever is None:
+        rag = pipeline.current_retriever()
+        if rag is None:
             return jsonify({"error": "Retriever not initialized"}), 500
 
         data = request.get_json()
@@ -87,41 +93,59 @@ def rag_query():
             return jsonify({"error": "Empty question"}), 400
         
         print(f"\nRAG Question: {question}")
+        return jsonify(pipeline.answer(question, rag)), 200
         
-        # 1. Retrieve relevant documents (returns list of dicts with 'text' key)
-        docs = retriever.retrieve(question)
-        
-        # 2. Build Context
-        context = "\n\n".join([d.get("text", "") for d in docs])
-        
-        # 3. Build Prompt
-        prompt = build_prompt(question, context)
-        
-        print("Generating answer with LLM...")
-        
-        # 4. Generate Answer
-        # Note: generate() in this version might handle 'model' internally or default
-        response_text = generate(prompt)
-        
-        print("LLM Response received.")
-
-        # 5. Format response
-        # The frontend expects a JSON with 'answer', 'sources', 'confidence'
-        # Since the simpler retriever doesn't return structured source metadata or confidence scores
-        # in the same way, we provide simplified values.
-        
-        response = {
-            "answer": response_text,
-            "sources": ["Varma Text Index"], # Simplified source
-            "confidence": 1.0 # Placeholder confidence
-        }
-        
-        return jsonify(response), 200
-        
+    except LLMOverloaded as e:
+        print(f"⚠️ RAG Query rejected: {e}")
+        return retry_later_response(str(e), e.status, e.retry_after, reason=e.reason)
     except Exception as e:
         print(f"✗ RAG Query Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/rag/query/stream', methods=['POST'])
+def rag_query_stream():
+    """
+    Streaming /api/rag/query: a 'sources' event with the retrieved Varma
+    documents, one 'token' event per generated chunk, then 'done' with
+    confidence, grounding and timing. NDJSON by default; Server-Sent Events
+    with Accept: text/event-stream or ?format=sse.
+    """
+    rag = pipeline.current_retriever()
+    if rag is None:
+        return jsonify({"error": "Retriever not initialized"}), 500
+
+    data = request.get_json(silent=True)
+    if not data or 'question' not in data:
+        return jsonify({"error": "No question provided"}), 400
+
+    question = data['question'].strip()
+    if not question:
+        return jsonify({"error": "Empty question"}), 400
+
+    # Reject before the stream starts while the LLM queue is full
+    try:
+        LLM_GATEWAY.check()
+    except LLMOverloaded as e:
+        return retry_later_response(str(e), e.status, e.retry_after, reason=e.reason)
+
+    use_sse = wants_event_stream()
+    print(f"\nRAG Question (stream): {question}")
+
+    def events():
+        try:
+            for event, payload in pipeline.stream(question, rag):
+                yield encode_event(event, payload, use_sse)
+        except LLMOverloaded as e:
+            print(f"⚠️ RAG Stream rejected: {e}")
+            yield encode_event('error', {
+                "event": "error", "error": str(e), "reason": e.reason, "retry_after": e.retry_after
+            }, use_sse)
+        except Exception as e:
+            print(f"✗ RAG Stream Error: {str(e)}")
+            yield encode_event('error', {"event": "error", "error": str(e)}, use_sse)
+
+    return stream_response(stream_with_context(events()), use_sse)
+
 if __name__ == '__main__':
     print("\n" + "="*80)
     print("STARTING VARMA RAG SERVICE")
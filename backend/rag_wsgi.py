@@ -0,0 +1,26 @@
+"""
+WSGI entry point for the RAG chat service.
+
+    cd backend
+    VARMA_BIND=0.0.0.0:5004 gunicorn -c gunicorn.conf.py rag_wsgi:application
+
+Kept separate from wsgi.py because rag_service puts backend/src/rag on
+sys.path, whose 'src' package would shadow the backend's own.
+
+The BGE encoder is loaded on the first question that reaches the dense
+tier. Set VARMA_RAG_PRELOAD_ENCODER=1 to load it here instead, so the
+workers share the master's copy rather than each loading their own.
+"""
+
+import gc
+import os
+
+from rag_service import app, pipeline
+
+application = app
+
+if os.environ.get("VARMA_RAG_PRELOAD_ENCODER") == "1" and pipeline.retriever is not None:
+    pipeline.retriever.embedder.model
+
+gc.collect()
+gc.freeze()
@@ -0,0 +1,228 @@
+"""
+Response shaping, JSON encoding and compression for the backend APIs.
+
+- Field projection / compact mode for /api/symptom-search payloads
+- Fast JSON encoding (orjson when installed, compact stdlib json otherwise)
+- gzip / brotli negotiation from Accept-Encoding
+- NDJSON / Server-Sent Events framing for the streaming endpoints
+"""
+
+import gzip
+import json
+from typing import Optional
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson'}
+
+# Fields that compact mode leaves out unless they are requested explicitly:
+# 'description' repeats all_symptoms, the other two are the same for every point.
+COMPACT_OMITTED_FIELDS = ('description', 'treatment_methods', 'contraindications')
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status: int = 200) -> Response:
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+def retry_later_response(message: str, status: int, retry_after: int, **fields) -> Response:
+    """429/503 JSON error telling the client when to retry"""
+    response = json_response(dict(fields, error=message), status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def wants_event_stream() -> bool:
+    """SSE when the client asks with ?format=sse or Accept: text/event-stream, else NDJSON"""
+    return request.args.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+
+
+def encode_event(stage: str, payload, use_sse: bool) -> bytes:
+    if use_sse:
+        return b"event: " + stage.encode() + b"\ndata: " + dumps(payload) + b"\n\n"
+    return dumps(payload) + b"\n"
+
+
+def stream_response(events, use_sse: bool) -> Response:
+    return Response(
+        events,
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def parse_fields(value):
+    """Accept ['a', 'b'] or 'a,b'; returns None when no projection was asked for"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = [str(f).strip() for f in value if str(f).strip()]
+    return fields or None
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def shape_symptom_search_response(response: dict, fields=None, compact: bool = False) -> dict:
+    """
+    Project each Varma point down to `fields` and, in compact mode, replace
+    repeated symptom strings by indices into a top-level "symptoms" table.
+    """
+    points = response.get('varma_points', [])
+
+    if fields or compact:
+        projected = []
+        for point in points:
+            if fields:
+                keep = [f for f in fields if f in point]
+            else:
+                keep = [f for f in point if f not in COMPACT_OMITTED_FIELDS]
+            projected.append({f: point[f] for f in keep})
+        points = projected
+
+    if compact:
+        table = []
+        positions = {}
+
+        def ref(symptom):
+            if symptom not in positions:
+                positions[symptom] = len(table)
+                table.append(symptom)
+            return positions[symptom]
+
+        for point in points:
+            for key in ('matched_symptoms', 'all_symptoms'):
+                if key in point:
+                    point[key] = [ref(s) for s in point[key]]
+
+        details = [
+            dict(d, symptom=ref(d.get('symptom', '')))
+            for d in response.get('matched_symptoms_details', [])
+        ]
+        response = dict(response, matched_symptoms_details=details, symptoms=table, compact=True)
+
+    if 'varma_points' not in response:
+        return response
+    return dict(response, varma_points=points)
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick 'br' or 'gzip' from an Accept-Encoding header (honouring q=0)"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        if not part.strip():
+            continue
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    def allowed(name):
+        return accepted.get(name, accepted.get('*', 0.0)) > 0
+
+    if brotli is not None and allowed('br'):
+        return 'br'
+    if allowed('gzip'):
+        return 'gzip'
+    return None
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: compress JSON bodies for clients that accept it"""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or 'Content-Encoding' in response.headers
+        or not 200 <= response.status_code < 300
+    ):
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=5))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=5))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag names one exact byte sequence, so each encoding gets its own
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def matched_etag(if_none_match: str, etag: str) -> Optional[str]:
+    """
+    The If-None-Match entry that names `etag`, with any -gzip/-br suffix
+    compress_response added for an encoded body (unquoted), or None.
+    """
+    wanted = etag.strip('"')
+    for tag in (if_none_match or '').split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return wanted
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        base = tag
+        for suffix in ('-gzip', '-br'):
+            if base.endswith(suffix):
+                base = base[:-len(suffix)]
+                break
+        if base == wanted:
+            return tag
+    return None
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True when an If-None-Match header names `etag`, ignoring the weak prefix and encoding suffix"""
+    return matched_etag(if_none_match, etag) is not None
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    304 for a conditional GET. It repeats the ETag the client validated, so
+    a cached gzip or brotli body keeps its suffixed ETag.
+    """
+    response = Response(status=304)
+    response.set_etag(matched_etag(request.headers.get('If-None-Match'), etag) or etag.strip('"'))
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def install_compression(app):
+    app.after_request(compress_response)
+    return app
@@ -1,18 +1,40 @@
 """
 Semantic retrieval package for Varma point identification
+
+Components are imported on first attribute access so that importing one
+submodule (e.g. scoring_and_retrieval) does not pull in pandas or the
+transformer stack through this package's __init__.
 """
 
-from .lexical_matching import LexicalMatcher
-from .semantic_matching import SemanticMatcher
-from .lexical_verification import LexicalVerifier
-from .scoring_and_retrieval import VarmaRetriever
-from .evaluation_metrics import calculate_metrics_with_ground_truth, print_metrics_report
+import importlib
+
+_EXPORTS = {
+    'LexicalMatcher': '.lexical_matching',
+    'SemanticMatcher': '.semantic_matching',
+    'LexicalVerifier': '.lexical_verification',
+    'VarmaRetriever': '.scoring_and_retrieval',
+    'VarmaMetadataTable': '.varma_metadata',
+    'calculate_metrics_with_ground_truth': '.evaluation_metrics',
+    'print_metrics_report': '.evaluation_metrics'
+}
 
 __all__ = [
     'LexicalMatcher',
     'SemanticMatcher',
     'LexicalVerifier',
     'VarmaRetriever',
+    'VarmaMetadataTable',
     'calculate_metrics_with_ground_truth',
     'print_metrics_report'
-]
\ No newline at end of file
+]
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
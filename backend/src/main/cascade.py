@@ -0,0 +1,104 @@
+import os
+import threading
+from typing import List, Tuple
+from .lexical_matching import _normalize_text, _get_root_word
+
+
+class CascadePolicy:
+    """
+    Decides whether the semantic stage is worth running for a query.
+
+    The semantic stage is skipped when lexical matching already found enough
+    high-confidence matches, those matches clearly stand out from the weaker
+    ones, and together they cover the query's keywords. A per-request latency
+    budget can additionally skip (or stop waiting for) the semantic stage when
+    it would not finish in time; results are then flagged as partial.
+    """
+
+    def __init__(
+        self,
+        early_exit: bool = True,
+        min_high_confidence: int = 3,
+        min_score_margin: float = 0.15,
+        min_keyword_coverage: float = 1.0,
+        high_confidence_score: float = 0.8,
+        latency_budget_ms: float = None,
+        initial_semantic_cost_ms: float = 250.0
+    ):
+        self.early_exit = early_exit
+        self.min_high_confidence = min_high_confidence
+        self.min_score_margin = min_score_margin
+        self.min_keyword_coverage = min_keyword_coverage
+        self.high_confidence_score = high_confidence_score
+        self.latency_budget_ms = latency_budget_ms
+
+        # Exponentially weighted estimate of the semantic stage's latency,
+        # used to decide whether it still fits in the remaining budget.
+        self._lock = threading.Lock()
+        self._semantic_cost_ms = initial_semantic_cost_ms
+
+    @classmethod
+    def from_env(cls) -> "CascadePolicy":
+        budget = os.environ.get("VARMA_LATENCY_BUDGET_MS")
+        return cls(
+            early_exit=os.environ.get("VARMA_CASCADE", "1") == "1",
+            min_high_confidence=int(os.environ.get("VARMA_CASCADE_MIN_MATCHES", 3)),
+            min_score_margin=float(os.environ.get("VARMA_CASCADE_MIN_MARGIN", 0.15)),
+            min_keyword_coverage=float(os.environ.get("VARMA_CASCADE_MIN_COVERAGE", 1.0)),
+            latency_budget_ms=float(budget) if budget else None
+        )
+
+    @property
+    def semantic_cost_ms(self) -> float:
+        with self._lock:
+            return self._semantic_cost_ms
+
+    def record_semantic_cost(self, elapsed_ms: float, alpha: float = 0.2):
+        with self._lock:
+            self._semantic_cost_ms = (1 - alpha) * self._semantic_cost_ms + alpha * elapsed_ms
+
+    @staticmethod
+    def keyword_coverage(query_terms: List[str], matched_symptoms: List[str], synonym_dict) -> float:
+        if not query_terms:
+            return 0.0
+
+        matched_forms = set()
+        for symptom in matched_symptoms:
+            for word in _normalize_text(symptom).split():
+                matched_forms.add(word)
+                matched_forms.add(_get_root_word(word))
+                matched_forms.add(synonym_dict.get_canonical_form(word))
+            matched_forms.add(synonym_dict.get_canonical_form(_normalize_text(symptom)))
+
+        covered = 0
+        for term in query_terms:
+            forms = {term, _get_root_word(term), synonym_dict.get_canonical_form(term)}
+            if forms & matched_forms:
+                covered += 1
+        return covered / len(query_terms)
+
+    def should_skip_semantic(
+        self,
+        query_terms: List[str],
+        lexical_matches: List[Tuple[str, float]],
+        synonym_dict
+    ) -> Tuple[bool, str]:
+        if not self.early_exit:
+            return False, "early exit disabled"
+
+        high = [(s, sc) for s, sc in lexical_matches if sc >= self.high_confidence_score]
+        low = [sc for _, sc in lexical_matches if sc < self.high_confidence_score]
+
+        if len(high) < self.min_high_confidence:
+            return False, "too few high-confidence lexical matches"
+
+        weakest_high = min(sc for _, sc in high)
+        best_low = max(low) if low else 0.0
+        if weakest_high - best_low < self.min_score_margin:
+            return False, "lexical score margin too small"
+
+        coverage = self.keyword_coverage(query_terms, [s for s, _ in high], synonym_dict)
+        if coverage < self.min_keyword_coverage:
+            return False, f"keyword coverage {coverage:.2f} below threshold"
+
+        return True, f"{len(high)} clear lexical matches covering the query"
@@ -1,13 +1,16 @@
 import numpy as np
-import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, TYPE_CHECKING
 from .lexical_matching import _normalize_text
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 def calculate_metrics_with_ground_truth(
-    predictions_df: pd.DataFrame,
+    predictions_df: "pd.DataFrame",
     ground_truth_dict: Dict,
     query_times: List[float]
 ) -> Dict[str, float]:
+    import pandas as pd
     
     total = 0
     top5_correct = 0
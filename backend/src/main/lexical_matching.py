@@ -23,7 +23,16 @@ def _get_root_word(word: str) -> str:
             return root
     return word
 
-class LexicalMatcher:    
+class LexicalMatcher:
+    STOP_WORDS = frozenset({
+        'i', 'am', 'have', 'having', 'feel', 'feeling', 'experience', 'experiencing',
+        'my', 'the', 'a', 'an', 'and', 'or', 'but', 'with', 'from', 'there', 'is',
+        'are', 'was', 'been', 'being', 'has', 'had', 'do', 'does', 'did', 'will',
+        'would', 'could', 'should', 'may', 'might', 'can', 'me', 'very', 'some',
+        'severe', 'mild', 'slight', 'really', 'quite', 'just', 'also', 'serious',
+        'recently', 'now', 'today', 'yesterday', 'since', 'for', 'last', 'two', 'days'
+    })
+    
     def __init__(self, all_symptoms: List[str]):
         self.all_symptoms = all_symptoms
         self.all_symptoms_norm_to_orig = {_normalize_text(s): s for s in all_symptoms}
@@ -49,14 +58,7 @@ class LexicalMatcher:
         Extract keywords from query
         IMPROVED: Only expands with synonyms for complete meaningful phrases
         """
-        stop_words = {
-            'i', 'am', 'have', 'having', 'feel', 'feeling', 'experience', 'experiencing',
-            'my', 'the', 'a', 'an', 'and', 'or', 'but', 'with', 'from', 'there', 'is',
-            'are', 'was', 'been', 'being', 'has', 'had', 'do', 'does', 'did', 'will',
-            'would', 'could', 'should', 'may', 'might', 'can', 'me', 'very', 'some',
-            'severe', 'mild', 'slight', 'really', 'quite', 'just', 'also', 'serious',
-            'recently', 'now', 'today', 'yesterday', 'since', 'for', 'last', 'two', 'days'
-        }
+        stop_words = self.STOP_WORDS
         
         query_lower = query.lower().strip()
         
@@ -120,6 +122,39 @@ class LexicalMatcher:
         # Remove duplicates
         return list(set(all_phrases))
     
+    def to_state(self) -> Dict:
+        """
+        Serialisable form of the built index. Symptoms in the inverted index
+        are stored as positions in all_symptoms.
+        """
+        position = {s: i for i, s in enumerate(self.all_symptoms)}
+        return {
+            'word_to_symptoms': {
+                word: [position[s] for s in symptoms]
+                for word, symptoms in self.word_to_symptoms.items()
+            },
+            'synonyms': self.synonym_dict.to_state()
+        }
+    
+    @classmethod
+    def from_state(cls, all_symptoms: List[str], state: Dict) -> 'LexicalMatcher':
+        obj = cls.__new__(cls)
+        obj.all_symptoms = all_symptoms
+        obj.all_symptoms_norm_to_orig = {_normalize_text(s): s for s in all_symptoms}
+        obj.synonym_dict = MedicalSynonymDict.from_state(state['synonyms'])
+        obj.word_to_symptoms = {
+            word: [all_symptoms[i] for i in ids]
+            for word, ids in state['word_to_symptoms'].items()
+        }
+        return obj
+    
+    def content_terms(self, query: str) -> List[str]:
+        """Query words that carry meaning on their own (no stop or context-dependent words)"""
+        return [
+            w for w in _normalize_text(query).split()
+            if w not in self.STOP_WORDS and len(w) > 2 and not self.synonym_dict.is_context_dependent(w)
+        ]
+    
     def calculate_word_similarity(self, word1: str, word2: str) -> float:
         # Check if they are synonyms
         if self.synonym_dict.are_synonyms(word1, word2):
@@ -202,6 +202,27 @@ class MedicalSynonymDict:
             'ectomy': 'removal',
         }
     
+    def to_state(self) -> Dict:
+        """Plain-JSON form of the compiled tables (used by retriever snapshots)"""
+        return {
+            'synonym_groups': {k: sorted(v) for k, v in self.synonym_groups.items()},
+            'context_dependent_words': sorted(self.context_dependent_words),
+            'word_to_canonical': self.word_to_canonical,
+            'medical_prefixes': self.medical_prefixes,
+            'medical_suffixes': self.medical_suffixes
+        }
+    
+    @classmethod
+    def from_state(cls, state: Dict) -> 'MedicalSynonymDict':
+        """Rebuild the dictionary from to_state() output without recompiling it"""
+        obj = cls.__new__(cls)
+        obj.synonym_groups = {k: set(v) for k, v in state['synonym_groups'].items()}
+        obj.context_dependent_words = set(state['context_dependent_words'])
+        obj.word_to_canonical = dict(state['word_to_canonical'])
+        obj.medical_prefixes = dict(state['medical_prefixes'])
+        obj.medical_suffixes = dict(state['medical_suffixes'])
+        return obj
+    
     def normalize_medical_phrase(self, phrase: str) -> str:
         """
         Normalize medical phrases to standard form
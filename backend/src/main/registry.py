@@ -0,0 +1,230 @@
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+SYMPTOM_DATASET = "symptoms"
+
+
+class RetrieverRegistry:
+    """
+    Process-wide registry of VarmaRetriever instances keyed by dataset name.
+
+    Each dataset is registered with a factory and built on first use. Builds
+    are guarded by a per-dataset lock, so concurrent first requests wait for
+    a single build instead of loading the model and embeddings twice.
+
+    A built dataset can be reloaded in place: the replacement is built off
+    to the side (double-buffered) and swapped in with a single assignment.
+    Requests that already hold the old instance finish on it, and every
+    cache keyed on the instance or its dataset_version goes with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factories: Dict[str, Callable] = {}
+        self._reloaders: Dict[str, Callable] = {}
+        self._instances: Dict[str, object] = {}
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._reload_status: Dict[str, Dict] = {}
+        self._swap_listeners: List[Callable] = []
+
+    def register(self, name: str, factory: Callable, replace: bool = False, reloader: Callable = None):
+        """
+        Register a factory for a dataset. An existing factory is only replaced
+        when replace=True, and an instance that is already built is kept.
+        `reloader(current)` builds a replacement for a live instance; without
+        one, reloads call the factory again.
+        """
+        with self._lock:
+            if name in self._factories and not replace:
+                return
+            self._factories[name] = factory
+            if reloader is not None:
+                self._reloaders[name] = reloader
+            else:
+                self._reloaders.pop(name, None)
+            self._build_locks.setdefault(name, threading.Lock())
+
+    def register_dataset(
+        self,
+        name: str,
+        varma_symptoms_path: Path,
+        symptom_to_varma_path: Path,
+        snapshot_path: Path = None,
+        replace: bool = False,
+        store: Callable = None,
+        **retriever_kwargs
+    ):
+        """
+        Register a dataset backed by the two mapping JSON files (and an optional
+        snapshot). `store()` returns the varma_knowledge store handed to each
+        retriever built for it; it is called again on reload, so a store
+        refreshed from the updated files goes with the new data.
+        """
+        def factory():
+            from .scoring_and_retrieval import VarmaRetriever
+            if snapshot_path is not None:
+                return VarmaRetriever.from_snapshot(
+                    snapshot_path=snapshot_path,
+                    varma_symptoms_path=varma_symptoms_path,
+                    symptom_to_varma_path=symptom_to_varma_path,
+                    store=store() if store else None,
+                    **retriever_kwargs
+                )
+            return VarmaRetriever(varma_symptoms_path, symptom_to_varma_path,
+                                  store=store() if store else None, **retriever_kwargs)
+
+        def reloader(current):
+            from .scoring_and_retrieval import VarmaRetriever
+            from .snapshot import save_snapshot
+            retriever = VarmaRetriever.reload_from(current, varma_symptoms_path, symptom_to_varma_path,
+                                                   store=store() if store else None)
+            if snapshot_path is not None and retriever is not current:
+                try:
+                    save_snapshot(retriever, snapshot_path)
+                except OSError as write_error:
+                    print(f"WARNING: Could not write snapshot - {write_error}")
+            return retriever
+
+        self.register(name, factory, replace=replace, reloader=reloader)
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._factories
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._factories)
+
+    def peek(self, name: str = SYMPTOM_DATASET):
+        """Return the instance if it has been built, without building it"""
+        with self._lock:
+            return self._instances.get(name)
+
+    def get(self, name: str = SYMPTOM_DATASET):
+        instance = self.peek(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown dataset '{name}'")
+            factory = self._factories[name]
+            build_lock = self._build_locks[name]
+
+        with build_lock:
+            instance = self.peek(name)
+            if instance is None:
+                instance = factory()
+                with self._lock:
+                    self._instances[name] = instance
+        return instance
+
+    def add_swap_listener(self, callback: Callable):
+        """callback(name, old, new) runs after a reload swaps in a new instance"""
+        with self._lock:
+            self._swap_listeners.append(callback)
+
+    def reload_status(self, name: str = SYMPTOM_DATASET) -> Dict:
+        with self._lock:
+            status = dict(self._reload_status.get(name, {'state': 'idle'}))
+            instance = self._instances.get(name)
+        status['dataset_version'] = getattr(instance, 'dataset_version', None)
+        return status
+
+    def reload(self, name: str = SYMPTOM_DATASET, background: bool = True) -> Dict:
+        """
+        Rebuild a dataset from its (possibly updated) sources and swap it in.
+        Only one reload per dataset runs at a time; a request made while one
+        is running returns its status instead of starting another.
+        """
+        with self._lock:
+            if name not in self._factories:
+                raise KeyError(f"Unknown dataset '{name}'")
+            if self._reload_status.get(name, {}).get('state') == 'running':
+                return dict(self._reload_status[name])
+            self._reload_status[name] = {'state': 'running', 'started_at': time.time()}
+
+        if background:
+            threading.Thread(
+                target=self._run_reload,
+                args=(name,),
+                name=f"varma-reload-{name}",
+                daemon=True
+            ).start()
+        else:
+            self._run_reload(name)
+        return self.reload_status(name)
+
+    def _run_reload(self, name: str):
+        start = time.perf_counter()
+        with self._lock:
+            factory = self._factories[name]
+            reloader = self._reloaders.get(name)
+            build_lock = self._build_locks[name]
+
+        try:
+            # Serialised with first builds; readers keep using the current instance
+            with build_lock:
+                current = self.peek(name)
+                if current is None:
+                    replacement = factory()
+                elif reloader is not None:
+                    replacement = reloader(current)
+                else:
+                    replacement = factory()
+
+                with self._lock:
+                    self._instances[name] = replacement
+                    listeners = list(self._swap_listeners)
+
+            swapped = replacement is not current
+            if swapped:
+                for callback in listeners:
+                    try:
+                        callback(name, current, replacement)
+                    except Exception as e:
+                        print(f"WARNING: swap listener failed - {e}")
+
+            status = {
+                'state': 'completed',
+                'swapped': swapped,
+                'previous_version': getattr(current, 'dataset_version', None),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            print(f"✓ Reloaded dataset '{name}' in {status['duration_ms']:.0f}ms"
+                  + ("" if swapped else " (unchanged)"))
+        except Exception as e:
+            status = {
+                'state': 'failed',
+                'error': str(e),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2)
+            }
+            print(f"✗ Reload of dataset '{name}' failed, keeping current data: {e}")
+
+        with self._lock:
+            status['started_at'] = self._reload_status[name].get('started_at')
+            status['finished_at'] = time.time()
+            self._reload_status[name] = status
+
+
+_default_registry: Optional[RetrieverRegistry] = None
+_default_lock = threading.Lock()
+
+
+def default_registry() -> RetrieverRegistry:
+    """Registry shared by everything in this process, with the symptom dataset pre-registered"""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            from .scoring_and_retrieval import DEFAULT_DATA_DIR, DEFAULT_SNAPSHOT_PATH
+            registry = RetrieverRegistry()
+            registry.register_dataset(
+                SYMPTOM_DATASET,
+                varma_symptoms_path=DEFAULT_DATA_DIR / "02_varma_to_symptom.json",
+                symptom_to_varma_path=DEFAULT_DATA_DIR / "02_symptom_to_varma.json",
+                snapshot_path=DEFAULT_SNAPSHOT_PATH
+            )
+            _default_registry = registry
+        return _default_registry
@@ -1,23 +1,63 @@
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 from typing import List, Dict, Tuple
 from difflib import SequenceMatcher
 from .lexical_matching import LexicalMatcher, _normalize_text
 from .semantic_matching import SemanticMatcher
 from .lexical_verification import LexicalVerifier
+from .single_flight import SingleFlight
+from .cascade import CascadePolicy
+from .snapshot import SnapshotError, load_snapshot, save_snapshot, source_hashes, dataset_version
+
+DEFAULT_DATA_DIR = Path(__file__).resolve().parents[2] / "data" / "processed" / "intermediate_outputs"
+DEFAULT_SNAPSHOT_PATH = DEFAULT_DATA_DIR.parent / "varma_retriever.snapshot"
 
 class VarmaRetriever:
-    def __init__(self, varma_symptoms_path: Path, symptom_to_varma_path: Path):
+    def __init__(
+        self,
+        varma_symptoms_path: Path,
+        symptom_to_varma_path: Path,
+        parallel_stages: bool = False,
+        semantic_workers: int = 2,
+        cascade: CascadePolicy = None,
+        store=None
+    ):
+        """
+        `store` is an optional varma_knowledge.VarmaKnowledgeStore. When it was
+        loaded from the same mapping files, its parsed copy is used instead of
+        reading them again, and the response formatters read its records.
+        """
+        self._load_sources(varma_symptoms_path, symptom_to_varma_path, store)
+        
+        print("\nInitializing matchers...")
+        self.lexical_matcher = LexicalMatcher(self.all_symptoms)
+        self.semantic_matcher = SemanticMatcher(self.all_symptoms)
+        self._init_runtime(parallel_stages, semantic_workers, cascade)
+    
+    def _load_sources(self, varma_symptoms_path: Path, symptom_to_varma_path: Path, store=None):
         print(f"Loading Varma data from:")
         print(f"  varma_symptoms: {varma_symptoms_path}")
         print(f"  symptom_to_varma: {symptom_to_varma_path}")
         
-        with open(varma_symptoms_path, 'r', encoding='utf-8') as f:
-            self.varma_data = json.load(f)
+        self.varma_symptoms_path = Path(varma_symptoms_path)
+        self.symptom_to_varma_path = Path(symptom_to_varma_path)
+        self.source_hashes = source_hashes(self.varma_symptoms_path, self.symptom_to_varma_path)
+        self.dataset_version = dataset_version(self.source_hashes)
         
-        with open(symptom_to_varma_path, 'r', encoding='utf-8') as f:
-            self.symptom_to_varma = json.load(f)
+        self.store = store
+        shared = self._shared_sources()
+        if shared is not None:
+            self.varma_data, self.symptom_to_varma = shared
+        else:
+            with open(varma_symptoms_path, 'r', encoding='utf-8') as f:
+                self.varma_data = json.load(f)
+            
+            with open(symptom_to_varma_path, 'r', encoding='utf-8') as f:
+                self.symptom_to_varma = json.load(f)
         
         self.symptom_to_varma_norm: Dict[str, List[str]] = {}
         if isinstance(self.symptom_to_varma, dict):
@@ -49,11 +89,153 @@ class VarmaRetriever:
             self.all_symptoms = []
         
         print(f"Loaded {len(self.all_symptoms)} symptoms and {len(self.varma_data)} varma records")
+    
+    def _shared_sources(self):
+        """The store's parsed mappings when it holds these files, so they are not loaded twice"""
+        if self.store is None:
+            return None
+        return self.store.shared_sources(self.varma_symptoms_path, self.symptom_to_varma_path, self.source_hashes)
+    
+    @classmethod
+    def reload_from(
+        cls,
+        previous: 'VarmaRetriever',
+        varma_symptoms_path: Path = None,
+        symptom_to_varma_path: Path = None,
+        store=None
+    ) -> 'VarmaRetriever':
+        """
+        Build a retriever for updated source files next to a live one. The
+        PubMedBERT model, the embeddings of unchanged symptoms, the cascade
+        policy and the semantic worker pool are taken over from `previous`,
+        which keeps serving until the caller swaps the new instance in.
+        Returns `previous` itself when the source data has not changed.
+        `store` is the knowledge store for the new data (see __init__).
+        """
+        varma_symptoms_path = Path(varma_symptoms_path or previous.varma_symptoms_path)
+        symptom_to_varma_path = Path(symptom_to_varma_path or previous.symptom_to_varma_path)
+        hashes = source_hashes(varma_symptoms_path, symptom_to_varma_path)
+        if dataset_version(hashes) == previous.dataset_version:
+            print(f"Source data unchanged (version {previous.dataset_version}); keeping current retriever")
+            return previous
+        
+        retriever = cls.__new__(cls)
+        retriever._load_sources(varma_symptoms_path, symptom_to_varma_path, store)
         
         print("\nInitializing matchers...")
-        self.lexical_matcher = LexicalMatcher(self.all_symptoms)
-        self.semantic_matcher = SemanticMatcher(self.all_symptoms)
+        retriever.lexical_matcher = LexicalMatcher(retriever.all_symptoms)
+        retriever.semantic_matcher = SemanticMatcher.derive(previous.semantic_matcher, retriever.all_symptoms)
+        retriever._init_runtime(
+            previous.parallel_stages,
+            previous.semantic_workers,
+            previous.cascade,
+            executor=previous._executor
+        )
+        return retriever
+    
+    @classmethod
+    def from_snapshot(
+        cls,
+        snapshot_path: Path = DEFAULT_SNAPSHOT_PATH,
+        varma_symptoms_path: Path = DEFAULT_DATA_DIR / "02_varma_to_symptom.json",
+        symptom_to_varma_path: Path = DEFAULT_DATA_DIR / "02_symptom_to_varma.json",
+        save_on_rebuild: bool = True,
+        store=None,
+        **kwargs
+    ) -> 'VarmaRetriever':
+        """
+        Load a retriever from a snapshot written by save_snapshot(). If the
+        snapshot is missing, corrupt or built from different source data the
+        retriever is rebuilt from the JSON files (and the snapshot refreshed).
+        """
+        start = time.perf_counter()
+        try:
+            state = load_snapshot(snapshot_path, varma_symptoms_path, symptom_to_varma_path)
+        except SnapshotError as e:
+            print(f"Snapshot not usable ({e}); rebuilding retriever from source data")
+            retriever = cls(varma_symptoms_path, symptom_to_varma_path, store=store, **kwargs)
+            if save_on_rebuild:
+                try:
+                    save_snapshot(retriever, snapshot_path)
+                except OSError as write_error:
+                    print(f"WARNING: Could not write snapshot - {write_error}")
+            return retriever
+        
+        retriever = cls.__new__(cls)
+        retriever._restore_state(state, varma_symptoms_path, symptom_to_varma_path, store)
+        print(f"Loaded retriever state from snapshot in {(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        print("\nInitializing matchers...")
+        retriever.semantic_matcher = SemanticMatcher(retriever.all_symptoms, embeddings=state['embeddings'])
+        retriever._init_runtime(**kwargs)
+        return retriever
+    
+    def _restore_state(self, state: Dict, varma_symptoms_path: Path, symptom_to_varma_path: Path, store=None):
+        self.varma_symptoms_path = Path(varma_symptoms_path)
+        self.symptom_to_varma_path = Path(symptom_to_varma_path)
+        self.source_hashes = state['source_hashes']
+        self.dataset_version = dataset_version(self.source_hashes)
+        
+        self.store = store
+        shared = self._shared_sources()
+        if shared is not None:
+            self.varma_data, self.symptom_to_varma = shared
+        else:
+            self.varma_data = state['varma_data']
+            self.symptom_to_varma = state['symptom_to_varma']
+        self.all_symptoms = state['all_symptoms']
+        
+        varma_ids = state['varma_ids']
+        self.symptom_to_varma_norm = {
+            key: [varma_ids[i] for i in ids]
+            for key, ids in state['symptom_to_varma_norm'].items()
+        }
+        self.varma_id_to_record = {
+            vid: {"varma_name": name, "symptoms": self.varma_data[name]}
+            for vid, name in zip(varma_ids, state['varma_names'])
+        }
+        self.lexical_matcher = LexicalMatcher.from_state(self.all_symptoms, state['lexical'])
+    
+    def _init_runtime(
+        self,
+        parallel_stages: bool = False,
+        semantic_workers: int = 2,
+        cascade: CascadePolicy = None,
+        executor: ThreadPoolExecutor = None
+    ):
         self.lexical_verifier = LexicalVerifier()
+        self._single_flight = SingleFlight()
+        
+        # Without an explicit policy the semantic stage always runs when the
+        # gate allows it; only the latency budget can cut it short.
+        self.cascade = cascade or CascadePolicy(early_exit=False)
+
+        # Parallel mode runs the semantic stage speculatively on a worker
+        # thread while lexical matching runs on the request thread.
+        # A reloaded retriever shares its predecessor's pool (see reload_from).
+        self.parallel_stages = parallel_stages
+        self.semantic_workers = semantic_workers
+        if parallel_stages and executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max(semantic_workers, 1),
+                thread_name_prefix="varma-semantic"
+            )
+        self._executor = executor if parallel_stages else None
+        self._stats_lock = threading.Lock()
+        self._stage_stats = {
+            'requests': 0,
+            'semantic_runs': 0,
+            'semantic_skipped_early_exit': 0,
+            'semantic_skipped_budget': 0,
+            'semantic_timeouts': 0,
+            'partial_results': 0,
+            'budget_overruns': 0,
+            'speculative_semantic_started': 0,
+            'speculative_semantic_used': 0,
+            'speculative_semantic_discarded': 0,
+            # Discarded speculative runs that had already started and ran to the end
+            'speculative_semantic_discarded_runs': 0
+        }
         print("Initialization complete\n")
     
     def find_matching_symptoms(
@@ -62,8 +244,101 @@ class VarmaRetriever:
         top_k: int = 15,
         lexical_threshold: float = 0.45,
         semantic_threshold: float = 0.55,
-        verification_threshold: float = 0.3
+        verification_threshold: float = 0.3,
+        parallel: bool = None
     ) -> List[Tuple[str, float, str]]:
+        results, _ = self._find_matching_symptoms(
+            query,
+            top_k,
+            lexical_threshold,
+            semantic_threshold,
+            verification_threshold,
+            parallel=parallel
+        )
+        return results
+    
+    def _timed_semantic_search(self, query: str, top_k: int, threshold: float) -> List[Tuple[str, float]]:
+        matches, elapsed_ms = self._semantic_search_ms(query, top_k, threshold)
+        self._record_semantic_run(elapsed_ms)
+        return matches
+    
+    def _semantic_search_ms(
+        self,
+        query: str,
+        top_k: int,
+        threshold: float
+    ) -> Tuple[List[Tuple[str, float]], float]:
+        """(matches, elapsed ms); the caller decides whether the run counts"""
+        start = time.perf_counter()
+        matches = self.semantic_matcher.find_matches(query, top_k=top_k, threshold=threshold)
+        return matches, (time.perf_counter() - start) * 1000
+    
+    def _record_semantic_run(self, elapsed_ms: float):
+        """A semantic run the stage needed: counted and fed to the cost estimate"""
+        self.cascade.record_semantic_cost(elapsed_ms)
+        self._bump_stat('semantic_runs')
+    
+    def _on_speculative_done(self, future, needed: bool):
+        """Done-callback for a speculative run whose result was not waited for"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        if needed:
+            self._record_semantic_run(future.result()[1])
+        else:
+            self._bump_stat('speculative_semantic_discarded_runs')
+    
+    def _find_matching_symptoms(
+        self,
+        query: str,
+        top_k: int,
+        lexical_threshold: float,
+        semantic_threshold: float,
+        verification_threshold: float,
+        parallel: bool = None,
+        deadline: float = None
+    ) -> Tuple[List[Tuple[str, float, str]], Dict]:
+        """
+        Runs the lexical -> semantic -> verification cascade. Returns the
+        matches plus a dict describing how the semantic stage was handled;
+        'partial' is set when the latency budget cut the semantic stage.
+        """
+        for stage, payload in self._iter_matching_symptoms(
+            query, top_k, lexical_threshold, semantic_threshold, verification_threshold,
+            parallel=parallel, deadline=deadline
+        ):
+            if stage == 'matches':
+                return payload
+    
+    def _iter_matching_symptoms(
+        self,
+        query: str,
+        top_k: int,
+        lexical_threshold: float,
+        semantic_threshold: float,
+        verification_threshold: float,
+        parallel: bool = None,
+        deadline: float = None,
+        progressive: bool = False
+    ):
+        """
+        Generator form of _find_matching_symptoms. With progressive=True it
+        first yields ('lexical', matches) ranked from the lexical stage alone;
+        it always ends with ('matches', (results, stage_info)).
+        """
+        if parallel is None:
+            parallel = self.parallel_stages
+        
+        stage_info = {'semantic_stage': 'not-needed', 'reason': '', 'partial': False}
+        
+        semantic_future = None
+        if parallel and self._executor is not None and self.semantic_matcher.semantic_available:
+            semantic_future = self._executor.submit(
+                self._semantic_search_ms,
+                query,
+                top_k * 3,
+                semantic_threshold
+            )
+            self._bump_stat('speculative_semantic_started')
         
         print("\n[Stage 1] Lexical Matching...")
         lexical_matches = self.lexical_matcher.find_matches(query, lexical_threshold)
@@ -74,20 +349,67 @@ class VarmaRetriever:
         print(f"  Found {len(high_confidence_lexical)} high-confidence matches")
         print(f"  Found {len(low_confidence_lexical)} low-confidence matches")
         
-        verified_semantic = []
+        if progressive:
+            yield 'lexical', self._merge_matches(high_confidence_lexical, [], low_confidence_lexical, top_k)
         
-        if self.semantic_matcher.semantic_available and len(high_confidence_lexical) < top_k:
-            print("\n[Stage 2] Semantic Candidate Expansion...")
-            semantic_matches = self.semantic_matcher.find_matches(
-                query,
-                top_k=top_k * 3,
-                threshold=semantic_threshold
+        run_semantic = self.semantic_matcher.semantic_available and len(high_confidence_lexical) < top_k
+        if run_semantic:
+            skip, reason = self.cascade.should_skip_semantic(
+                self.lexical_matcher.content_terms(query),
+                lexical_matches,
+                self.lexical_matcher.synonym_dict
             )
+            if skip:
+                run_semantic = False
+                stage_info.update(semantic_stage='skipped-early-exit', reason=reason)
+                self._bump_stat('semantic_skipped_early_exit')
+                print(f"\n[Cascade] Skipping semantic stage: {reason}")
+        
+        semantic_matches = None
+        if run_semantic:
+            remaining_ms = None if deadline is None else (deadline - time.perf_counter()) * 1000
+            if semantic_future is not None:
+                try:
+                    timeout = None if remaining_ms is None else max(remaining_ms, 0.0) / 1000
+                    semantic_matches, elapsed_ms = semantic_future.result(timeout=timeout)
+                    self._record_semantic_run(elapsed_ms)
+                    self._bump_stat('speculative_semantic_used')
+                except FutureTimeoutError:
+                    # The stage was needed, so a run that still finishes is its true cost
+                    if not semantic_future.cancel():
+                        semantic_future.add_done_callback(lambda f: self._on_speculative_done(f, needed=True))
+                    stage_info.update(semantic_stage='timed-out', reason='latency budget exhausted', partial=True)
+                    self._bump_stat('semantic_timeouts')
+                    print("\n[Cascade] Semantic stage did not finish within the latency budget")
+            elif remaining_ms is not None and remaining_ms < self.cascade.semantic_cost_ms:
+                stage_info.update(
+                    semantic_stage='skipped-budget',
+                    reason=f"{remaining_ms:.0f}ms left, semantic stage needs ~{self.cascade.semantic_cost_ms:.0f}ms",
+                    partial=True
+                )
+                self._bump_stat('semantic_skipped_budget')
+                print(f"\n[Cascade] Skipping semantic stage: {stage_info['reason']}")
+            else:
+                print("\n[Stage 2] Semantic Candidate Expansion...")
+                semantic_matches = self._timed_semantic_search(query, top_k * 3, semantic_threshold)
+        elif semantic_future is not None:
+            # Gate says the semantic stage is not needed: cancel it if it has
+            # not started yet, otherwise let it finish and drop the result.
+            # Dropped runs stay out of semantic_runs and the cost estimate.
+            if not semantic_future.cancel():
+                semantic_future.add_done_callback(lambda f: self._on_speculative_done(f, needed=False))
+            self._bump_stat('speculative_semantic_discarded')
+        
+        verified_semantic = []
+        
+        if semantic_matches is not None:
+            stage_info['semantic_stage'] = 'completed'
             print(f"  → Found {len(semantic_matches)} semantic candidates")
             
             print("\n[Stage 3] Lexical Verification...")
+            high_confidence_set = {s for s, _ in high_confidence_lexical}
             for symptom, sem_score in semantic_matches:
-                if symptom in dict(high_confidence_lexical):
+                if symptom in high_confidence_set:
                     continue
                 
                 verification_score = self.lexical_verifier.verify(query, symptom)
@@ -98,6 +420,18 @@ class VarmaRetriever:
                 else:
                     print(f"  REJECTED: {symptom[:40]} (sem={sem_score:.3f}, verify={verification_score:.3f})")
         
+        results = self._merge_matches(high_confidence_lexical, verified_semantic, low_confidence_lexical, top_k)
+        
+        print(f"\n[Final] Returning {len(results)} matches")
+        yield 'matches', (results, stage_info)
+    
+    @staticmethod
+    def _merge_matches(
+        high_confidence_lexical: List[Tuple[str, float]],
+        verified_semantic: List[Tuple[str, float, float]],
+        low_confidence_lexical: List[Tuple[str, float]],
+        top_k: int
+    ) -> List[Tuple[str, float, str]]:
         final_results = {}
         match_types = {}
         
@@ -116,10 +450,7 @@ class VarmaRetriever:
                 match_types[s] = 'lexical-partial'
         
         sorted_matches = sorted(final_results.items(), key=lambda x: x[1], reverse=True)[:top_k]
-        results = [(symptom, score, match_types[symptom]) for symptom, score in sorted_matches]
-        
-        print(f"\n[Final] Returning {len(results)} matches")
-        return results
+        return [(symptom, score, match_types[symptom]) for symptom, score in sorted_matches]
     
     def get_varma_points(
         self,
@@ -225,6 +556,14 @@ class VarmaRetriever:
         
         return results
     
+    @staticmethod
+    def request_key(query: str, *params) -> Tuple:
+        """
+        Canonical key for a retrieval request. Casing and whitespace do not
+        change any pipeline stage, so they are folded away here.
+        """
+        return (' '.join(query.lower().split()),) + tuple(params)
+
     def retrieve(
         self,
         query: str,
@@ -232,8 +571,99 @@ class VarmaRetriever:
         top_varmas: int = 5,
         lexical_threshold: float = 0.45,
         semantic_threshold: float = 0.55,
-        verification_threshold: float = 0.3
+        verification_threshold: float = 0.3,
+        latency_budget_ms: float = None
+    ) -> Dict:
+        if latency_budget_ms is None:
+            latency_budget_ms = self.cascade.latency_budget_ms
+        params = (
+            top_symptoms, top_varmas, lexical_threshold, semantic_threshold,
+            verification_threshold, latency_budget_ms
+        )
+        key = self.request_key(query, *params)
+        result = self._single_flight.do(key, self._retrieve, query, *params)
+        if result.get('query') != query:
+            result = dict(result, query=query)
+        return result
+
+    def _bump_stat(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self._stage_stats[name] = self._stage_stats.get(name, 0) + amount
+
+    def get_metrics(self) -> Dict:
+        with self._stats_lock:
+            stages = dict(self._stage_stats)
+        requests = stages['requests']
+        skipped = stages['semantic_skipped_early_exit'] + stages['semantic_skipped_budget']
+        return {
+            'single_flight': self._single_flight.get_stats(),
+            'parallel_stages': self.parallel_stages,
+            'stages': stages,
+            'cascade': {
+                'early_exit': self.cascade.early_exit,
+                'latency_budget_ms': self.cascade.latency_budget_ms,
+                'semantic_skip_rate': round(skipped / requests, 4) if requests else 0.0,
+                'budget_overrun_rate': round(stages['budget_overruns'] / requests, 4) if requests else 0.0,
+                'semantic_cost_estimate_ms': round(self.cascade.semantic_cost_ms, 2)
+            }
+        }
+
+    def retrieve_stream(
+        self,
+        query: str,
+        top_symptoms: int = 15,
+        top_varmas: int = 5,
+        lexical_threshold: float = 0.45,
+        semantic_threshold: float = 0.55,
+        verification_threshold: float = 0.3,
+        latency_budget_ms: float = None
+    ):
+        """
+        Progressive retrieve(): yields (stage, result) pairs, where result has
+        the same shape as retrieve()'s. 'lexical' is a first ranking from the
+        lexical stage alone, 'semantic' follows once semantic expansion and
+        verification have run, and 'final' is exactly what retrieve() returns.
+        Stages that do not change the answer are not emitted.
+        """
+        if latency_budget_ms is None:
+            latency_budget_ms = self.cascade.latency_budget_ms
+        yield from self._iter_retrieve(
+            query, top_symptoms, top_varmas, lexical_threshold, semantic_threshold,
+            verification_threshold, latency_budget_ms, progressive=True
+        )
+
+    def _retrieve(
+        self,
+        query: str,
+        top_symptoms: int,
+        top_varmas: int,
+        lexical_threshold: float,
+        semantic_threshold: float,
+        verification_threshold: float,
+        latency_budget_ms: float = None
     ) -> Dict:
+        for stage, result in self._iter_retrieve(
+            query, top_symptoms, top_varmas, lexical_threshold, semantic_threshold,
+            verification_threshold, latency_budget_ms
+        ):
+            if stage == 'final':
+                return result
+
+    def _iter_retrieve(
+        self,
+        query: str,
+        top_symptoms: int,
+        top_varmas: int,
+        lexical_threshold: float,
+        semantic_threshold: float,
+        verification_threshold: float,
+        latency_budget_ms: float = None,
+        progressive: bool = False
+    ):
+        
+        start = time.perf_counter()
+        deadline = start + latency_budget_ms / 1000 if latency_budget_ms else None
+        self._bump_stat('requests')
         
         print(f"\n{'='*80}")
         print(f"Analyzing query: '{query}'")
@@ -242,21 +672,35 @@ class VarmaRetriever:
         keywords = self.lexical_matcher.extract_keywords(query)
         num_query_symptoms = max(len([k for k in keywords if len(k.split()) == 1 and len(k) > 2]), 1)
 
-        matched_symptoms = self.find_matching_symptoms(
+        for stage, payload in self._iter_matching_symptoms(
             query,
-            top_k=top_symptoms,
-            lexical_threshold=lexical_threshold,
-            semantic_threshold=semantic_threshold,
-            verification_threshold=verification_threshold
-        )
+            top_symptoms,
+            lexical_threshold,
+            semantic_threshold,
+            verification_threshold,
+            deadline=deadline,
+            progressive=progressive
+        ):
+            if stage == 'lexical':
+                lexical_matches = payload
+                yield 'lexical', self._build_result(
+                    query,
+                    lexical_matches,
+                    self._rank_varmas(lexical_matches, num_query_symptoms, top_varmas),
+                    {'semantic_stage': 'pending', 'partial': True}
+                )
+            elif stage == 'matches':
+                matched_symptoms, stage_info = payload
+        
+        if stage_info['partial']:
+            self._bump_stat('partial_results')
         
         if not matched_symptoms:
-            return {
-                'query': query,
-                'matched_symptoms': [],
-                'varma_points': [],
-                'message': 'No matching symptoms found. Try rephrasing your query.'
-            }
+            self._record_budget(start, latency_budget_ms)
+            result = self._build_result(query, [], [], stage_info)
+            result['message'] = 'No matching symptoms found. Try rephrasing your query.'
+            yield 'final', result
+            return
 
         print(f"\n{'='*80}")
         print(f"Top {len(matched_symptoms)} Matching Symptoms:")
@@ -264,6 +708,55 @@ class VarmaRetriever:
         for symptom, score, match_type in matched_symptoms:
             print(f"{symptom:<45} (score: {score:.3f}, {match_type})")
 
+        if progressive and stage_info['semantic_stage'] == 'completed':
+            # Refined symptom ranking, sent before the Varma aggregation
+            yield 'semantic', self._build_result(query, matched_symptoms, None, stage_info)
+
+        varma_list = self._rank_varmas(matched_symptoms, num_query_symptoms, top_varmas)
+
+        print(f"\n{'='*80}")
+        print(f"Top {len(varma_list)} Varma Points:")
+        print(f"{'='*80}")
+        for i, varma in enumerate(varma_list, 1):
+            confidence = "HIGH" if varma['exact_count'] > 0 else "MEDIUM"
+            print(f"\n{i}. {varma['varma_name']} (ID: {varma['varma_id']}) [{confidence}]")
+            print(f"   Matched: {varma['matched_symptom_count']}/{varma['total_symptoms']} ({varma['match_percentage']}%)")
+            print(f"   Exact: {varma['exact_count']}, Verified: {varma['verified_count']}, Partial: {varma['partial_count']}")
+            print(f"   Confidence Score: {varma['weighted_score']:.2f} | Avg Quality: {varma['avg_match_quality']:.2f}")
+            print(f"   Symptoms: {', '.join(varma['matched_symptoms'][:5])}")
+            if len(varma['matched_symptoms']) > 5:
+                print(f"           ... and {len(varma['matched_symptoms']) - 5} more")
+        
+        self._record_budget(start, latency_budget_ms)
+        
+        yield 'final', self._build_result(query, matched_symptoms, varma_list, stage_info)
+    
+    @staticmethod
+    def _build_result(
+        query: str,
+        matched_symptoms: List[Tuple[str, float, str]],
+        varma_list: List[Dict],
+        stage_info: Dict
+    ) -> Dict:
+        result = {
+            'query': query,
+            'matched_symptoms': [
+                {'symptom': s, 'combined_score': score, 'match_type': mtype}
+                for s, score, mtype in matched_symptoms
+            ],
+            'partial': stage_info['partial'],
+            'semantic_stage': stage_info['semantic_stage']
+        }
+        if varma_list is not None:
+            result['varma_points'] = varma_list
+        return result
+    
+    def _rank_varmas(
+        self,
+        matched_symptoms: List[Tuple[str, float, str]],
+        num_query_symptoms: int,
+        top_varmas: int
+    ) -> List[Dict]:
         varma_results = self.get_varma_points(matched_symptoms, num_query_symptoms)
 
         ranked = sorted(
@@ -295,28 +788,11 @@ class VarmaRetriever:
                 'partial_count': info['partial_count'],
                 'avg_match_quality': info.get('avg_match_quality', 0.0)
             })
-
-        print(f"\n{'='*80}")
-        print(f"Top {len(varma_list)} Varma Points:")
-        print(f"{'='*80}")
-        for i, varma in enumerate(varma_list, 1):
-            confidence = "HIGH" if varma['exact_count'] > 0 else "MEDIUM"
-            print(f"\n{i}. {varma['varma_name']} (ID: {varma['varma_id']}) [{confidence}]")
-            print(f"   Matched: {varma['matched_symptom_count']}/{varma['total_symptoms']} ({varma['match_percentage']}%)")
-            print(f"   Exact: {varma['exact_count']}, Verified: {varma['verified_count']}, Partial: {varma['partial_count']}")
-            print(f"   Confidence Score: {varma['weighted_score']:.2f} | Avg Quality: {varma['avg_match_quality']:.2f}")
-            print(f"   Symptoms: {', '.join(varma['matched_symptoms'][:5])}")
-            if len(varma['matched_symptoms']) > 5:
-                print(f"           ... and {len(varma['matched_symptoms']) - 5} more")
-        
-        return {
-            'query': query,
-            'matched_symptoms': [
-                {'symptom': s, 'combined_score': score, 'match_type': mtype}
-                for s, score, mtype in matched_symptoms
-            ],
-            'varma_points': varma_list
-        }
+        return varma_list
+    
+    def _record_budget(self, start: float, latency_budget_ms: float):
+        if latency_budget_ms and (time.perf_counter() - start) * 1000 > latency_budget_ms:
+            self._bump_stat('budget_overruns')
 
 def compute_confidence(weighted_score: float = None, top_symptom_score: float = None, scale: float = 5.0) -> float:
     try:
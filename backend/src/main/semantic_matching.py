@@ -1,28 +1,50 @@
+import importlib.util
 import numpy as np
 from typing import List, Tuple, Optional
 
-semantic_available = True
-try:
-    from transformers import AutoTokenizer, AutoModel
-    import torch
-except Exception:
-    print("WARNING: transformers/torch not available. Semantic matching disabled.")
-    AutoTokenizer = None
-    AutoModel = None
-    torch = None
-    semantic_available = False
+# transformers/torch/sklearn are imported on first use (see _load_backend) so
+# importing this module stays cheap for lexical-only use and CLI tools.
+semantic_available = all(
+    importlib.util.find_spec(name) is not None
+    for name in ("transformers", "torch", "sklearn")
+)
+AutoTokenizer = None
+AutoModel = None
+torch = None
+cosine_similarity = None
 
-try:
-    from sklearn.metrics.pairwise import cosine_similarity
-except Exception:
-    print("WARNING: sklearn not available. Semantic matching disabled.")
-    cosine_similarity = None
-    semantic_available = False
+def _load_backend() -> bool:
+    global AutoTokenizer, AutoModel, torch, cosine_similarity, semantic_available
+    if not semantic_available:
+        return False
+    if torch is not None and cosine_similarity is not None:
+        return True
+    
+    try:
+        from transformers import AutoTokenizer as _AutoTokenizer, AutoModel as _AutoModel
+        import torch as _torch
+    except Exception:
+        print("WARNING: transformers/torch not available. Semantic matching disabled.")
+        semantic_available = False
+        return False
+    
+    try:
+        from sklearn.metrics.pairwise import cosine_similarity as _cosine_similarity
+    except Exception:
+        print("WARNING: sklearn not available. Semantic matching disabled.")
+        semantic_available = False
+        return False
+    
+    AutoTokenizer, AutoModel, torch = _AutoTokenizer, _AutoModel, _torch
+    cosine_similarity = _cosine_similarity
+    return True
+
+MODEL_NAME = "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"
 
 class SemanticMatcher:
-    def __init__(self, all_symptoms: List[str]):
+    def __init__(self, all_symptoms: List[str], embeddings: Optional[np.ndarray] = None):
         self.all_symptoms = all_symptoms
-        self.semantic_available = semantic_available
+        self.semantic_available = _load_backend()
         self.tokenizer = None
         self.model = None
         self.symptom_embeddings = None
@@ -30,19 +52,19 @@ class SemanticMatcher:
         if self.semantic_available:
             try:
                 print("Loading PubMedBERT model...")
-                self.tokenizer = AutoTokenizer.from_pretrained(
-                    "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"
-                )
-                self.model = AutoModel.from_pretrained(
-                    "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract-fulltext"
-                )
+                self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                self.model = AutoModel.from_pretrained(MODEL_NAME)
                 if self.model is not None and torch is not None:
                     self.model.eval()
                 print("✓ PubMedBERT loaded successfully")
                 
-                print("Computing symptom embeddings...")
-                self.symptom_embeddings = self._compute_embeddings(all_symptoms)
-                print(f"Computed embeddings for {len(all_symptoms)} symptoms")
+                if embeddings is not None and embeddings.shape[0] == len(all_symptoms):
+                    self.symptom_embeddings = embeddings
+                    print(f"Using precomputed embeddings for {len(all_symptoms)} symptoms")
+                else:
+                    print("Computing symptom embeddings...")
+                    self.symptom_embeddings = self._compute_embeddings(all_symptoms)
+                    print(f"Computed embeddings for {len(all_symptoms)} symptoms")
                 
             except Exception as e:
                 print(f"WARNING: Could not load PubMedBERT - {e}")
@@ -52,6 +74,38 @@ class SemanticMatcher:
         else:
             print("Semantic matching disabled (missing dependencies)")
     
+    @classmethod
+    def derive(cls, previous: 'SemanticMatcher', all_symptoms: List[str]) -> 'SemanticMatcher':
+        """
+        Matcher for an updated symptom list that shares the loaded model with
+        `previous` and reuses its embeddings for symptoms it already knows;
+        only new symptoms are encoded.
+        """
+        if previous is None or not previous.semantic_available or previous.model is None:
+            return cls(all_symptoms)
+        
+        matcher = cls.__new__(cls)
+        matcher.all_symptoms = all_symptoms
+        matcher.semantic_available = True
+        matcher.tokenizer = previous.tokenizer
+        matcher.model = previous.model
+        
+        known = {}
+        if previous.symptom_embeddings is not None:
+            known = {symptom: i for i, symptom in enumerate(previous.all_symptoms)}
+        new_symptoms = [s for s in all_symptoms if s not in known]
+        new_embeddings = dict(zip(new_symptoms, matcher._compute_embeddings(new_symptoms))) if new_symptoms else {}
+        
+        if all_symptoms:
+            matcher.symptom_embeddings = np.stack([
+                previous.symptom_embeddings[known[s]] if s in known else new_embeddings[s]
+                for s in all_symptoms
+            ])
+        else:
+            matcher.symptom_embeddings = None
+        print(f"Reused embeddings for {len(all_symptoms) - len(new_symptoms)} symptoms, computed {len(new_symptoms)}")
+        return matcher
+    
     def _get_embedding(self, text: str) -> np.ndarray:
         if not self.semantic_available or self.tokenizer is None or self.model is None:
             raise RuntimeError("Semantic model not available")
@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+    Callers that arrive while a call is in flight block until it finishes
+    and receive the same result (or exception). Results are shared, so
+    callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self.total_calls = 0
+        self.executions = 0
+        self.coalesced_waiters = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self.total_calls += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executions += 1
+                is_leader = True
+            else:
+                call.waiters += 1
+                self.coalesced_waiters += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'total_calls': self.total_calls,
+                'executions': self.executions,
+                'coalesced_waiters': self.coalesced_waiters,
+                'max_waiters_per_call': self.max_waiters,
+                'in_flight': len(self._calls)
+            }
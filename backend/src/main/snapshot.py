@@ -0,0 +1,192 @@
+"""
+Fast-start snapshots of a fully initialised VarmaRetriever.
+
+A snapshot is a single file:
+
+    MAGIC (8 bytes) | format version (uint32) | header length (uint64)
+    | JSON header | zero padding to a 64-byte boundary | float32 embeddings
+
+The JSON header holds the parsed source data, the normalised lookup maps,
+the lexical inverted index and the compiled synonym tables, together with
+SHA-256 hashes of the source JSON files. The embedding matrix is stored raw
+so it can be memory-mapped instead of read into each process's heap.
+
+Build one from the backend directory with:
+
+    python -m src.main.snapshot
+"""
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from .semantic_matching import MODEL_NAME
+
+MAGIC = b"VARMASNP"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sIQ")
+_ALIGNMENT = 64
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, corrupt, outdated or stale"""
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hashes(varma_symptoms_path: Path, symptom_to_varma_path: Path) -> Dict[str, str]:
+    return {
+        'varma_symptoms': file_sha256(varma_symptoms_path),
+        'symptom_to_varma': file_sha256(symptom_to_varma_path)
+    }
+
+
+def dataset_version(hashes: Dict[str, str]) -> str:
+    """Short, stable identifier for a pair of source files"""
+    combined = hashlib.sha256(
+        (hashes['varma_symptoms'] + hashes['symptom_to_varma']).encode('ascii')
+    )
+    return combined.hexdigest()[:16]
+
+
+def save_snapshot(retriever, snapshot_path: Path) -> Path:
+    """Write the retriever's initialised state to snapshot_path (atomically)"""
+    snapshot_path = Path(snapshot_path)
+    all_symptoms = retriever.all_symptoms
+    varma_ids = list(retriever.varma_id_to_record.keys())
+    varma_index = {vid: i for i, vid in enumerate(varma_ids)}
+    extra_ids = []
+    symptom_to_varma_norm = {}
+    for key, ids in retriever.symptom_to_varma_norm.items():
+        interned = []
+        for vid in ids:
+            if vid not in varma_index:
+                varma_index[vid] = len(varma_ids) + len(extra_ids)
+                extra_ids.append(vid)
+            interned.append(varma_index[vid])
+        symptom_to_varma_norm[key] = interned
+
+    embeddings = retriever.semantic_matcher.symptom_embeddings
+    if embeddings is not None:
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source_hashes': retriever.source_hashes,
+        'varma_data': retriever.varma_data,
+        'symptom_to_varma': retriever.symptom_to_varma,
+        'all_symptoms': all_symptoms,
+        'varma_ids': varma_ids + extra_ids,
+        'varma_names': [retriever.varma_id_to_record[vid]['varma_name'] for vid in varma_ids],
+        'symptom_to_varma_norm': symptom_to_varma_norm,
+        'lexical': retriever.lexical_matcher.to_state(),
+        'embeddings': None if embeddings is None else {
+            'model': MODEL_NAME,
+            'shape': list(embeddings.shape),
+            'dtype': 'float32'
+        }
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_offset = _PREFIX.size + len(header_bytes)
+    padding = (-data_offset) % _ALIGNMENT
+
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * padding)
+        if embeddings is not None:
+            f.write(embeddings.tobytes())
+    os.replace(tmp_path, snapshot_path)
+
+    print(f"Saved retriever snapshot → {snapshot_path}")
+    return snapshot_path
+
+
+def load_snapshot(
+    snapshot_path: Path,
+    varma_symptoms_path: Path,
+    symptom_to_varma_path: Path,
+    mmap: bool = True
+) -> Dict:
+    """
+    Read a snapshot and check it against the current source files.
+    Returns the header dict with 'embeddings' replaced by the (memory-mapped)
+    matrix, or None if the snapshot was built without embeddings.
+    """
+    snapshot_path = Path(snapshot_path)
+    if not snapshot_path.exists():
+        raise SnapshotError(f"no snapshot at {snapshot_path}")
+
+    with open(snapshot_path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise SnapshotError("truncated snapshot")
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise SnapshotError("not a retriever snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"snapshot format {version}, expected {FORMAT_VERSION}")
+        try:
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        except ValueError as e:
+            raise SnapshotError(f"corrupt snapshot header: {e}")
+
+    current = source_hashes(varma_symptoms_path, symptom_to_varma_path)
+    if header.get('source_hashes') != current:
+        raise SnapshotError("source data changed since the snapshot was built")
+
+    meta = header.get('embeddings')
+    if meta and meta.get('model') != MODEL_NAME:
+        print(f"Snapshot embeddings were built with {meta.get('model')}; they will be recomputed")
+        meta = None
+    if meta:
+        data_offset = _PREFIX.size + header_len
+        data_offset += (-data_offset) % _ALIGNMENT
+        shape = tuple(meta['shape'])
+        expected = data_offset + int(np.prod(shape)) * 4
+        if os.path.getsize(snapshot_path) < expected:
+            raise SnapshotError("truncated embedding matrix")
+        if mmap:
+            header['embeddings'] = np.memmap(
+                snapshot_path, dtype=np.float32, mode='r', offset=data_offset, shape=shape
+            )
+        else:
+            with open(snapshot_path, 'rb') as f:
+                f.seek(data_offset)
+                header['embeddings'] = np.fromfile(f, dtype=np.float32, count=int(np.prod(shape))).reshape(shape)
+    else:
+        header['embeddings'] = None
+
+    return header
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.main.scoring_and_retrieval import VarmaRetriever, DEFAULT_DATA_DIR, DEFAULT_SNAPSHOT_PATH
+
+    data_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATA_DIR
+    out_path = Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SNAPSHOT_PATH
+
+    start = time.perf_counter()
+    retriever = VarmaRetriever(
+        varma_symptoms_path=data_dir / "02_varma_to_symptom.json",
+        symptom_to_varma_path=data_dir / "02_symptom_to_varma.json"
+    )
+    save_snapshot(retriever, out_path)
+    print(f"Snapshot built in {time.perf_counter() - start:.2f}s")
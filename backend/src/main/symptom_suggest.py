@@ -0,0 +1,209 @@
+"""
+Symptom autocomplete for /api/symptoms/suggest.
+
+The vocabulary is every symptom in 02_symptom_to_varma.json plus the
+MedicalSynonymDict surface forms that lead to one of them. It is compiled
+into a character trie in which every node keeps its best-ranked entries,
+so an exact prefix costs one walk of len(prefix) steps. When the prefix
+has no hits, a bounded edit-distance walk over the same trie tolerates
+typos ("hedach" -> "headache").
+
+Entries are ranked by how many Varma points list the symptom. Prefixes of
+the first word rank above prefixes of later words ("pain" finds
+"pain in the chest" before "neck pain").
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .lexical_matching import _normalize_text
+from .medical_synonyms import MedicalSynonymDict
+
+MAX_SUGGESTIONS = 20
+FUZZY_MIN_PREFIX = 3
+FUZZY_WIDE_PREFIX = 7
+
+
+class SymptomSuggester:
+    """Prefix trie over symptom surface forms, ranked by Varma frequency"""
+
+    def __init__(
+        self,
+        symptom_to_varma: Dict[str, List[str]],
+        synonym_dict: Optional[MedicalSynonymDict] = None,
+        top_per_node: int = MAX_SUGGESTIONS
+    ):
+        # Entry i: display text, the dataset symptom it stands for, Varma count
+        self.texts: List[str] = []
+        self.symptoms: List[str] = []
+        self.counts: List[int] = []
+        self.top_per_node = top_per_node
+
+        by_norm: Dict[str, int] = {}
+        for symptom, varmas in symptom_to_varma.items():
+            norm = _normalize_text(symptom)
+            if not norm:
+                continue
+            count = len(set(varmas)) if isinstance(varmas, list) else 1
+            if norm in by_norm:
+                i = by_norm[norm]
+                self.counts[i] = max(self.counts[i], count)
+                continue
+            by_norm[norm] = self._add(symptom, symptom, count)
+
+        if synonym_dict is not None:
+            for canonical, forms in synonym_dict.synonym_groups.items():
+                group = {_normalize_text(f) for f in forms} | {_normalize_text(canonical)}
+                in_vocab = [by_norm[f] for f in group if f in by_norm]
+                if not in_vocab:
+                    continue
+                best = max(in_vocab, key=lambda i: (self.counts[i], self.texts[i]))
+                for form in sorted(group):
+                    if form and form not in by_norm:
+                        by_norm[form] = self._add(form, self.symptoms[best], self.counts[best])
+
+        self._build_trie(by_norm)
+
+    def _add(self, text: str, symptom: str, count: int) -> int:
+        self.texts.append(text)
+        self.symptoms.append(symptom)
+        self.counts.append(count)
+        return len(self.texts) - 1
+
+    def _build_trie(self, by_norm: Dict[str, int]):
+        # Node n: children[n] maps a character to a node, top[n] holds entry ids
+        self._children: List[Dict[str, int]] = [{}]
+        candidates: List[List[Tuple[tuple, int]]] = [[]]
+
+        for norm, entry in by_norm.items():
+            words = norm.split(' ')
+            start = 0
+            for word_pos, word in enumerate(words):
+                key = norm[start:]
+                rank = (word_pos > 0, -self.counts[entry], len(norm), norm)
+                node = 0
+                for ch in key:
+                    nxt = self._children[node].get(ch)
+                    if nxt is None:
+                        nxt = len(self._children)
+                        self._children[node][ch] = nxt
+                        self._children.append({})
+                        candidates.append([])
+                    node = nxt
+                    candidates[node].append((rank, entry))
+                start += len(word) + 1
+
+        self._top: List[Tuple[Tuple[tuple, int], ...]] = []
+        for ranked in candidates:
+            ranked.sort()
+            seen = set()
+            kept = []
+            for rank, entry in ranked:
+                if entry in seen:
+                    continue
+                seen.add(entry)
+                kept.append((rank, entry))
+                if len(kept) >= self.top_per_node:
+                    break
+            self._top.append(tuple(kept))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _exact(self, prefix: str) -> Optional[int]:
+        node = 0
+        for ch in prefix:
+            node = self._children[node].get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _fuzzy(self, prefix: str, max_distance: int) -> Dict[int, int]:
+        """
+        Nodes whose path is within max_distance edits of prefix -> distance.
+        Levenshtein rows are filled only inside the diagonal band
+        |column - depth| <= max_distance; cells outside it can never be
+        within the bound.
+        """
+        n = len(prefix)
+        out_of_band = max_distance + 1
+        matches: Dict[int, int] = {}
+        first_row = [col if col <= max_distance else out_of_band for col in range(n + 1)]
+        stack = [(node, ch, 1, first_row) for ch, node in self._children[0].items()]
+
+        while stack:
+            node, ch, depth, prev_row = stack.pop()
+            row = [out_of_band] * (n + 1)
+            if depth <= max_distance:
+                row[0] = depth
+            best = row[0]
+            for col in range(max(1, depth - max_distance), min(n, depth + max_distance) + 1):
+                cost = 0 if prefix[col - 1] == ch else 1
+                value = min(row[col - 1] + 1, prev_row[col] + 1, prev_row[col - 1] + cost)
+                row[col] = value
+                if value < best:
+                    best = value
+
+            if row[n] <= max_distance:
+                # The node's top list already covers its whole subtree
+                if row[n] < matches.get(node, out_of_band):
+                    matches[node] = row[n]
+            elif best <= max_distance:
+                stack.extend((child, c, depth + 1, row) for c, child in self._children[node].items())
+        return matches
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        prefix = _normalize_text(query)
+        limit = max(1, min(limit, self.top_per_node))
+        if not prefix:
+            return []
+
+        node = self._exact(prefix)
+        if node is not None and self._top[node]:
+            ranked = [((0,) + rank, entry, 'prefix') for rank, entry in self._top[node]]
+        elif len(prefix) >= FUZZY_MIN_PREFIX:
+            # One edit first; longer prefixes may widen to two if that finds nothing
+            fuzzy_nodes = self._fuzzy(prefix, 1)
+            if not fuzzy_nodes and len(prefix) >= FUZZY_WIDE_PREFIX:
+                fuzzy_nodes = self._fuzzy(prefix, 2)
+            ranked = [
+                ((distance,) + rank, entry, 'fuzzy')
+                for fuzzy_node, distance in fuzzy_nodes.items()
+                for rank, entry in self._top[fuzzy_node]
+            ]
+            ranked.sort()
+        else:
+            ranked = []
+
+        suggestions = []
+        seen = set()
+        for _, entry, match in ranked:
+            if entry in seen:
+                continue
+            seen.add(entry)
+            suggestions.append({
+                'text': self.texts[entry],
+                'symptom': self.symptoms[entry],
+                'varma_count': self.counts[entry],
+                'match': match
+            })
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+_suggester_lock = threading.Lock()
+
+
+def suggester_for(retriever) -> SymptomSuggester:
+    """Suggester for a retriever's dataset, built once and kept on the retriever"""
+    suggester = getattr(retriever, '_symptom_suggester', None)
+    if suggester is not None:
+        return suggester
+    with _suggester_lock:
+        suggester = getattr(retriever, '_symptom_suggester', None)
+        if suggester is None:
+            synonym_dict = getattr(retriever.lexical_matcher, 'synonym_dict', None)
+            suggester = SymptomSuggester(retriever.symptom_to_varma, synonym_dict)
+            retriever._symptom_suggester = suggester
+    return suggester
@@ -0,0 +1,168 @@
+"""
+Precomputed Varma point catalog behind /api/varma-points.
+
+The catalog is built once per dataset version from the metadata table and
+indexed by category, body region and name, so a filtered page is a few set
+lookups and a slice. Encoded pages are cached per query, and the dataset
+version doubles as the validator for conditional GETs.
+"""
+
+import bisect
+import re
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .varma_metadata import VarmaMetadataTable, metadata_table
+
+CATALOG_FIELDS = ('id', 'name', 'category', 'location', 'coordinates', 'symptom_count')
+DEFAULT_FIELDS = ('name', 'category', 'location')
+MAX_PAGE_SIZE = 500
+
+
+class VarmaCatalog:
+    """Immutable, indexed list of Varma points for one dataset version"""
+
+    def __init__(self, table: VarmaMetadataTable, last_modified: float = None, cache_size: int = 256):
+        self.dataset_version = table.dataset_version or "unversioned"
+        self.etag = f'"{self.dataset_version}"'
+        # Whole seconds, as HTTP dates have no finer resolution
+        self.last_modified_ts = int(last_modified) if last_modified else None
+        self.last_modified = formatdate(self.last_modified_ts, usegmt=True) if last_modified else None
+
+        self.points: Tuple[Dict, ...] = tuple(
+            {
+                'id': meta.varma_id,
+                'name': meta.name,
+                'category': meta.category,
+                'location': meta.location,
+                'coordinates': meta.coordinates_dict(),
+                'symptom_count': meta.symptom_count
+            }
+            for meta in table
+        )
+
+        by_category: Dict[str, List[int]] = {}
+        by_location: Dict[str, List[int]] = {}
+        for pos, point in enumerate(self.points):
+            by_category.setdefault(point['category'].lower(), []).append(pos)
+            by_location.setdefault(point['location'].lower(), []).append(pos)
+        self._by_category = {k: frozenset(v) for k, v in by_category.items()}
+        self._by_location = {k: frozenset(v) for k, v in by_location.items()}
+
+        # Location word -> positions, narrowing region filters before the phrase check
+        by_location_word: Dict[str, set] = {}
+        for location, positions in self._by_location.items():
+            for word in set(re.findall(r'\w+', location)):
+                by_location_word.setdefault(word, set()).update(positions)
+        self._by_location_word = {k: frozenset(v) for k, v in by_location_word.items()}
+
+        # (lowercased name, position) sorted for prefix search with bisect
+        self._names = sorted((p['name'].lower(), pos) for pos, p in enumerate(self.points))
+        self._name_keys = [name for name, _ in self._names]
+
+        counts: Dict[str, int] = {}
+        for point in self.points:
+            counts[point['category']] = counts.get(point['category'], 0) + 1
+        self.categories = dict(sorted(counts.items()))
+
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[tuple, object]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _prefix_positions(self, prefix: str) -> frozenset:
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._name_keys, prefix)
+        end = bisect.bisect_left(self._name_keys, prefix + '\uffff')
+        return frozenset(pos for _, pos in self._names[start:end])
+
+    def _region_positions(self, region: str) -> frozenset:
+        """Points whose body location mentions `region` as whole words (e.g. 'neck', 'knee joint')"""
+        region = region.lower()
+        words = re.findall(r'\w+', region)
+        if not words:
+            return frozenset()
+        candidates = frozenset.intersection(
+            *(self._by_location_word.get(word, frozenset()) for word in words)
+        )
+        # Every word is there; keep the locations that have them as one phrase
+        return frozenset(pos for pos in candidates if region in self.points[pos]['location'].lower())
+
+    def query(
+        self,
+        category: str = None,
+        region: str = None,
+        prefix: str = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        fields: List[str] = None
+    ) -> Dict:
+        selected = None
+        if category:
+            selected = self._by_category.get(category.lower(), frozenset())
+        if region:
+            positions = self._region_positions(region)
+            selected = positions if selected is None else selected & positions
+        if prefix:
+            positions = self._prefix_positions(prefix)
+            selected = positions if selected is None else selected & positions
+
+        ordered = range(len(self.points)) if selected is None else sorted(selected)
+        total = len(ordered)
+
+        offset = max(0, offset)
+        end = total if limit is None else min(total, offset + limit)
+        keep = [f for f in (fields or DEFAULT_FIELDS) if f in CATALOG_FIELDS]
+
+        page = [{f: self.points[pos][f] for f in keep} for pos in ordered[offset:end]]
+        return {
+            'varma_points': page,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'next_offset': end if end < total else None,
+            'categories': self.categories,
+            'dataset_version': self.dataset_version
+        }
+
+    def cached(self, key: tuple, build):
+        """Memoise an encoded page per normalised query (bounded, LRU)"""
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = build()
+        with self._cache_lock:
+            self._cache[key] = value
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+
+_catalog_lock = threading.Lock()
+
+
+def _source_mtime(retriever) -> Optional[float]:
+    mtimes = []
+    for attr in ('varma_symptoms_path', 'symptom_to_varma_path'):
+        path = getattr(retriever, attr, None)
+        try:
+            mtimes.append(Path(path).stat().st_mtime)
+        except (TypeError, OSError):
+            continue
+    return max(mtimes) if mtimes else None
+
+
+def catalog_for(retriever) -> VarmaCatalog:
+    """Catalog for a retriever's dataset, built once and kept on the retriever"""
+    catalog = getattr(retriever, '_varma_catalog', None)
+    if catalog is not None:
+        return catalog
+    with _catalog_lock:
+        catalog = getattr(retriever, '_varma_catalog', None)
+        if catalog is None:
+            catalog = VarmaCatalog(metadata_table(retriever), last_modified=_source_mtime(retriever))
+            retriever._varma_catalog = catalog
+    return catalog
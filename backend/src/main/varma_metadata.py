@@ -0,0 +1,214 @@
+"""
+Presentation metadata for Varma points (body location, 2D coordinates,
+region category, description, treatment notes).
+
+Everything is resolved once per dataset into an immutable table keyed by
+varma id, so formatting a search result is a dictionary lookup instead of
+substring scans over the keyword maps for every returned point.
+"""
+
+import threading
+import zlib
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Tuple
+
+from .lexical_matching import _normalize_text
+
+LOCATION_MAP = {
+    "adhipathi": "Crown of the head",
+    "shankha": "Temple region (both sides)",
+    "krikatika": "Back of the neck",
+    "sthapani": "Between the eyebrows",
+    "apanga": "Outer corner of the eye",
+    "phana": "Nostril region",
+    "vidhura": "Behind the ear",
+    "hridaya": "Heart region",
+    "nabhi": "Navel region",
+    "basti": "Lower abdomen",
+    "guda": "Rectal region",
+    "lohitaksha": "Armpit",
+    "kakshadhara": "Shoulder region",
+    "kurpara": "Elbow joint",
+    "manibandha": "Wrist joint",
+    "kshipra": "Between thumb and index finger",
+    "tala": "Palm center",
+    "vitapa": "Groin region",
+    "janu": "Knee joint",
+    "gulpha": "Ankle joint",
+    "pada": "Foot region"
+}
+DEFAULT_LOCATION = "Body region (location varies)"
+
+COORDINATE_MAP = {
+    "adhipathi": (100, 40),
+    "shankha": (70, 45),
+    "krikatika": (100, 80),
+    "sthapani": (100, 50),
+    "hridaya": (100, 120),
+    "nabhi": (100, 160),
+    "basti": (100, 180),
+    "lohitaksha": (50, 100),
+    "kurpara": (40, 130),
+    "manibandha": (30, 160),
+    "janu": (85, 240),
+    "gulpha": (85, 280)
+}
+# Unmapped points are placed inside this box, at a position derived from the name
+FALLBACK_X_RANGE = (50, 150)
+FALLBACK_Y_RANGE = (80, 250)
+
+CATEGORY_TERMS = (
+    ("Head & Neck", ('adhipathi', 'shankha', 'sthapani', 'krikatika', 'apanga', 'phana', 'vidhura')),
+    ("Upper Body", ('hridaya', 'lohitaksha', 'kakshadhara', 'kurpara', 'manibandha')),
+    ("Abdomen & Pelvis", ('nabhi', 'basti', 'guda', 'vitapa')),
+    ("Lower Body", ('janu', 'gulpha', 'pada'))
+)
+DEFAULT_CATEGORY = "General"
+
+TREATMENT_METHODS = (
+    "Gentle pressure application",
+    "Herbal oil massage",
+    "Therapeutic manipulation"
+)
+
+CONTRAINDICATIONS = (
+    "Acute injury or inflammation",
+    "Open wounds in the area",
+    "Consult practitioner for chronic conditions"
+)
+
+
+def resolve_location(varma_name: str) -> str:
+    varma_lower = varma_name.lower()
+    for key, location in LOCATION_MAP.items():
+        if key in varma_lower:
+            return location
+    return DEFAULT_LOCATION
+
+
+def resolve_coordinates(varma_name: str) -> Tuple[int, int]:
+    """Mapped coordinates, or a stable pseudo-random position for unmapped points"""
+    varma_lower = varma_name.lower()
+    for key, coords in COORDINATE_MAP.items():
+        if key in varma_lower:
+            return coords
+
+    digest = zlib.crc32(_normalize_text(varma_name).encode('utf-8'))
+    x_lo, x_hi = FALLBACK_X_RANGE
+    y_lo, y_hi = FALLBACK_Y_RANGE
+    x = x_lo + (digest & 0xFFFF) % (x_hi - x_lo + 1)
+    y = y_lo + (digest >> 16) % (y_hi - y_lo + 1)
+    return (x, y)
+
+
+def resolve_category(varma_name: str) -> str:
+    varma_lower = varma_name.lower()
+    for category, terms in CATEGORY_TERMS:
+        if any(term in varma_lower for term in terms):
+            return category
+    return DEFAULT_CATEGORY
+
+
+# (label, column) of the knowledge-store fields that describe a point
+STORE_FIELDS = (("Type", "varmamType"), ("Location", "surfaceAnatomy"), ("Indications", "indications"))
+
+
+def store_fields(store, varma_name: str) -> List[Tuple[str, str]]:
+    """(label, text) pairs from a knowledge store's records for a Varma point"""
+    if store is None:
+        return []
+    fields = []
+    for row in store.rows_for(varma_name):
+        for label, column in STORE_FIELDS:
+            value = store.field(row, column)
+            if value:
+                fields.append((label, value))
+    return fields
+
+
+def describe(varma_name: str, all_symptoms: List[str], store=None) -> str:
+    """The point's knowledge-store fields when it has records, else a summary of its symptoms"""
+    fields = store_fields(store, varma_name)
+    if fields:
+        return " ".join(f"{label}: {value}" for label, value in fields)
+    if all_symptoms and isinstance(all_symptoms, list):
+        symptoms_text = ", ".join(all_symptoms)
+        return f"This Varma point is associated with {len(all_symptoms)} signs and symptoms including: {symptoms_text}"
+    return f"Traditional Varma point '{varma_name}' with therapeutic significance in Siddha medicine."
+
+
+class VarmaMetadata(NamedTuple):
+    varma_id: str
+    name: str
+    location: str
+    coordinates: Tuple[int, int]
+    category: str
+    description: str
+    symptom_count: int
+
+    def coordinates_dict(self) -> Dict[str, int]:
+        return {"x": self.coordinates[0], "y": self.coordinates[1]}
+
+
+class VarmaMetadataTable:
+    """Read-only varma id -> VarmaMetadata table for one dataset version"""
+
+    def __init__(self, varma_data: Dict[str, List[str]], dataset_version: str = None, store=None):
+        """`store` is the varma_knowledge store descriptions are read from, if any"""
+        self.store = store
+        entries = {}
+        for varma_name, symptoms in varma_data.items():
+            entry = self.resolve(varma_name, symptoms, store)
+            entries.setdefault(entry.varma_id, entry)
+        self._entries = MappingProxyType(entries)
+        self.dataset_version = dataset_version
+
+    @staticmethod
+    def resolve(varma_name: str, symptoms: List[str] = None, store=None) -> VarmaMetadata:
+        return VarmaMetadata(
+            varma_id=_normalize_text(varma_name),
+            name=varma_name,
+            location=resolve_location(varma_name),
+            coordinates=resolve_coordinates(varma_name),
+            category=resolve_category(varma_name),
+            description=describe(varma_name, symptoms or [], store),
+            symptom_count=len(symptoms or [])
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def __contains__(self, varma_id: str) -> bool:
+        return varma_id in self._entries
+
+    def get(self, varma_id: str, varma_name: str = None, symptoms: List[str] = None) -> VarmaMetadata:
+        """Entry for varma_id; ids outside the dataset are resolved on the fly"""
+        entry = self._entries.get(varma_id)
+        if entry is None:
+            entry = self._entries.get(_normalize_text(varma_name or varma_id))
+        if entry is None:
+            entry = self.resolve(varma_name or varma_id, symptoms, self.store)
+        return entry
+
+
+_table_lock = threading.Lock()
+
+
+def metadata_table(retriever) -> VarmaMetadataTable:
+    """
+    Table for a retriever's dataset, built on first use and kept on the
+    retriever, so it is replaced together with the retriever it describes.
+    """
+    table = getattr(retriever, '_ui_metadata', None)
+    if table is not None:
+        return table
+    with _table_lock:
+        table = getattr(retriever, '_ui_metadata', None)
+        if table is None:
+            table = VarmaMetadataTable(retriever.varma_data, getattr(retriever, 'dataset_version', None),
+                                       getattr(retriever, 'store', None))
+            retriever._ui_metadata = table
+    return table
@@ -2,44 +2,26 @@
 RAG API Routes for Varma Intelligence System
 Integrates with your main Flask/FastAPI backend
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify, stream_with_context
 import time
-from pathlib import Path
 
 # Create Blueprint for RAG routes
 rag_bp = Blueprint('rag', __name__, url_prefix='/api/rag')
 
 # Import your RAG components
-from src.main.scoring_and_retrieval import VarmaRetriever, compute_confidence
+from src.main.scoring_and_retrieval import compute_confidence
+from src.main.registry import SYMPTOM_DATASET, default_registry
+from src.main.varma_metadata import CONTRAINDICATIONS, TREATMENT_METHODS, describe, metadata_table, store_fields
 
-# Initialize retriever (lazy loading)
-_retriever = None
 
 def get_retriever():
-    """Lazy initialization of retriever"""
-    global _retriever
-    if _retriever is None:
-        # Get paths relative to this file
-        RAG_DIR = Path(__file__).resolve().parent
-        DATA_DIR = RAG_DIR / "data" / "processed" / "intermediate_outputs"
-        VARMA_SYMPTOMS_JSON = DATA_DIR / "02_varma_to_symptom.json"
-        SYMPTOM_TO_VARMA_JSON = DATA_DIR / "02_symptom_to_varma.json"
-        
-        print("\n" + "="*80)
-        print("INITIALIZING VARMA RAG RETRIEVER")
-        print("="*80)
-        
-        try:
-            _retriever = VarmaRetriever(
-                varma_symptoms_path=VARMA_SYMPTOMS_JSON,
-                symptom_to_varma_path=SYMPTOM_TO_VARMA_JSON
-            )
-            print("✓ RAG Retriever initialized successfully!")
-        except Exception as e:
-            print(f"✗ Failed to initialize retriever: {e}")
-            raise
-    
-    return _retriever
+    """
+    Shared retriever from the app's registry (see app.create_app). The
+    instance is built once per process on first use, even under concurrent
+    first requests; apps that did not install a registry use the default one.
+    """
+    registry = current_app.extensions.get('varma_registry') or default_registry()
+    return registry.get(current_app.config.get('VARMA_DATASET', SYMPTOM_DATASET))
 
 
 @rag_bp.route('/health', methods=['GET'])
@@ -95,7 +77,7 @@ def symptom_search():
         elapsed_time = time.perf_counter() - start_time
         
         # Format response for UI
-        response = format_for_ui(result, symptom_query, elapsed_time)
+        response = format_for_ui(result, symptom_query, elapsed_time, metadata_table(retriever))
         
         print(f"✓ Query processed in {elapsed_time:.3f}s")
         print(f"✓ Found {len(response['varma_points'])} Varma points")
@@ -110,7 +92,66 @@ def symptom_search():
 
 
 # Import LLM Generator
-from .src.llm.generator import generate
+from .src.llm.gateway import LLM_GATEWAY, LLMOverloaded
+from .src.llm.streaming import STREAM_STATS, stream_answer
+from .src.llm.context_packer import PACK_STATS, count_tokens, pack_documents
+from response_utils import encode_event, retry_later_response, stream_response, wants_event_stream
+
+
+def read_question():
+    """(question, None) from the JSON body, or (None, error response)"""
+    data = request.get_json(silent=True)
+    if not data or 'question' not in data:
+        return None, (jsonify({"error": "No question provided"}), 400)
+    question = data['question'].strip()
+    if not question:
+        return None, (jsonify({"error": "Empty question"}), 400)
+    return question, None
+
+
+def varma_context_fields(varma_name, all_symptoms, store=None):
+    """
+    (label, text) fields describing a Varma point for the LLM: its knowledge-store
+    records, else the description fallback, then the symptoms it treats
+    """
+    fields = store_fields(store, varma_name)
+    if not fields and not all_symptoms:
+        fields.append(("Description", describe(varma_name, all_symptoms)))
+    # The description fallback only restates the symptoms, so they are listed once
+    fields.append(("Symptoms treated", ", ".join(all_symptoms)))
+    return fields
+
+
+def build_rag_prompt(question, result, store=None):
+    """(prompt, packed context) for the Varma points retrieved for a question"""
+    varma_points = result.get("varma_points", [])
+    documents = []
+    unpacked_tokens = 0
+    for vp in varma_points:
+        name = vp.get("varma_name", "Unknown")
+        all_symptoms = vp.get("all_symptoms", [])
+        documents.append((f"Varma Point: {name}", varma_context_fields(name, all_symptoms, store)))
+        # Size of the context as it was written before packing
+        desc = describe(name, all_symptoms)
+        unpacked_tokens += count_tokens(
+            f"Varma Point: {name}\nDescription: {desc}\nSymptoms treated: {', '.join(all_symptoms)}\n"
+        )
+    
+    packed = pack_documents(question, documents, original_tokens=unpacked_tokens)
+    PACK_STATS.record(packed)
+    
+    prompt = f"""You are an expert in Varma Kalai (an ancient Indian martial art and healing system). 
+Use the following retrieved context to answer the user's question. 
+If the answer is not in the context, use your general knowledge but mention that it is general info.
+
+Context:
+{packed.text}
+
+User Question: {question}
+
+Answer:"""
+    return prompt, packed
+
 
 @rag_bp.route('/query', methods=['POST'])
 def rag_query():
@@ -118,15 +159,9 @@ def rag_query():
     try:
         retriever = get_retriever()
         
-        data = request.get_json()
-        
-        if not data or 'question' not in data:
-            return jsonify({"error": "No question provided"}), 400
-        
-        question = data['question'].strip()
-        
-        if not question:
-            return jsonify({"error": "Empty question"}), 400
+        question, error = read_question()
+        if error:
+            return error
         
         print(f"\nRAG Question: {question}")
         
@@ -137,61 +172,107 @@ def rag_query():
             top_varmas=3
         )
         
-        # Format context for LLM
-        varma_points = result.get("varma_points", [])
-        context_parts = []
-        for vp in varma_points:
-            name = vp.get("varma_name", "Unknown")
-            symptoms = ", ".join(vp.get("all_symptoms", []))
-            desc = get_description_for_varma(name, vp.get("all_symptoms", []))
-            context_parts.append(f"Varma Point: {name}\nDescription: {desc}\nSymptoms treated: {symptoms}\n")
-        
-        context_str = "\n".join(context_parts)
-        
-        # Construct Prompt
-        prompt = f"""You are an expert in Varma Kalai (an ancient Indian martial art and healing system). 
-Use the following retrieved context to answer the user's question. 
-If the answer is not in the context, use your general knowledge but mention that it is general info.
-
-Context:
-{context_str}
-
-User Question: {question}
-
-Answer:"""
+        prompt, packed = build_rag_prompt(question, result, retriever.store)
+        print(f"Context: {packed.tokens} tokens ({packed.tokens_saved} saved by packing)")
 
         print("Generating answer with LLM...")
-        # Call Ollama
-        llm_response = generate(prompt, model="llama3")
-        print("LLM Response received.")
+        # Call Ollama (bounded; the retrieval-only answer while it is failing)
+        llm = LLM_GATEWAY.generate(
+            prompt, model="llama3",
+            fallback=lambda: generate_answer_from_results(result, question)
+        )
+        if llm.fallback:
+            print(f"⚠️ Answered from retrieval only ({llm.fallback})")
+        else:
+            print("LLM Response received.")
 
         # Format as RAG response
         response = {
-            "answer": llm_response,
+            "answer": llm.answer,
             "sources": extract_sources(result),
-            "confidence": calculate_overall_confidence(result)
+            "confidence": calculate_overall_confidence(result),
+            "context": packed.report()
         }
+        if llm.fallback:
+            response["fallback"] = llm.fallback
         
         return jsonify(response), 200
         
+    except LLMOverloaded as e:
+        print(f"⚠️ RAG Query rejected: {e}")
+        return retry_later_response(str(e), e.status, e.retry_after, reason=e.reason)
     except Exception as e:
         print(f"✗ RAG Query Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 
+@rag_bp.route('/query/stream', methods=['POST'])
+def rag_query_stream():
+    """
+    Streaming /query: 'sources' first, a 'token' event per generated chunk,
+    then 'done' with confidence, grounding and timing. NDJSON by default;
+    Server-Sent Events with Accept: text/event-stream or ?format=sse.
+    """
+    retriever = get_retriever()
+    question, error = read_question()
+    if error:
+        return error
+    
+    # Reject before the stream starts while the LLM queue is full
+    try:
+        LLM_GATEWAY.check()
+    except LLMOverloaded as e:
+        return retry_later_response(str(e), e.status, e.retry_after, reason=e.reason)
+
+    use_sse = wants_event_stream()
+    print(f"\nRAG Question (stream): {question}")
+    
+    def events():
+        try:
+            result = retriever.retrieve(query=question, top_symptoms=10, top_varmas=3)
+            prompt, packed = build_rag_prompt(question, result, retriever.store)
+            for event, payload in stream_answer(
+                prompt, extract_sources(result), packed.text,
+                confidence=calculate_overall_confidence(result), model="llama3",
+                extra={"context": packed.report()},
+                chunks=LLM_GATEWAY.stream(
+                    prompt, model="llama3",
+                    fallback=lambda: generate_answer_from_results(result, question)
+                )
+            ):
+                yield encode_event(event, payload, use_sse)
+        except LLMOverloaded as e:
+            print(f"⚠️ RAG Stream rejected: {e}")
+            yield encode_event('error', {
+                "event": "error", "error": str(e), "reason": e.reason, "retry_after": e.retry_after
+            }, use_sse)
+        except Exception as e:
+            print(f"✗ RAG Stream Error: {str(e)}")
+            yield encode_event('error', {"event": "error", "error": str(e)}, use_sse)
+    
+    return stream_response(stream_with_context(events()), use_sse)
+
+
+@rag_bp.route('/metrics', methods=['GET'])
+def rag_metrics():
+    """Streaming TTFT and tokens/second, context packing and LLM admission control"""
+    return jsonify({
+        "streaming": STREAM_STATS.snapshot(),
+        "context_packing": PACK_STATS.snapshot(),
+        "llm_gateway": LLM_GATEWAY.get_metrics()
+    }), 200
+
+
 @rag_bp.route('/varma-points', methods=['GET'])
 def get_all_varma_points():
     """Get all available Varma points"""
     try:
         retriever = get_retriever()
         
-        all_points = []
-        for varma_name in retriever.varma_data.keys():
-            all_points.append({
-                "name": varma_name,
-                "category": categorize_varma(varma_name),
-                "location": get_location_for_varma(varma_name)
-            })
+        all_points = [
+            {"name": meta.name, "category": meta.category, "location": meta.location}
+            for meta in metadata_table(retriever)
+        ]
         
         return jsonify({"varma_points": all_points}), 200
     except Exception as e:
@@ -199,7 +280,7 @@ def get_all_varma_points():
 
 
 # Helper functions
-def format_for_ui(result, query, processing_time):
+def format_for_ui(result, query, processing_time, metadata):
     """Transform retrieval result for React UI"""
     varma_points = result.get("varma_points", [])
     matched_symptoms = result.get("matched_symptoms", [])
@@ -222,20 +303,22 @@ def format_for_ui(result, query, processing_time):
         
         matched_syms = vp.get("matched_symptoms", [])
         all_syms = vp.get("all_symptoms", [])
+        varma_id = vp.get("varma_id", f"vp_{idx+1:03d}")
+        meta = metadata.get(varma_id, vp.get("varma_name", ""), all_syms)
         
         formatted_point = {
-            "id": vp.get("varma_id", f"vp_{idx+1:03d}"),
+            "id": varma_id,
             "name": vp.get("varma_name", "Unknown"),
             "confidence_score": round(confidence_score, 4),
             "match_type": primary_match_type,
-            "location": get_location_for_varma(vp.get("varma_name", "")),
+            "location": meta.location,
             "matched_symptoms": matched_syms,
             "all_symptoms": all_syms,
-            "coordinates": get_coordinates_for_varma(vp.get("varma_name", "")),
-            "description": get_description_for_varma(vp.get("varma_name", ""), all_syms),
-            "category": categorize_varma(vp.get("varma_name", "")),
-            "treatment_methods": get_treatment_methods(vp.get("varma_name", "")),
-            "contraindications": get_contraindications(vp.get("varma_name", "")),
+            "coordinates": meta.coordinates_dict(),
+            "description": meta.description,
+            "category": meta.category,
+            "treatment_methods": list(TREATMENT_METHODS),
+            "contraindications": list(CONTRAINDICATIONS),
             "matched_symptom_count": vp.get("matched_symptom_count", 0),
             "total_symptoms": vp.get("total_symptoms", 0),
             "match_percentage": vp.get("match_percentage", 0.0),
@@ -313,84 +396,3 @@ def calculate_overall_confidence(result):
     
     scores = [vp.get("weighted_score", 0.0) for vp in varma_points]
     return round(sum(scores) / len(scores), 4)
-
-
-def get_description_for_varma(varma_name, all_symptoms):
-    """Get description for Varma point"""
-    if all_symptoms and len(all_symptoms) > 0:
-        symptoms_text = ", ".join(all_symptoms[:10])
-        return f"This Varma point is associated with {len(all_symptoms)} signs and symptoms including: {symptoms_text}"
-    return f"Traditional Varma point '{varma_name}' with therapeutic significance."
-
-
-def get_location_for_varma(varma_name):
-    """Map Varma names to body locations"""
-    location_map = {
-        "adhipathi": "Crown of the head",
-        "shankha": "Temple region",
-        "krikatika": "Back of the neck",
-        "sthapani": "Between the eyebrows",
-        "hridaya": "Heart region",
-        "nabhi": "Navel region",
-        "janu": "Knee joint",
-        "gulpha": "Ankle joint"
-    }
-    
-    varma_lower = varma_name.lower()
-    for key, location in location_map.items():
-        if key in varma_lower:
-            return location
-    
-    return "Body region"
-
-
-def get_coordinates_for_varma(varma_name):
-    """Generate coordinates for 3D visualization"""
-    coord_map = {
-        "adhipathi": {"x": 100, "y": 40},
-        "shankha": {"x": 70, "y": 45},
-        "hridaya": {"x": 100, "y": 120},
-        "nabhi": {"x": 100, "y": 160},
-        "janu": {"x": 85, "y": 240}
-    }
-    
-    varma_lower = varma_name.lower()
-    for key, coords in coord_map.items():
-        if key in varma_lower:
-            return coords
-    
-    import random
-    return {"x": random.randint(50, 150), "y": random.randint(80, 250)}
-
-
-def categorize_varma(varma_name):
-    """Categorize Varma by body region"""
-    varma_lower = varma_name.lower()
-    
-    if any(term in varma_lower for term in ['adhipathi', 'shankha', 'sthapani']):
-        return "Head & Neck"
-    elif any(term in varma_lower for term in ['hridaya', 'kurpara']):
-        return "Upper Body"
-    elif any(term in varma_lower for term in ['nabhi', 'basti']):
-        return "Abdomen & Pelvis"
-    elif any(term in varma_lower for term in ['janu', 'gulpha']):
-        return "Lower Body"
-    return "General"
-
-
-def get_treatment_methods(varma_name):
-    """Get treatment methods"""
-    return [
-        "Gentle pressure application",
-        "Herbal oil massage",
-        "Therapeutic manipulation"
-    ]
-
-
-def get_contraindications(varma_name):
-    """Get contraindications"""
-    return [
-        "Acute injury or inflammation",
-        "Open wounds in the area",
-        "Consult practitioner for chronic conditions"
-    ]
\ No newline at end of file
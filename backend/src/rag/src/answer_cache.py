@@ -0,0 +1,210 @@
+"""
+Answer cache for the RAG question-answering path.
+
+An answer is reused when a new question retrieves the same documents and
+either
+
+  1. normalises to the same text ("What is Utchi Varmam?" / "what is utchi varmam"), or
+  2. is a paraphrase: cosine similarity of the BGE question embeddings when
+     both questions reached the dense tier, otherwise the overlap of their
+     content terms ("what is utchi varmam" / "tell me about utchi").
+
+Paraphrases must also ask the same kind of question. BM25 drops
+what/where/how/... as stop words, so "where is utchi varmam" has the same
+content terms as "what is utchi varmam" (and a close embedding), but it
+asks for something else.
+
+Entries expire after a TTL, the least recently used ones are evicted past
+the size bound, and everything is dropped when the index version changes.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .bm25 import tokenize
+
+# Question words -> the kind of answer they ask for
+INTENT_WORDS = {
+    'what': 'what', 'tell': 'what', 'explain': 'what', 'describe': 'what',
+    'where': 'where', 'located': 'where', 'how': 'how', 'why': 'why',
+    'when': 'when', 'which': 'which', 'who': 'who'
+}
+
+
+def normalize_question(question: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", question.lower().replace("_", " "))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def question_intent(question: str) -> frozenset:
+    return frozenset(INTENT_WORDS[w] for w in normalize_question(question).split() if w in INTENT_WORDS)
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    match: str          # 'exact' or 'similar'
+    similarity: float
+    age_s: float
+
+
+class _Entry:
+    __slots__ = ('question', 'answer', 'doc_ids', 'terms', 'intent', 'embedding', 'created')
+
+    def __init__(self, question, answer, doc_ids, terms, intent, embedding, created):
+        self.question = question
+        self.answer = answer
+        self.doc_ids = doc_ids
+        self.terms = terms
+        self.intent = intent
+        self.embedding = embedding
+        self.created = created
+
+
+def _unit(embedding) -> Optional[np.ndarray]:
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else None
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_s: float = 3600.0,
+        embedding_similarity: float = 0.92,
+        term_similarity: float = 0.8,
+        index_version: str = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.embedding_similarity = embedding_similarity
+        self.term_similarity = term_similarity
+        self.index_version = index_version
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], _Entry]" = OrderedDict()
+        # Retrieved doc ids -> exact keys, the candidates for paraphrase matching
+        self._by_docs: Dict[Tuple[str, ...], List[Tuple[str, Tuple[str, ...]]]] = {}
+        self._stats = {
+            'lookups': 0, 'exact_hits': 0, 'similar_hits': 0, 'misses': 0,
+            'stores': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0
+        }
+
+    @classmethod
+    def from_env(cls, index_version: str = None) -> "AnswerCache":
+        return cls(
+            max_entries=int(os.environ.get("VARMA_RAG_CACHE_SIZE", 512)),
+            ttl_s=float(os.environ.get("VARMA_RAG_CACHE_TTL", 3600)),
+            embedding_similarity=float(os.environ.get("VARMA_RAG_CACHE_SIMILARITY", 0.92)),
+            term_similarity=float(os.environ.get("VARMA_RAG_CACHE_TERM_SIMILARITY", 0.8)),
+            index_version=index_version
+        )
+
+    def validate(self, index_version: str):
+        """Drop every entry if the index the answers were built from has changed"""
+        with self._lock:
+            if index_version == self.index_version:
+                return
+            if self._entries:
+                self._stats['invalidations'] += 1
+                print(f"✓ RAG answer cache cleared ({len(self._entries)} entries): index changed")
+            self._entries.clear()
+            self._by_docs.clear()
+            self.index_version = index_version
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_docs.get(entry.doc_ids)
+        if keys is not None:
+            keys.remove(key)
+            if not keys:
+                del self._by_docs[entry.doc_ids]
+
+    def _similarity(self, entry: _Entry, terms: frozenset, embedding) -> float:
+        if embedding is not None and entry.embedding is not None:
+            return float(np.dot(entry.embedding, embedding))
+        if not terms or not entry.terms:
+            return 0.0
+        return len(terms & entry.terms) / len(terms | entry.terms)
+
+    def _threshold(self, entry: _Entry, embedding) -> float:
+        if embedding is not None and entry.embedding is not None:
+            return self.embedding_similarity
+        return self.term_similarity
+
+    def get(self, question: str, doc_ids, embedding=None) -> Optional[CachedAnswer]:
+        doc_ids = tuple(doc_ids)
+        key = (normalize_question(question), doc_ids)
+        now = time.monotonic()
+        with self._lock:
+            self._stats['lookups'] += 1
+
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl_s:
+                self._remove(key)
+                self._stats['expirations'] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats['exact_hits'] += 1
+                return CachedAnswer(entry.answer, 'exact', 1.0, now - entry.created)
+
+            terms = frozenset(tokenize(question))
+            intent = question_intent(question)
+            embedding = _unit(embedding)
+            best_key, best_score = None, 0.0
+            for candidate_key in list(self._by_docs.get(doc_ids, ())):
+                candidate = self._entries[candidate_key]
+                if now - candidate.created > self.ttl_s:
+                    self._remove(candidate_key)
+                    self._stats['expirations'] += 1
+                    continue
+                if candidate.intent != intent:
+                    continue
+                score = self._similarity(candidate, terms, embedding)
+                if score >= self._threshold(candidate, embedding) and score > best_score:
+                    best_key, best_score = candidate_key, score
+
+            if best_key is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats['similar_hits'] += 1
+            entry = self._entries[best_key]
+            return CachedAnswer(entry.answer, 'similar', round(best_score, 4), now - entry.created)
+
+    def put(self, question: str, doc_ids, answer: str, embedding=None):
+        doc_ids = tuple(doc_ids)
+        key = (normalize_question(question), doc_ids)
+        entry = _Entry(question, answer, doc_ids, frozenset(tokenize(question)), question_intent(question),
+                       _unit(embedding), time.monotonic())
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._by_docs.setdefault(doc_ids, []).append(key)
+            self._stats['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+        hits = stats['exact_hits'] + stats['similar_hits']
+        stats['hit_rate'] = round(hits / stats['lookups'], 4) if stats['lookups'] else 0.0
+        stats['entries'] = entries
+        stats['max_entries'] = self.max_entries
+        stats['ttl_s'] = self.ttl_s
+        stats['index_version'] = self.index_version
+        return stats
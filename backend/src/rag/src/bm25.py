@@ -0,0 +1,87 @@
+"""
+Okapi BM25 over the Varma documents, the lexical tier of the RAG cascade.
+
+Besides the ranking, search() reports a confidence in [0, 1]: the top
+score divided by the score of an average-length document containing each
+query term once (the sum of their idf). It reads as an idf-weighted share
+of the question the best document covers, is comparable across queries,
+and decides whether the dense tier is needed.
+"""
+
+import math
+import re
+from typing import Dict, Iterable, List, Tuple
+
+STOP_WORDS = frozenset({
+    'a', 'about', 'all', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'does',
+    'do', 'explain', 'for', 'from', 'give', 'has', 'have', 'how', 'i', 'in', 'is', 'it',
+    'its', 'me', 'my', 'of', 'on', 'or', 'point', 'points', 'tell', 'that', 'the', 'their',
+    'there', 'this', 'to', 'varma', 'varmam', 'was', 'what', 'when', 'where', 'which',
+    'who', 'why', 'with'
+})
+
+
+def tokenize(text: str) -> List[str]:
+    words = re.findall(r"[^\W_]+", str(text).lower().replace("_", " "))
+    return [w for w in words if w not in STOP_WORDS and len(w) > 1]
+
+
+class BM25Index:
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        # term -> [(row, term frequency)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((row, tf))
+
+        n = len(self.doc_lengths)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _scores(self, terms) -> Tuple[Dict[int, float], float]:
+        """Scores of every row containing a term, and the sum of the known terms' idf"""
+        scores: Dict[int, float] = {}
+        ceiling = 0.0
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            ceiling += idf
+            for row, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[row] / self.avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores, ceiling
+
+    def scores(self, query: str, rows: Iterable[int]) -> Dict[int, float]:
+        """Scores of the given rows (0.0 when they share no term with the query)"""
+        scores, _ = self._scores(set(tokenize(query)))
+        return {row: scores.get(row, 0.0) for row in rows}
+
+    def search(self, query: str, top_k: int = 3) -> Tuple[List[Tuple[int, float]], float]:
+        """([(row, score)] best first, confidence)"""
+        terms = set(tokenize(query))
+        scores, ceiling = self._scores(terms)
+
+        if not scores:
+            return [], 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        # Terms the index has never seen count against confidence as well
+        unknown = sum(1 for term in terms if term not in self.idf)
+        ceiling += unknown * max(self.idf.values())
+        return ranked, min(1.0, ranked[0][1] / ceiling)
@@ -0,0 +1,79 @@
+"""
+Field-level chunks of the RAG documents.
+
+With VARMA_RAG_INDEX_MODE=fields, build_index.py splits every Varma
+document (see ingestion/load_json.py) into one chunk per non-empty field.
+Each chunk keeps the document's "Varma Name:" line, so it embeds and
+matches as part of its Varma point. It also carries the row of its
+parent record:
+
+    {"id": "Utchi_Varmam", "parent": 0, "field": "Signs",
+     "text": "Varma Name: Utchi_Varmam\\n\\nSigns:\\nLoss of head control, ..."}
+
+The retriever ranks chunks and groups them back by parent.
+join_chunks() rebuilds a document from the chosen fields only, in the
+same layout, so prompt building and context packing are unchanged.
+"""
+
+import re
+from typing import Dict, List, Set
+
+TITLE_LABEL = "Varma Name"
+
+# Question words that ask for a field without naming it
+FIELD_HINTS = {
+    'location': 'Surface Anatomy', 'located': 'Surface Anatomy', 'where': 'Surface Anatomy',
+    'anatomy': 'Surface Anatomy', 'symptoms': 'Signs', 'symptom': 'Signs',
+    'treat': 'Indications', 'treats': 'Indications', 'treated': 'Indications', 'cure': 'Indications',
+    'uses': 'Indications', 'used': 'Indications', 'benefits': 'Indications',
+    'type': 'Varmam Type', 'kind': 'Varmam Type', 'side': 'Laterality', 'sides': 'Laterality',
+    'names': 'Synonyms', 'called': 'Synonyms', 'tamil': 'Tamil Literature', 'verse': 'Tamil Literature',
+    'muscles': 'Anatomical Relations', 'arteries': 'Anatomical Relations',
+    'veins': 'Anatomical Relations', 'nerves': 'Anatomical Relations'
+}
+
+
+def split_document(doc: Dict, parent: int) -> List[Dict]:
+    """Field chunks of one document; a document without fields keeps its title alone"""
+    title, _, rest = doc.get("text", "").strip().partition("\n\n")
+    if not title.startswith(TITLE_LABEL + ":"):
+        title, rest = "", doc.get("text", "").strip()
+
+    chunks = []
+    for block in re.split(r"\n\s*\n", rest):
+        label, sep, body = block.partition(":")
+        # "Anatomical Relations:" with only empty "Muscles:" ... sub-fields is empty too
+        if not sep or not re.sub(r"[\w ]+:", "", body).strip():
+            continue
+        chunks.append({
+            "id": doc.get("id", ""),
+            "parent": parent,
+            "field": label.strip(),
+            "text": f"{title}\n\n{block.strip()}" if title else block.strip()
+        })
+    if not chunks:
+        chunks.append({"id": doc.get("id", ""), "parent": parent, "field": TITLE_LABEL, "text": title})
+    return chunks
+
+
+def join_chunks(chunks: List[Dict]) -> Dict:
+    """One document of a parent's chunks (title once, then each field)"""
+    title = ""
+    blocks = []
+    for chunk in chunks:
+        head, _, block = chunk["text"].partition("\n\n")
+        if not head.startswith(TITLE_LABEL + ":"):
+            head, block = "", chunk["text"]
+        title = title or head
+        if block:
+            blocks.append(block)
+    return {
+        "id": chunks[0]["id"] if chunks else "",
+        "fields": [chunk["field"] for chunk in chunks],
+        "text": "\n\n".join([title] + blocks if title else blocks)
+    }
+
+
+def hinted_fields(question: str) -> Set[str]:
+    words = re.findall(r"[^\W_]+", question.lower())
+    return {FIELD_HINTS[w] for w in words if w in FIELD_HINTS}
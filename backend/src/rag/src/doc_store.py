@@ -0,0 +1,132 @@
+"""
+Offset-indexed JSONL document store for the RAG index.
+
+    varma_docs.jsonl       one JSON document per line, in index row order
+    varma_docs.jsonl.idx   {"format": 1, "ids": [...], "offsets": [...]}
+
+A field-level store (see chunking.py) also lists each chunk's "parents"
+(record row) and "fields" in the .idx file.
+
+Incremental builds append documents in place and list the rows they
+replace or remove under "deleted" (tombstones); readers skip those rows.
+
+The .jsonl file is memory-mapped and a document is only parsed when it is
+retrieved, so opening the store costs the size of the small .idx file.
+"""
+
+import json
+import mmap
+import os
+import threading
+from pathlib import Path
+
+FORMAT_VERSION = 1
+
+
+def index_path_for(docs_path) -> Path:
+    return Path(str(docs_path) + ".idx")
+
+
+def _write_docs(f, docs, meta):
+    """Append documents to an open file and their entries to the index metadata"""
+    for doc in docs:
+        f.write(json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n")
+        meta["offsets"].append(f.tell())
+        meta["ids"].append(doc.get("id", ""))
+        meta["parents"].append(doc.get("parent"))
+        meta["fields"].append(doc.get("field"))
+
+
+def _write_meta(idx_path, meta):
+    if not any(parent is not None for parent in meta["parents"]):
+        meta = {key: value for key, value in meta.items() if key not in ("parents", "fields")}
+    if not meta.get("deleted"):
+        meta = {key: value for key, value in meta.items() if key != "deleted"}
+    tmp_idx = idx_path.with_name(idx_path.name + ".tmp")
+    with open(tmp_idx, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_idx, idx_path)
+
+
+def write_doc_store(docs, docs_path):
+    """Write documents (dicts with 'id' and 'text') and their offset index atomically"""
+    docs_path = Path(docs_path)
+    meta = {"format": FORMAT_VERSION, "ids": [], "offsets": [0], "parents": [], "fields": []}
+    tmp_docs = docs_path.with_name(docs_path.name + ".tmp")
+    with open(tmp_docs, "wb") as f:
+        _write_docs(f, docs, meta)
+
+    os.replace(tmp_docs, docs_path)
+    _write_meta(index_path_for(docs_path), meta)
+
+
+def append_doc_store(docs, docs_path, deleted=()):
+    """
+    Append documents after the existing rows and tombstone the `deleted`
+    rows. Readers of the old index keep working: the bytes they map are
+    unchanged, and new rows only become visible with the new .idx file.
+    """
+    docs_path = Path(docs_path)
+    idx_path = index_path_for(docs_path)
+    with open(idx_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported document store format {meta.get('format')} in {docs_path}")
+    rows = len(meta["ids"])
+    meta.setdefault("parents", [None] * rows)
+    meta.setdefault("fields", [None] * rows)
+    meta["deleted"] = sorted(set(meta.get("deleted", ())) | set(deleted))
+
+    with open(docs_path, "r+b") as f:
+        # Drop anything a crashed append left past the last indexed row
+        f.truncate(meta["offsets"][-1])
+        f.seek(meta["offsets"][-1])
+        _write_docs(f, docs, meta)
+        f.flush()
+        os.fsync(f.fileno())
+    _write_meta(idx_path, meta)
+
+
+class DocStore:
+    def __init__(self, docs_path):
+        self.path = Path(docs_path)
+        with open(index_path_for(self.path), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported document store format {meta.get('format')} in {self.path}")
+
+        self.ids = meta["ids"]
+        # Parent record row and field name of each chunk; None for whole-record stores
+        self.parents = meta.get("parents")
+        self.fields = meta.get("fields")
+        # Rows replaced or removed by incremental builds
+        self.deleted = frozenset(meta.get("deleted", ()))
+        self._offsets = meta["offsets"]
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _mapped(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    self._file = open(self.path, "rb")
+                    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self.ids)
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return json.loads(self._mapped()[start:end])
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = None
+                self._file = None
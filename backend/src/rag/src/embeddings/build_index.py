@@ -1,13 +1,36 @@
+import argparse
 import faiss
+import hashlib
+import json
+import multiprocessing
 import numpy as np
-import pickle
 import sys
 import os
+import time
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from ingestion.load_json import load_varma_json
 from embeddings.embedder import VarmaEmbedder
+from doc_store import DocStore, append_doc_store, write_doc_store
+from chunking import split_document
+from name_matcher import write_name_table
+
+DATA_PATH = "data/varma_data.json"
+INDEX_PATH = "varma_index.faiss"
+DOCS_PATH = "varma_docs.jsonl"
+NAMES_PATH = "varma_names.json"
+# Record hashes and the rows they own, for incremental builds
+MANIFEST_PATH = "varma_index.manifest.json"
+MANIFEST_FORMAT = 1
+# "records": one vector per Varma record; "fields": one per field, grouped back at retrieval
+INDEX_MODE = os.environ.get("VARMA_RAG_INDEX_MODE", "records")
+
+# Texts per encode() call, and encoder processes (1: encode in this process)
+BATCH_SIZE = int(os.environ.get("VARMA_RAG_BUILD_BATCH", 32))
+WORKERS = int(os.environ.get("VARMA_RAG_BUILD_WORKERS", 1))
+# Rewrite the index without tombstones once they are this share of its rows
+COMPACT_RATIO = float(os.environ.get("VARMA_RAG_COMPACT_RATIO", 0.25))
 
 
 def varma_to_text(varma: dict) -> str:
@@ -51,24 +74,212 @@ def varma_to_text(varma: dict) -> str:
     return "\n".join(parts)
 
 
-def build_index():
-    # Load JSON → list of dicts
-    varma_list = load_varma_json("data/varma_data.json")
+def record_hash(varma: dict) -> str:
+    return hashlib.sha1(varma_to_text(varma).encode("utf-8")).hexdigest()
+
+
+def layout(mode, records, docs, hashes, first_row=0, first_record=0):
+    """
+    (index documents, embedding texts, manifest entries) for records, with
+    rows numbered from `first_row`. A record owns one row, or one per field
+    chunk in "fields" mode.
+    """
+    if mode not in ("records", "fields"):
+        raise ValueError(f"Unknown index mode {mode!r} (expected 'records' or 'fields')")
+
+    out_docs, texts, entries = [], [], []
+    row = first_row
+    for offset, (varma, doc, digest) in enumerate(zip(records, docs, hashes)):
+        if mode == "fields":
+            # Field chunks carry their record row, so the name table still indexes records
+            record = first_record + offset
+            parts = split_document(doc, record)
+            texts.extend(part["text"] for part in parts)
+        else:
+            record = row
+            parts = [doc]
+            texts.append(varma_to_text(varma))
+        entries.append({"hash": digest, "record": record, "rows": list(range(row, row + len(parts)))})
+        out_docs.extend(parts)
+        row += len(parts)
+    return out_docs, texts, entries
+
+
+_worker_embedder = None
+
+
+def _init_worker(workers):
+    global _worker_embedder
+    _worker_embedder = VarmaEmbedder()
+    try:
+        import torch
+        # Share the cores between the workers instead of oversubscribing them
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    except ImportError:
+        pass
+
+
+def _encode_batch(texts):
+    return np.asarray(_worker_embedder.encode(texts), dtype="float32")
+
+
+def encode(texts, batch_size=BATCH_SIZE, workers=WORKERS):
+    """Embeddings of `texts` in order, batch by batch, over `workers` processes"""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not batches:
+        return None
+    start = time.perf_counter()
+    if workers <= 1 or len(batches) == 1:
+        embedder = VarmaEmbedder()
+        parts = []
+        for done, batch in enumerate(batches, 1):
+            parts.append(np.asarray(embedder.encode(batch), dtype="float32"))
+            print(f"  encoded batch {done}/{len(batches)}")
+    else:
+        # spawn: a forked copy of a loaded torch runtime can deadlock
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=_init_worker, initargs=(workers,)) as pool:
+            parts = pool.map(_encode_batch, batches)
+    print(f"✓ Encoded {len(texts)} texts in {time.perf_counter() - start:.1f}s "
+          f"({len(batches)} batches, {max(1, min(workers, len(batches)))} processes)")
+    return np.vstack(parts)
+
+
+def write_manifest(mode, entries, rows, next_record):
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "mode": mode,
+        "model": VarmaEmbedder.MODEL_NAME,
+        "rows": rows,
+        "next_record": next_record,
+        "records": entries
+    }
+    with open(MANIFEST_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(MANIFEST_PATH + ".tmp", MANIFEST_PATH)
+
+
+def load_previous(mode):
+    """(doc store, manifest) of an index this build can update in place, or None"""
+    if not all(os.path.exists(path) for path in (INDEX_PATH, DOCS_PATH, MANIFEST_PATH)):
+        return None
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        store = DocStore(DOCS_PATH)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Previous index unreadable ({e}); rebuilding from scratch")
+        return None
+    if (manifest.get("format") != MANIFEST_FORMAT or manifest.get("mode") != mode
+            or manifest.get("model") != VarmaEmbedder.MODEL_NAME or manifest.get("rows") != len(store)):
+        print("⚠️ Previous index was built differently (or interrupted); rebuilding from scratch")
+        return None
+    return store, manifest
+
+
+def write_full(mode, records, docs, hashes, vectors):
+    """Write every index file from scratch (no tombstones)"""
+    out_docs, _, entries = layout(mode, records, docs, hashes)
+    if len(out_docs) != len(vectors):
+        raise ValueError(f"{len(vectors)} vectors for {len(out_docs)} documents")
+
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+
+    # Native FAISS file (memory-mapped by the retriever) + lazily read documents.
+    # The manifest goes last: running retrievers reload once it changes.
+    faiss.write_index(index, INDEX_PATH + ".tmp")
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    write_doc_store(out_docs, DOCS_PATH)
+    write_name_table(records, NAMES_PATH, [entry["record"] for entry in entries])
+    write_manifest(mode, entries, len(out_docs), len(records))
+    return len(out_docs)
+
+
+def build_index(mode=INDEX_MODE, full=False, batch_size=BATCH_SIZE, workers=WORKERS):
+    """
+    Bring the index up to date with DATA_PATH. Records whose rendered text
+    (varma_to_text) is unchanged keep their vectors; new and changed
+    records are embedded and appended, and the rows of changed or removed
+    records are tombstoned. `full` (or a missing / incompatible previous
+    index) rebuilds everything.
+    """
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        records = json.load(f)["varmas"]
+    # Load JSON → list of dicts (same order as the records)
+    docs = load_varma_json(DATA_PATH)
+    hashes = [record_hash(varma) for varma in records]
+
+    previous = None if full else load_previous(mode)
+    if previous is None:
+        _, texts, _ = layout(mode, records, docs, hashes)
+        rows = write_full(mode, records, docs, hashes, encode(texts, batch_size, workers))
+        print(f"✅ FAISS index built successfully ({rows} {mode})")
+        return
+
+    store, manifest = previous
+    # Match records to the previous build by hash (duplicates pair up in order)
+    unmatched = {}
+    for entry in manifest["records"]:
+        unmatched.setdefault(entry["hash"], []).append(entry)
+    kept = [unmatched[digest].pop(0) if unmatched.get(digest) else None for digest in hashes]
+    removed = [entry for entries in unmatched.values() for entry in entries]
+    added = [i for i, entry in enumerate(kept) if entry is None]
+
+    if not added and not removed:
+        print(f"✓ FAISS index is up to date ({len(records)} records)")
+        return
+
+    new_docs, texts, new_entries = layout(
+        mode,
+        [records[i] for i in added], [docs[i] for i in added], [hashes[i] for i in added],
+        first_row=len(store), first_record=manifest["next_record"]
+    )
+    vectors = encode(texts, batch_size, workers)
+    deleted = set(store.deleted) | {row for entry in removed for row in entry["rows"]}
+    total = len(store) + len(new_docs)
+    print(f"✓ {len(added)} new or changed records, {len(removed)} changed or removed")
+
+    index = faiss.read_index(INDEX_PATH)
+    if vectors is not None and vectors.shape[1] != index.d:
+        print("⚠️ Embedding size changed; rebuilding from scratch")
+        return build_index(mode, True, batch_size, workers)
+
+    added_entries = iter(new_entries)
+    entries = [entry if entry is not None else next(added_entries) for entry in kept]
 
-    texts = [varma_to_text(v) for v in varma_list]
+    if deleted and len(deleted) / total > COMPACT_RATIO:
+        # Too many tombstones: rewrite, reusing the stored vectors of unchanged records
+        compacted = np.vstack([
+            index.reconstruct(row) if row < len(store) else vectors[row - len(store)]
+            for entry in entries for row in entry["rows"]
+        ])
+        rows = write_full(mode, records, docs, hashes, compacted)
+        print(f"✅ FAISS index compacted ({rows} {mode}, {len(deleted)} tombstones dropped)")
+        return
 
-    embedder = VarmaEmbedder()
-    embeddings = embedder.encode(texts)
+    if vectors is not None:
+        index.add(vectors)
+    # Index first: until the documents are appended, a retriever opening the
+    # files sees the new vectors as trailing rows without documents and skips them
+    faiss.write_index(index, INDEX_PATH + ".tmp")
+    os.replace(INDEX_PATH + ".tmp", INDEX_PATH)
+    append_doc_store(new_docs, DOCS_PATH, deleted)
 
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings))
+    write_name_table(records, NAMES_PATH, [entry["record"] for entry in entries])
+    write_manifest(mode, entries, total, manifest["next_record"] + len(added) if mode == "fields" else total)
+    print(f"✅ FAISS index updated in place ({total - len(deleted)} live {mode}, {len(deleted)} tombstones)")
 
-    with open("varma_index.pkl", "wb") as f:
-        pickle.dump((index, varma_list), f)
 
-    print("✅ FAISS index built successfully")
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the Varma RAG index")
+    parser.add_argument("mode", nargs="?", default=INDEX_MODE, choices=("records", "fields"))
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of updating")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="encoder processes")
+    args = parser.parse_args()
+    build_index(args.mode, args.full, args.batch_size, args.workers)
 
 
 if __name__ == "__main__":
-    build_index()
+    main()
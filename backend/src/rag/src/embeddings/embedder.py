@@ -1,13 +1,40 @@
-from sentence_transformers import SentenceTransformer
+import threading
+import time
 
 
 class VarmaEmbedder:
     """
-    Embedding model wrapper for Varma RAG system
+    Embedding model wrapper for Varma RAG system.
+
+    The model is loaded on first encode(), so services whose questions are
+    answered by the lexical tiers never pay for it.
     """
 
-    def __init__(self):
-        self.model = SentenceTransformer("BAAI/bge-base-en")
+    MODEL_NAME = "BAAI/bge-base-en"
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+        self.load_ms = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Imported here so that importing the retriever does not load torch
+                    from sentence_transformers import SentenceTransformer
+
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    self.load_ms = (time.perf_counter() - start) * 1000
+                    print(f"✓ Loaded {self.model_name} in {self.load_ms:.0f}ms")
+        return self._model
 
-    def encode(self, texts):
-        return self.model.encode(texts, show_progress_bar=True)
+    def encode(self, texts, show_progress_bar: bool = False):
+        return self.model.encode(texts, show_progress_bar=show_progress_bar)
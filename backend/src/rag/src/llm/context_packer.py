@@ -0,0 +1,235 @@
+"""
+Token-budgeted context packing between retrieval and build_prompt.
+
+Retrieved documents are split into fields ("Signs", "Indications",
+"Symptoms treated", ...). Empty fields are dropped, and so are list items
+a document already states elsewhere. Long fields are cut into chunks, and
+chunks are ranked by their overlap with the question. The best chunks
+fill the token budget. Each document keeps its name line, and the chosen
+chunks are written back in their original order so the context still
+reads like the documents.
+
+Token counts are estimates (words and punctuation, or 4 characters per
+token for non-Latin text, whichever is larger). No LLM tokenizer is needed.
+"""
+
+import math
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Tuple
+
+from ..bm25 import tokenize
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("VARMA_RAG_CONTEXT_TOKENS", 1024))
+MAX_CHUNK_TOKENS = 120
+
+# Fields that answer most questions rank above equally matching others
+FIELD_PRIORS = {
+    'indications': 0.6, 'signs': 0.5, 'symptoms treated': 0.5, 'description': 0.4,
+    'pathognomic sign': 0.4, 'surface anatomy': 0.3, 'location': 0.3, 'varmam type': 0.2, 'type': 0.2,
+    'laterality': 0.1, 'synonyms': 0.1, 'anatomical relations': 0.1, 'tamil literature': 0.0
+}
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return max(len(re.findall(r"\w+|[^\w\s]", text)), math.ceil(len(text) / 4))
+
+
+def _norm_item(item: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", item.lower())).strip()
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int
+    original_tokens: int
+    dropped_chunks: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.tokens)
+
+    def report(self) -> Dict:
+        return {
+            'tokens': self.tokens,
+            'original_tokens': self.original_tokens,
+            'tokens_saved': self.tokens_saved,
+            'dropped_chunks': self.dropped_chunks
+        }
+
+
+def fields_from_text(text: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    (title, [(label, body)]) from a RAG document in the load_json layout:
+    a "Varma Name: X" line, then blank-line separated "Label:\\nbody" blocks.
+    """
+    title = ""
+    fields = []
+    for block in re.split(r"\n\s*\n", text.strip()):
+        head, _, body = block.partition("\n")
+        label, sep, inline = head.partition(":")
+        if not sep:
+            fields.append(("", block.strip()))
+            continue
+        if label.strip().lower() == "varma name":
+            title = head.strip()
+            continue
+        fields.append((label.strip(), (inline.strip() + "\n" + body).strip()))
+    return title, fields
+
+
+def _list_items(body: str) -> List[str]:
+    """Comma/semicolon/line separated items when the body is a list, else []"""
+    items = [i.strip() for i in re.split(r"[,;\n]", body) if i.strip()]
+    if len(items) > 1 and sum(len(i.split()) for i in items) / len(items) <= 6:
+        return items
+    return []
+
+
+def _chunks(body: str) -> List[str]:
+    """Split a long field at sentence or item boundaries into <= MAX_CHUNK_TOKENS pieces"""
+    if count_tokens(body) <= MAX_CHUNK_TOKENS:
+        return [body]
+    pieces = re.split(r"(?<=[.;,])\s+|\n", body)
+    chunks, current = [], ""
+    for piece in pieces:
+        candidate = f"{current} {piece}".strip()
+        if current and count_tokens(candidate) > MAX_CHUNK_TOKENS:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class _Chunk:
+    __slots__ = ('doc', 'field', 'part', 'label', 'text', 'tokens', 'score')
+
+    def __init__(self, doc, field, part, label, text, score):
+        self.doc = doc
+        self.field = field
+        self.part = part
+        self.label = label
+        self.text = text
+        self.tokens = count_tokens(text)
+        self.score = score
+
+
+def pack_documents(
+    question: str,
+    documents: List[Tuple[str, List[Tuple[str, str]]]],
+    budget: int = None,
+    original_tokens: int = None
+) -> PackedContext:
+    """
+    `documents` are (title, [(label, body)]) in retrieval order. Returns the
+    packed context text; `original_tokens` defaults to the size of the
+    documents written out in full.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    question_terms = set(tokenize(question))
+
+    if original_tokens is None:
+        original_tokens = sum(
+            count_tokens(title) + sum(count_tokens(f"{label}: {body}") for label, body in fields)
+            for title, fields in documents
+        )
+
+    chunks: List[_Chunk] = []
+    seen_fields = set()
+    for doc, (title, fields) in enumerate(documents):
+        seen_items = set()
+        for field, (label, body) in enumerate(fields):
+            if not body or not body.strip():
+                continue
+            # The same field text in an earlier document (duplicate records)
+            field_key = (label.lower(), _norm_item(body))
+            if field_key in seen_fields:
+                continue
+            seen_fields.add(field_key)
+
+            items = _list_items(body)
+            if items:
+                fresh = [i for i in items if _norm_item(i) not in seen_items]
+                seen_items.update(_norm_item(i) for i in items)
+                if not fresh:
+                    continue
+                body = ", ".join(fresh)
+            else:
+                seen_items.add(_norm_item(body))
+
+            prior = FIELD_PRIORS.get(label.lower(), 0.2)
+            for part, text in enumerate(_chunks(body)):
+                terms = set(tokenize(text))
+                overlap = len(question_terms & terms) / len(question_terms) if question_terms else 0.0
+                # Earlier documents ranked higher in retrieval
+                score = 2.0 * overlap + prior - 0.05 * doc
+                chunks.append(_Chunk(doc, field, part, label, text, score))
+
+    # Every document keeps its name; the rest compete for the remaining budget
+    used = sum(count_tokens(title) for title, _ in documents if title)
+    chosen = []
+    for chunk in sorted(chunks, key=lambda c: (-c.score, c.doc, c.field, c.part)):
+        cost = chunk.tokens + count_tokens(chunk.label) + 1
+        if used + cost > budget:
+            continue
+        chosen.append(chunk)
+        used += cost
+    chosen.sort(key=lambda c: (c.doc, c.field, c.part))
+
+    sections = []
+    for doc, (title, _) in enumerate(documents):
+        lines = [title] if title else []
+        last_field = None
+        for chunk in chosen:
+            if chunk.doc != doc:
+                continue
+            if chunk.field != last_field:
+                lines.append(f"{chunk.label}: {chunk.text}" if chunk.label else chunk.text)
+                last_field = chunk.field
+            else:
+                lines[-1] += " " + chunk.text
+        if lines:
+            sections.append("\n".join(lines))
+
+    text = "\n\n".join(sections)
+    return PackedContext(text, count_tokens(text), original_tokens, len(chunks) - len(chosen))
+
+
+def pack_texts(question: str, texts: List[str], budget: int = None) -> PackedContext:
+    """Pack RAG documents given as text (see fields_from_text)"""
+    original = count_tokens("\n\n".join(texts))
+    return pack_documents(question, [fields_from_text(t) for t in texts], budget, original)
+
+
+class PackStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens = 0
+        self.original_tokens = 0
+
+    def record(self, packed: PackedContext):
+        with self._lock:
+            self.requests += 1
+            self.tokens += packed.tokens
+            self.original_tokens += packed.original_tokens
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            requests, tokens, original = self.requests, self.tokens, self.original_tokens
+        return {
+            'requests': requests,
+            'budget': CONTEXT_TOKEN_BUDGET,
+            'avg_tokens': round(tokens / requests, 1) if requests else None,
+            'avg_tokens_saved': round((original - tokens) / requests, 1) if requests else None,
+            'saved_ratio': round(1 - tokens / original, 4) if original else 0.0
+        }
+
+
+PACK_STATS = PackStats()
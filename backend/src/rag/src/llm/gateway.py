@@ -0,0 +1,308 @@
+"""
+Admission control in front of the LLM.
+
+Every generate()/generate_stream() call of a service goes through one
+LLMGateway per process:
+
+  - at most VARMA_LLM_CONCURRENCY calls run at once, so a burst of chat
+    questions cannot start a model run per request and starve symptom search;
+  - up to VARMA_LLM_QUEUE more wait for a slot, at most
+    VARMA_LLM_QUEUE_TIMEOUT seconds. A full queue is rejected at once
+    (429) and a wait that times out with 503, both with Retry-After;
+  - each call has a deadline of VARMA_LLM_TIMEOUT seconds, including
+    the time it queued;
+  - a circuit breaker opens after VARMA_LLM_BREAKER_FAILURES consecutive
+    failed or slow (> VARMA_LLM_SLOW_CALL s) calls. While it is open, calls
+    skip the model and return the caller's retrieval-only fallback answer.
+    After VARMA_LLM_BREAKER_RESET seconds one trial call is let through.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from .generator import TimeoutAnswer, generate, generate_stream, is_error_answer
+
+
+class LLMOverloaded(Exception):
+    """The call was not admitted; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, reason: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class GatewayAnswer(NamedTuple):
+    answer: str
+    fallback: Optional[str]     # why the retrieval-only answer was used, None for a model answer
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_after: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.opened = 0
+        self._trial_at = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """False while open; when half-open, True for one trial call at a time"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_after:
+                return False
+            # A trial that never reported back (e.g. a dropped stream) expires too
+            if self._trial_at is not None and now - self._trial_at < self.reset_after:
+                return False
+            self._trial_at = now
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._trial_at = None
+            if ok:
+                self.failures = 0
+                if self.opened_at is not None:
+                    print("✓ LLM circuit closed: the model answered again")
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    self.opened += 1
+                    print(f"⚠️ LLM circuit open after {self.failures} failed or slow calls; "
+                          f"answering from retrieval for {self.reset_after:.0f}s")
+                self.opened_at = time.monotonic()
+
+    def cancel_trial(self):
+        with self._lock:
+            self._trial_at = None
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_concurrent: int = 2,
+        max_waiting: int = 16,
+        queue_timeout: float = 10.0,
+        deadline: float = 120.0,
+        slow_call: float = 60.0,
+        breaker: CircuitBreaker = None
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.slow_call = slow_call
+        self.breaker = breaker or CircuitBreaker()
+
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self._stats = {
+            'completed': 0, 'failed': 0, 'slow': 0, 'deadline_exceeded': 0,
+            'rejected_queue_full': 0, 'rejected_queue_timeout': 0, 'fallbacks': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        return cls(
+            max_concurrent=int(os.environ.get("VARMA_LLM_CONCURRENCY", 2)),
+            max_waiting=int(os.environ.get("VARMA_LLM_QUEUE", 16)),
+            queue_timeout=float(os.environ.get("VARMA_LLM_QUEUE_TIMEOUT", 10)),
+            deadline=float(os.environ.get("VARMA_LLM_TIMEOUT", 120)),
+            slow_call=float(os.environ.get("VARMA_LLM_SLOW_CALL", 60)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.environ.get("VARMA_LLM_BREAKER_FAILURES", 3)),
+                reset_after=float(os.environ.get("VARMA_LLM_BREAKER_RESET", 30))
+            )
+        )
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    @contextmanager
+    def admit(self):
+        """A concurrency slot; yields the seconds left of the call's deadline"""
+        start = time.monotonic()
+        with self._lock:
+            self._reject_if_full()
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            self._count('rejected_queue_timeout')
+            raise LLMOverloaded(f"The model stayed busy for {self.queue_timeout:.0f}s, please retry",
+                                "queue_timeout", 503, max(1, int(self.queue_timeout)))
+
+        with self._lock:
+            self.active += 1
+        try:
+            yield max(1.0, self.deadline - (time.monotonic() - start))
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def _reject_if_full(self):
+        # Called with self._lock held
+        if self.active >= self.max_concurrent and self.waiting >= self.max_waiting:
+            self._stats['rejected_queue_full'] += 1
+            raise LLMOverloaded("Too many questions waiting for the model, please retry",
+                                "queue_full", 429, 1)
+
+    def check(self):
+        """Raise LLMOverloaded now if a call would be rejected for a full queue"""
+        with self._lock:
+            self._reject_if_full()
+
+    def _finish(self, started: float, failed: bool) -> bool:
+        elapsed = time.monotonic() - started
+        slow = not failed and elapsed > self.slow_call
+        self._count('failed' if failed else 'completed')
+        if slow:
+            self._count('slow')
+        self.breaker.record(not (failed or slow))
+        return failed
+
+    def _circuit_open(self) -> LLMOverloaded:
+        return LLMOverloaded("The model is unavailable, please retry later", "circuit_open", 503,
+                             max(1, int(self.breaker.reset_after)))
+
+    def generate(
+        self,
+        prompt: str,
+        model: str = "llama3",
+        fallback: Callable[[], str] = None
+    ) -> GatewayAnswer:
+        """
+        generate() under admission control. With a `fallback`, an open
+        circuit or a failed call returns its answer instead of an error.
+        """
+        if not self.breaker.allow():
+            if fallback is None:
+                raise self._circuit_open()
+            self._count('fallbacks')
+            return GatewayAnswer(fallback(), "circuit_open")
+
+        try:
+            with self.admit() as remaining:
+                started = time.monotonic()
+                answer = generate(prompt, model, timeout=remaining)
+        except LLMOverloaded:
+            self.breaker.cancel_trial()
+            raise
+        failed = is_error_answer(answer)
+        if isinstance(answer, TimeoutAnswer):
+            self._count('deadline_exceeded')
+
+        if self._finish(started, failed) and fallback is not None:
+            self._count('fallbacks')
+            return GatewayAnswer(fallback(), "llm_error")
+        return GatewayAnswer(answer, None)
+
+    def stream(
+        self,
+        prompt: str,
+        model: str = "llama3",
+        fallback: Callable[[], str] = None
+    ) -> Iterator[Dict]:
+        """
+        generate_stream() under admission control. Stops with an error chunk
+        at the deadline. When the call fails before its first token (or the
+        circuit is open), the fallback answer is streamed as one chunk and the
+        closing chunk names the reason under 'fallback'.
+        """
+        if not self.breaker.allow():
+            if fallback is None:
+                raise self._circuit_open()
+            self._count('fallbacks')
+            yield {"response": fallback(), "done": False}
+            yield {"done": True, "fallback": "circuit_open"}
+            return
+
+        try:
+            with self.admit() as remaining:
+                started = time.monotonic()
+                failed = False
+                forwarded = False
+                held = None
+                final = {"done": True}
+                source = generate_stream(prompt, model, timeout=remaining)
+                try:
+                    for chunk in source:
+                        if time.monotonic() - started > remaining:
+                            self._count('deadline_exceeded')
+                            failed = True
+                            final = {"done": True, "error": f"model did not finish within {remaining:.0f}s"}
+                            break
+                        if chunk.get("done"):
+                            if chunk.get("timeout"):
+                                self._count('deadline_exceeded')
+                            final = chunk
+                            failed = failed or bool(chunk.get("error"))
+                            break
+                        text = chunk.get("response", "")
+                        if not forwarded and is_error_answer(text.strip()):
+                            # Replaced by the fallback answer below when there is one
+                            failed = True
+                            held = chunk
+                            continue
+                        forwarded = forwarded or bool(text)
+                        yield chunk
+                finally:
+                    source.close()
+        except LLMOverloaded:
+            self.breaker.cancel_trial()
+            raise
+
+        self._finish(started, failed)
+        if failed and not forwarded and fallback is not None:
+            self._count('fallbacks')
+            yield {"response": fallback(), "done": False}
+            yield {"done": True, "fallback": "llm_error"}
+            return
+        if held is not None:
+            yield held
+            final = dict(final, error=final.get("error") or held.get("response", "").strip())
+        yield final
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active'] = self.active
+            stats['waiting'] = self.waiting
+        stats.update({
+            'max_concurrent': self.max_concurrent,
+            'max_waiting': self.max_waiting,
+            'queue_timeout_s': self.queue_timeout,
+            'deadline_s': self.deadline,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.opened
+        })
+        return stats
+
+
+LLM_GATEWAY = LLMGateway.from_env()
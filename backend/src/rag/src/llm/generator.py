@@ -1,50 +1,244 @@
+import os
 import subprocess
 import sys
+import threading
+import time
 
+from .ollama_client import OllamaError, OllamaTimeout, OllamaUnavailable, default_client
 
-def generate(prompt: str, model: str = "llama3") -> str:
-    """
-    Sends a prompt to the Ollama LLM and returns the generated response.
-    """
+# "auto": Ollama HTTP API, falling back to `ollama run` while the server is
+# unreachable; "http" or "subprocess" use one path only.
+LLM_BACKEND = os.environ.get("VARMA_LLM_BACKEND", "auto")
+HTTP_RETRY_AFTER = float(os.environ.get("VARMA_OLLAMA_RETRY_AFTER", 30))
+SUBPROCESS_TIMEOUT = float(os.environ.get("VARMA_OLLAMA_READ_TIMEOUT", 120))
+
+OLLAMA_NOT_FOUND_MESSAGE = "Note: Local LLM (Ollama) is not installed or found in PATH. \n\nHowever, I can still show you the retrieved information (see Sources below). \n\nTo enable full AI answers, please install Ollama."
 
-    import os
-    
-    # Determine executable path
+
+def _ollama_command() -> str:
+    """Path of the ollama executable"""
     ollama_cmd = "ollama"
-    
+
     # Check if we are on Windows and if the default command might be missing from PATH
     if sys.platform == 'win32':
         # Try to find it in common install location if 'where' fails (which we handle via the try-except logic usually, but let's be proactive)
         local_app_data = os.environ.get('LOCALAPPDATA', '')
         potential_path = os.path.join(local_app_data, 'Programs', 'Ollama', 'ollama.exe')
-        
+
         # If the file exists there, use the full path to be safe/robust
         if os.path.exists(potential_path):
              # We prefer the absolute path if we found it, to bypass PATH issues
              ollama_cmd = potential_path
 
+    return ollama_cmd
+
+
+def _response_from_output(stdout: str, stderr: str) -> str:
+    # Ollama often writes logs to stderr on Windows – do NOT treat as failure
+    if stdout and stdout.strip():
+        return stdout.strip()
+
+    # If truly nothing is generated, show stderr for debugging
+    if stderr and stderr.strip():
+        return f"Ollama error:\n{stderr.strip()}"
+
+    return "No response generated by the model."
+
+
+class TimeoutAnswer(str):
+    """The error answer of a call that ran out of time (an OllamaTimeout or a
+    killed `ollama run`); a plain str to callers that only show it"""
+
+
+def _timed_out(error) -> TimeoutAnswer:
+    return TimeoutAnswer(f"Error generating response: {error}")
+
+
+def is_error_answer(text: str) -> bool:
+    """True for the placeholder texts generate() returns instead of an answer"""
+    return (
+        text == OLLAMA_NOT_FOUND_MESSAGE
+        or text.startswith("Error generating response")
+        or text.startswith("Ollama error:")
+        or text == "No response generated by the model."
+    )
+
+
+_http_down_until = 0.0
+_http_lock = threading.Lock()
+_async_clients = {}
+
+
+def _use_http() -> bool:
+    if LLM_BACKEND == "subprocess":
+        return False
+    if LLM_BACKEND == "http":
+        return True
+    with _http_lock:
+        return time.monotonic() >= _http_down_until
+
+
+def _http_failed(error: Exception):
+    """In auto mode, skip the HTTP path for a while after the server was unreachable"""
+    global _http_down_until
+    with _http_lock:
+        _http_down_until = time.monotonic() + HTTP_RETRY_AFTER
+    print(f"⚠️ {error}; using `ollama run` for the next {HTTP_RETRY_AFTER:.0f}s")
+
+
+def preload(model: str = "llama3"):
+    """Ask the Ollama server to load and pin the model before the first question"""
+    if LLM_BACKEND != "subprocess":
+        threading.Thread(target=default_client().preload, args=(model,), daemon=True).start()
+
+
+def generate(prompt: str, model: str = "llama3", timeout: float = None) -> str:
+    """
+    Sends a prompt to the Ollama LLM and returns the generated response.
+    """
+    if _use_http():
+        try:
+            return default_client().generate(prompt, model, timeout=timeout)
+        except OllamaTimeout as e:
+            return _timed_out(e)
+        except OllamaError as e:
+            # A server that is up but slow would be just as slow through `ollama run`
+            return f"Error generating response: {str(e)}"
+        except OllamaUnavailable as e:
+            if LLM_BACKEND == "http":
+                return f"Error generating response: {str(e)}"
+            _http_failed(e)
+    return _generate_subprocess(prompt, model, timeout)
+
+
+def generate_stream(prompt: str, model: str = "llama3", timeout: float = None):
+    """
+    Streaming generate(): yields Ollama-style chunks, {'response': text,
+    'done': False} per token and a closing {'done': True, ...} with the
+    server's eval_count / eval_duration when it reports them. The subprocess
+    fallback yields the whole answer as a single chunk. The closing chunk
+    of a call that ran out of time has 'timeout': True.
+    """
+    if _use_http():
+        started = False
+        try:
+            for chunk in default_client().stream(prompt, model, timeout=timeout):
+                started = True
+                yield chunk
+            return
+        except (OllamaError, OllamaTimeout) as e:
+            yield {"response": f"Error generating response: {str(e)}", "done": False}
+            if isinstance(e, OllamaTimeout):
+                yield {"done": True, "error": str(e), "timeout": True}
+            else:
+                yield {"done": True, "error": str(e)}
+            return
+        except OllamaUnavailable as e:
+            if started or LLM_BACKEND == "http":
+                yield {"response": f"Error generating response: {str(e)}", "done": False}
+                yield {"done": True, "error": str(e)}
+                return
+            _http_failed(e)
+
+    answer = _generate_subprocess(prompt, model, timeout)
+    yield {"response": answer, "done": False}
+    yield {"done": True, "timeout": True} if isinstance(answer, TimeoutAnswer) else {"done": True}
+
+
+def _generate_subprocess(prompt: str, model: str, timeout: float = None) -> str:
+    timeout = timeout if timeout is not None else SUBPROCESS_TIMEOUT
     try:
         process = subprocess.Popen(
-            [ollama_cmd, "run", model],
+            [_ollama_command(), "run", model],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             text=True,
             encoding="utf-8"
         )
-        stdout, stderr = process.communicate(prompt)
+        try:
+            stdout, stderr = process.communicate(prompt, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            return _timed_out(f"model did not answer within {timeout:.0f}s")
+        return _response_from_output(stdout, stderr)
+
+    except FileNotFoundError:
+        return OLLAMA_NOT_FOUND_MESSAGE
+    except Exception as e:
+        return f"Error generating response: {str(e)}"
+
+
+def _async_client():
+    """One httpx client per event loop, or None when httpx is not installed"""
+    import asyncio
 
-        # Ollama often writes logs to stderr on Windows – do NOT treat as failure
-        if stdout and stdout.strip():
-            return stdout.strip()
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        try:
+            from .ollama_client import AsyncOllamaClient
+            client = AsyncOllamaClient()
+        except ImportError:
+            return None
+        _async_clients[loop] = client
+    return client
 
-        # If truly nothing is generated, show stderr for debugging
-        if stderr and stderr.strip():
-            return f"Ollama error:\n{stderr.strip()}"
 
-        return "No response generated by the model."
+async def agenerate(prompt: str, model: str = "llama3", timeout: float = None) -> str:
+    """
+    Asyncio variant of generate(). The HTTP call is awaited on the event
+    loop (httpx), or run in a thread when httpx is not installed.
+    """
+    import asyncio
+
+    if _use_http():
+        try:
+            client = _async_client()
+            if client is not None:
+                return await client.generate(prompt, model, timeout=timeout)
+            return await asyncio.to_thread(default_client().generate, prompt, model, None, timeout)
+        except OllamaTimeout as e:
+            return _timed_out(e)
+        except OllamaError as e:
+            # A server that is up but slow would be just as slow through `ollama run`
+            return f"Error generating response: {str(e)}"
+        except OllamaUnavailable as e:
+            if LLM_BACKEND == "http":
+                return f"Error generating response: {str(e)}"
+            _http_failed(e)
+    return await _agenerate_subprocess(prompt, model, timeout)
+
+
+async def _agenerate_subprocess(prompt: str, model: str, timeout: float = None) -> str:
+    """The model runs in a child process that is awaited, so the event loop
+    keeps serving other requests meanwhile."""
+    import asyncio
+
+    timeout = timeout if timeout is not None else SUBPROCESS_TIMEOUT
+    try:
+        process = await asyncio.create_subprocess_exec(
+            _ollama_command(), "run", model,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(prompt.encode("utf-8")),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return _timed_out(f"model did not answer within {timeout:.0f}s")
+        return _response_from_output(
+            stdout.decode("utf-8", errors="replace"),
+            stderr.decode("utf-8", errors="replace")
+        )
 
     except FileNotFoundError:
-        return "Note: Local LLM (Ollama) is not installed or found in PATH. \n\nHowever, I can still show you the retrieved information (see Sources below). \n\nTo enable full AI answers, please install Ollama."
+        return OLLAMA_NOT_FOUND_MESSAGE
     except Exception as e:
         return f"Error generating response: {str(e)}"
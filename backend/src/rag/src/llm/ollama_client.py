@@ -0,0 +1,256 @@
+"""
+HTTP client for a local Ollama server (POST /api/generate).
+
+Connections are pooled and kept alive, and every request passes
+`keep_alive` so Ollama keeps the model loaded between questions instead
+of reloading it. Connection failures and 502/503 answers (model still
+loading) are retried with backoff; a read timeout is not, since the model
+may still be generating.
+
+Settings (environment):
+    OLLAMA_HOST                    server URL (default http://127.0.0.1:11434)
+    VARMA_OLLAMA_KEEP_ALIVE        how long Ollama keeps the model loaded (default 30m)
+    VARMA_OLLAMA_CONNECT_TIMEOUT   seconds (default 2)
+    VARMA_OLLAMA_READ_TIMEOUT      seconds (default 120)
+    VARMA_OLLAMA_RETRIES           extra attempts on connection errors (default 2)
+    VARMA_OLLAMA_POOL_SIZE         pooled connections per process (default 8)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+RETRY_STATUSES = (502, 503)
+
+
+class OllamaUnavailable(Exception):
+    """The server could not be reached (or kept failing) within the retries"""
+
+
+class OllamaTimeout(OllamaUnavailable):
+    """The server was reached but did not answer within the read timeout"""
+
+
+class OllamaError(Exception):
+    """The server answered with an error (e.g. unknown model)"""
+
+
+def _host_url(host: str) -> str:
+    host = host.strip().rstrip("/")
+    if "://" not in host:
+        host = "http://" + host
+    return host
+
+
+class OllamaConfig:
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        keep_alive: str = "30m",
+        connect_timeout: float = 2.0,
+        read_timeout: float = 120.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 8
+    ):
+        self.host = _host_url(host)
+        self.keep_alive = keep_alive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+
+    @classmethod
+    def from_env(cls) -> "OllamaConfig":
+        return cls(
+            host=os.environ.get("OLLAMA_HOST", DEFAULT_HOST),
+            keep_alive=os.environ.get("VARMA_OLLAMA_KEEP_ALIVE", "30m"),
+            connect_timeout=float(os.environ.get("VARMA_OLLAMA_CONNECT_TIMEOUT", 2)),
+            read_timeout=float(os.environ.get("VARMA_OLLAMA_READ_TIMEOUT", 120)),
+            retries=int(os.environ.get("VARMA_OLLAMA_RETRIES", 2)),
+            pool_size=int(os.environ.get("VARMA_OLLAMA_POOL_SIZE", 8))
+        )
+
+    def payload(self, prompt: str, model: str, options: Optional[Dict], stream: bool = False) -> Dict:
+        body = {"model": model, "prompt": prompt, "stream": stream, "keep_alive": self.keep_alive}
+        if options:
+            body["options"] = options
+        return body
+
+    def read_timeout_for(self, timeout: Optional[float]) -> float:
+        return timeout if timeout is not None else self.read_timeout
+
+
+def _answer(data: Dict) -> str:
+    if data.get("error"):
+        raise OllamaError(data["error"])
+    return (data.get("response") or "").strip()
+
+
+class OllamaClient:
+    """Blocking client; one pooled requests.Session per process"""
+
+    def __init__(self, config: OllamaConfig = None):
+        self.config = config or OllamaConfig.from_env()
+        self._lock = threading.Lock()
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        # A session inherited across fork() would share sockets with the
+        # parent, so each (gunicorn) worker opens its own.
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.config.pool_size)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _post(self, path: str, body: Dict, timeout: Optional[float] = None, stream: bool = False):
+        import requests
+
+        url = self.config.host + path
+        timeouts = (self.config.connect_timeout, self.config.read_timeout_for(timeout))
+        last_error = None
+        for attempt in range(self.config.retries + 1):
+            if attempt:
+                time.sleep(self.config.backoff * (2 ** (attempt - 1)))
+            try:
+                response = self.session.post(url, json=body, timeout=timeouts, stream=stream)
+            except requests.exceptions.ConnectionError as e:
+                last_error = e
+                continue
+            except requests.exceptions.Timeout as e:
+                raise OllamaTimeout(f"Ollama did not answer within {timeouts[1]:.0f}s") from e
+
+            if response.status_code in RETRY_STATUSES:
+                last_error = OllamaError(f"HTTP {response.status_code}")
+                response.close()
+                continue
+            if response.status_code >= 400:
+                try:
+                    message = response.json().get("error", response.text)
+                except ValueError:
+                    message = response.text
+                raise OllamaError(f"HTTP {response.status_code}: {message}")
+            return response
+
+        raise OllamaUnavailable(f"Ollama at {self.config.host} unreachable: {last_error}")
+
+    def generate(self, prompt: str, model: str = "llama3", options: Dict = None, timeout: float = None) -> str:
+        response = self._post("/api/generate", self.config.payload(prompt, model, options), timeout)
+        return _answer(response.json())
+
+    def stream(self, prompt: str, model: str = "llama3", options: Dict = None, timeout: float = None):
+        """
+        Yields Ollama's streamed chunks ({'response': token, 'done': False},
+        ..., then {'done': True, 'eval_count': ..., ...}). Retries only happen
+        before the first chunk; `timeout` bounds the wait between chunks.
+        """
+        import json
+        import requests
+
+        response = self._post("/api/generate", self.config.payload(prompt, model, options, stream=True),
+                              timeout, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise OllamaError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    return
+        except requests.exceptions.RequestException as e:
+            raise OllamaUnavailable(f"Ollama stream interrupted: {e}") from e
+        finally:
+            response.close()
+
+    def preload(self, model: str = "llama3") -> bool:
+        """Load the model and pin it for keep_alive (an empty prompt generates nothing)"""
+        try:
+            self._post("/api/generate", self.config.payload("", model, None))
+            return True
+        except (OllamaError, OllamaUnavailable) as e:
+            print(f"⚠️ Could not preload {model}: {e}")
+            return False
+
+    def ping(self) -> bool:
+        try:
+            return self.session.get(self.config.host + "/api/version", timeout=self.config.connect_timeout).ok
+        except Exception:
+            return False
+
+
+class AsyncOllamaClient:
+    """asyncio client built on httpx (optional dependency)"""
+
+    def __init__(self, config: OllamaConfig = None):
+        import httpx
+
+        self.config = config or OllamaConfig.from_env()
+        self._client = httpx.AsyncClient(
+            base_url=self.config.host,
+            limits=httpx.Limits(
+                max_connections=self.config.pool_size,
+                max_keepalive_connections=self.config.pool_size
+            )
+        )
+
+    async def generate(self, prompt: str, model: str = "llama3", options: Dict = None, timeout: float = None) -> str:
+        import asyncio
+        import httpx
+
+        timeouts = httpx.Timeout(self.config.read_timeout_for(timeout), connect=self.config.connect_timeout)
+        body = self.config.payload(prompt, model, options)
+        last_error = None
+        for attempt in range(self.config.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.config.backoff * (2 ** (attempt - 1)))
+            try:
+                response = await self._client.post("/api/generate", json=body, timeout=timeouts)
+            except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+                last_error = e
+                continue
+            except httpx.TimeoutException as e:
+                raise OllamaTimeout(f"Ollama did not answer within {timeouts.read:.0f}s") from e
+
+            if response.status_code in RETRY_STATUSES:
+                last_error = OllamaError(f"HTTP {response.status_code}")
+                continue
+            if response.status_code >= 400:
+                try:
+                    message = response.json().get("error", response.text)
+                except ValueError:
+                    message = response.text
+                raise OllamaError(f"HTTP {response.status_code}: {message}")
+            return _answer(response.json())
+
+        raise OllamaUnavailable(f"Ollama at {self.config.host} unreachable: {last_error}")
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+
+def default_client() -> OllamaClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OllamaClient()
+        return _client
@@ -0,0 +1,176 @@
+"""
+Token streaming for RAG answers, shared by rag_service.py and the
+/api/rag blueprint.
+
+stream_answer() yields (event, payload) pairs:
+
+    sources   the retrieved sources, before generation starts
+    token     {'text': ...} for every chunk the LLM produces
+    done      answer length, confidence, grounding and timing metadata
+
+Every payload also names its event, so NDJSON clients can tell them apart.
+
+Time to first token and tokens/second are recorded per process in
+STREAM_STATS and reported by the services' metrics endpoints.
+"""
+
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from ..evaluation.grounding_check import grounded
+from .generator import generate_stream, is_error_answer
+
+
+def _percentile(values: List[float], q: int):
+    if not values:
+        return None
+    if len(values) == 1:
+        return round(values[0], 2)
+    return round(statistics.quantiles(values, n=100, method='inclusive')[q - 1], 2)
+
+
+class StreamStats:
+    """Counters and a window of recent TTFT / tokens-per-second samples"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.completed = 0
+        self.errors = 0
+        self.tokens = 0
+        self._ttft_ms = deque(maxlen=window)
+        self._tokens_per_s = deque(maxlen=window)
+
+    def record(self, ttft_ms, tokens: int, tokens_per_s, error: bool):
+        with self._lock:
+            self.streams += 1
+            self.tokens += tokens
+            if error:
+                self.errors += 1
+            else:
+                self.completed += 1
+            if ttft_ms is not None:
+                self._ttft_ms.append(ttft_ms)
+            if tokens_per_s is not None:
+                self._tokens_per_s.append(tokens_per_s)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            ttft = list(self._ttft_ms)
+            rates = list(self._tokens_per_s)
+            counts = {
+                'streams': self.streams,
+                'completed': self.completed,
+                'errors': self.errors,
+                'tokens': self.tokens
+            }
+        counts['ttft_ms'] = {'p50': _percentile(ttft, 50), 'p95': _percentile(ttft, 95)}
+        counts['tokens_per_s'] = {
+            'mean': round(statistics.fmean(rates), 2) if rates else None,
+            'p50': _percentile(rates, 50)
+        }
+        return counts
+
+
+STREAM_STATS = StreamStats()
+
+
+def stream_answer(
+    prompt: str,
+    sources: List,
+    context: str,
+    confidence: float,
+    model: str = "llama3",
+    timeout: float = None,
+    extra: Dict = None,
+    on_answer: Callable[[str], None] = None,
+    chunks: Iterator[Dict] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    `on_answer` receives the complete answer when generation succeeded.
+    `chunks` replaces generate_stream() as the source of Ollama-style chunks
+    (e.g. LLMGateway.stream); a closing chunk with 'fallback' marks a
+    retrieval-only answer, which is reported but not passed to on_answer.
+    """
+    start = time.perf_counter()
+    yield 'sources', {'event': 'sources', 'sources': sources}
+
+    parts = []
+    tokens = 0
+    first_token_at = None
+    final = {}
+    if chunks is None:
+        chunks = generate_stream(prompt, model, timeout)
+    for chunk in chunks:
+        if chunk.get('done'):
+            final = chunk
+            break
+        text = chunk.get('response', '')
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        tokens += 1
+        parts.append(text)
+        yield 'token', {'event': 'token', 'text': text}
+
+    end = time.perf_counter()
+    answer = ''.join(parts).strip()
+
+    # Prefer the server's own token count and generation time when it reports them
+    eval_count = final.get('eval_count')
+    eval_seconds = (final.get('eval_duration') or 0) / 1e9
+    if eval_count and eval_seconds > 0:
+        tokens_per_s = eval_count / eval_seconds
+    elif first_token_at is not None and tokens > 1 and end > first_token_at:
+        tokens_per_s = (tokens - 1) / (end - first_token_at)
+    else:
+        tokens_per_s = None
+    ttft_ms = (first_token_at - start) * 1000 if first_token_at is not None else None
+
+    error = final.get('error')
+    STREAM_STATS.record(ttft_ms, eval_count or tokens, tokens_per_s, error is not None)
+
+    done = {
+        'event': 'done',
+        'confidence': confidence,
+        'grounded': grounded(answer, context) if answer and not error else False,
+        'answer_length': len(answer),
+        'tokens': eval_count or tokens,
+        'ttft_ms': round(ttft_ms, 2) if ttft_ms is not None else None,
+        'tokens_per_s': round(tokens_per_s, 2) if tokens_per_s is not None else None,
+        'elapsed_ms': round((end - start) * 1000, 2)
+    }
+    if error:
+        done['error'] = error
+    fallback = final.get('fallback')
+    if fallback:
+        done['fallback'] = fallback
+    if extra:
+        done.update(extra)
+    if on_answer is not None and answer and not error and not fallback and not is_error_answer(answer):
+        on_answer(answer)
+    yield 'done', done
+
+
+def replay_answer(answer: str, sources: List, context: str, confidence: float, extra: Dict = None):
+    """The stream_answer() events for an answer that is already known (e.g. cached)"""
+    start = time.perf_counter()
+    yield 'sources', {'event': 'sources', 'sources': sources}
+    yield 'token', {'event': 'token', 'text': answer}
+    done = {
+        'event': 'done',
+        'confidence': confidence,
+        'grounded': grounded(answer, context),
+        'answer_length': len(answer),
+        'tokens': None,
+        'ttft_ms': None,
+        'tokens_per_s': None,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+    if extra:
+        done.update(extra)
+    yield 'done', done
@@ -0,0 +1,170 @@
+"""
+Stand-in for a local Ollama server, for tests and load tests of the LLM
+path without a model.
+
+    cd backend/src/rag
+    python -m src.llm.stub_server --port 11434 --delay-ms 200 --tokens-per-s 40
+
+It answers POST /api/generate (streamed NDJSON or a single JSON object),
+GET /api/version and GET /api/tags like Ollama does. The answer is built
+from the prompt's question line, so it is deterministic. --fail-rate
+makes a share of requests answer 503 (--fail-status), to exercise the
+client's retries. The bodies of generate requests are kept in
+settings.bodies for tests.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+class StubSettings:
+    def __init__(self, delay_ms: float = 0.0, tokens_per_s: float = 0.0, fail_rate: float = 0.0,
+                 model: str = "llama3", fail_status: int = 503):
+        self.delay_ms = delay_ms
+        self.tokens_per_s = tokens_per_s
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.model = model
+        self.requests = 0
+        self.bodies = []
+        self.lock = threading.Lock()
+
+
+def stub_answer(prompt: str) -> str:
+    """Echo the text after build_prompt's "QUESTION:" header (or the prompt's start)"""
+    question = ""
+    lines = prompt.splitlines()
+    for i, line in enumerate(lines):
+        if line.strip().lower().startswith("question:"):
+            rest = line.split(":", 1)[1].strip()
+            question = rest or next((l.strip() for l in lines[i + 1:] if l.strip()), "")
+    question = question or prompt.strip()[:80]
+    return f"Stub answer about: {question}. This text comes from the Ollama stub server."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: StubSettings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "0.0.0-stub"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": f"{self.settings.model}:latest"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        settings = self.settings
+        with settings.lock:
+            settings.requests += 1
+            settings.bodies.append(body)
+        if settings.fail_rate and random.random() < settings.fail_rate:
+            self._send_json(settings.fail_status, {"error": "stub: simulated overload"})
+            return
+        if not body.get("model", "").startswith(settings.model):
+            self._send_json(404, {"error": f"model '{body.get('model')}' not found"})
+            return
+
+        start = time.perf_counter()
+        if settings.delay_ms:
+            time.sleep(settings.delay_ms / 1000)
+        tokens = [t + " " for t in stub_answer(body.get("prompt", "")).split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        pause = 1 / settings.tokens_per_s if settings.tokens_per_s else 0.0
+
+        if body.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                if pause:
+                    time.sleep(pause)
+                self._write_chunk({"model": body["model"], "response": token, "done": False})
+            self._write_chunk(self._final(body, "", len(tokens), start))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            if pause:
+                time.sleep(pause * len(tokens))
+            self._send_json(200, self._final(body, "".join(tokens), len(tokens), start))
+
+    def _write_chunk(self, payload: dict):
+        data = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _final(body: dict, response: str, eval_count: int, start: float) -> dict:
+        duration_ns = int((time.perf_counter() - start) * 1e9)
+        return {
+            "model": body["model"],
+            "response": response,
+            "done": True,
+            "total_duration": duration_ns,
+            "load_duration": 0,
+            "eval_count": eval_count,
+            "eval_duration": duration_ns
+        }
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, **settings) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the stub on a daemon thread; returns (server, base URL). port=0 picks a free port."""
+    handler = type("BoundStubHandler", (StubHandler,), {"settings": StubSettings(**settings)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama stub server for tests and load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=0.0, help="0 = no pacing")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered --fail-status")
+    parser.add_argument("--fail-status", type=int, default=503, help="status of the failed requests")
+    parser.add_argument("--model", default="llama3")
+    args = parser.parse_args()
+
+    handler = type("BoundStubHandler", (StubHandler,), {"settings": StubSettings(
+        args.delay_ms, args.tokens_per_s, args.fail_rate, args.model, args.fail_status
+    )})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"✓ Ollama stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
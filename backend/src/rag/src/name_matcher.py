@@ -0,0 +1,247 @@
+"""
+Varma name detection for name-first RAG retrieval.
+
+build_index.py saves a name table next to the index (varma_names.json):
+one entry per document row with the Varma name and its aliases: the
+synonyms listed in varma_data.json, "&"-joined alternatives, CamelCase
+splits and the name without its generic "Varmam"/"Kalam" suffix.
+
+VarmaNameMatcher compiles every alias into a token-level Aho-Corasick
+automaton, so one pass over the question finds every alias it contains.
+Overlapping hits resolve leftmost-longest ("visha manibantha varmam"
+beats "manibantha varmam"). When nothing matches exactly, a trigram
+index tolerates transliteration variants ("uchi varmam", "adhipathy").
+"""
+
+import json
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FORMAT_VERSION = 1
+
+GENERIC_SUFFIXES = {"varmam", "varma", "kalam", "kaalam"}
+MIN_STRIPPED_ALIAS = 4
+FUZZY_MIN_CHARS = 5
+FUZZY_MIN_SCORE = 0.6
+
+
+def tokenize(text: str) -> List[str]:
+    text = str(text).lower().replace("_", " ")
+    return re.findall(r"[^\W_]+", text)
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_aliases(name: str, synonyms: str = "") -> List[str]:
+    """Normalised surface forms under which a Varma point can be named"""
+    forms = []
+    parts = [name] + [p for p in name.split("&") if "&" in name]
+    for part in parts:
+        forms.append(part)
+        split = re.sub(r"(?<=[a-z])(?=[A-Z][a-z])", " ", part)
+        if split != part:
+            forms.append(split)
+
+    # Synonyms are a comma-separated list, optionally followed by prose
+    if synonyms:
+        head = synonyms.split(".", 1)[0]
+        forms.extend(s for s in head.split(",") if s.strip())
+
+    aliases = []
+    for form in forms:
+        tokens = tokenize(form)
+        if "&" in form or not tokens:
+            continue
+        candidates = [tokens]
+        if len(tokens) > 1 and tokens[-1] in GENERIC_SUFFIXES:
+            stripped = tokens[:-1]
+            if len("".join(stripped)) >= MIN_STRIPPED_ALIAS:
+                candidates.append(stripped)
+        for candidate in candidates:
+            alias = " ".join(candidate)
+            if alias not in aliases and alias not in GENERIC_SUFFIXES:
+                aliases.append(alias)
+    return aliases
+
+
+def write_name_table(records: Iterable[Dict], path, rows: Iterable[int] = None):
+    """Save names and aliases for index rows (records in row order, or at the given `rows`)"""
+    entries = []
+    records = list(records)
+    rows = list(rows) if rows is not None else range(len(records))
+    for row, record in zip(rows, records):
+        name = record.get("varmaName", "")
+        entries.append({
+            "row": row,
+            "name": name,
+            "aliases": name_aliases(name, record.get("synonyms", "") or "")
+        })
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "entries": entries}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def load_name_table(path) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported name table format {table.get('format')} in {path}")
+    return table["entries"]
+
+
+class VarmaNameMatcher:
+    """Token-level Aho-Corasick automaton over Varma aliases"""
+
+    def __init__(self, entries: List[Dict]):
+        # alias -> document rows that carry it (duplicate records share names)
+        self.alias_rows: Dict[str, List[int]] = {}
+        for entry in entries:
+            aliases = entry.get("aliases") or name_aliases(entry.get("name", ""))
+            for alias in aliases:
+                rows = self.alias_rows.setdefault(alias, [])
+                if entry["row"] not in rows:
+                    rows.append(entry["row"])
+        self.aliases = list(self.alias_rows)
+        self._build_automaton()
+        self._build_trigrams()
+
+    @classmethod
+    def from_names(cls, names: List[str]) -> "VarmaNameMatcher":
+        return cls([{"row": row, "name": name} for row, name in enumerate(names) if name])
+
+    def _build_automaton(self):
+        # Node n: goto[n] maps a token to a node; output[n] lists (alias id, length)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, int]]] = [[]]
+
+        for alias_id, alias in enumerate(self.aliases):
+            tokens = alias.split(" ")
+            node = 0
+            for token in tokens:
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][token] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = nxt
+            self._output[node].append((alias_id, len(tokens)))
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+        self.max_alias_tokens = max((len(a.split(" ")) for a in self.aliases), default=0)
+
+    def _build_trigrams(self):
+        self._alias_grams: List[int] = []
+        self._gram_index: Dict[str, List[int]] = {}
+        for alias_id, alias in enumerate(self.aliases):
+            grams = _trigrams(alias)
+            self._alias_grams.append(len(grams))
+            for gram in grams:
+                self._gram_index.setdefault(gram, []).append(alias_id)
+
+    def _exact(self, tokens: List[str]) -> List[Tuple[int, int, int, float]]:
+        """(start, end, alias id, score) for every alias in the token stream"""
+        hits = []
+        node = 0
+        for pos, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for alias_id, length in self._output[node]:
+                hits.append((pos + 1 - length, pos + 1, alias_id, 1.0))
+        return hits
+
+    def _fuzzy(self, tokens: List[str], min_score: float) -> List[Tuple[int, int, int, float]]:
+        """Token windows whose trigram Dice similarity to an alias is >= min_score"""
+        hits = []
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(len(tokens), start + self.max_alias_tokens) + 1):
+                window = tokens[start:end]
+                if window[0] in GENERIC_SUFFIXES:
+                    break
+                key = " ".join(window)
+                if len(key) < FUZZY_MIN_CHARS:
+                    continue
+                grams = _trigrams(key)
+                shared: Dict[int, int] = {}
+                for gram in grams:
+                    for alias_id in self._gram_index.get(gram, ()):
+                        shared[alias_id] = shared.get(alias_id, 0) + 1
+                for alias_id, count in shared.items():
+                    score = 2.0 * count / (len(grams) + self._alias_grams[alias_id])
+                    if score >= min_score:
+                        hits.append((start, end, alias_id, score))
+        return hits
+
+    @staticmethod
+    def _resolve(hits: List[Tuple[int, int, int, float]]) -> List[Tuple[int, int, int, float]]:
+        """Keep non-overlapping hits, best score first, then leftmost-longest"""
+        hits.sort(key=lambda h: (-h[3], h[0], h[0] - h[1]))
+        taken = []
+        for hit in hits:
+            if all(hit[1] <= t[0] or hit[0] >= t[1] for t in taken):
+                taken.append(hit)
+        taken.sort()
+        return taken
+
+    def match(self, question: str, fuzzy: bool = True, min_score: float = FUZZY_MIN_SCORE) -> List[Dict]:
+        """
+        Varma names mentioned in the question, in order of appearance:
+        [{'alias', 'rows', 'start', 'end', 'score', 'match'}]
+        """
+        tokens = tokenize(question)
+        hits = self._exact(tokens)
+        kind = "exact"
+        if not hits and fuzzy:
+            hits = self._fuzzy(tokens, min_score)
+            kind = "fuzzy"
+
+        return [
+            {
+                "alias": self.aliases[alias_id],
+                "rows": self.alias_rows[self.aliases[alias_id]],
+                "start": start,
+                "end": end,
+                "score": round(score, 3),
+                "match": kind
+            }
+            for start, end, alias_id, score in self._resolve(hits)
+        ]
+
+    def match_rows(self, question: str, fuzzy: bool = True) -> List[int]:
+        """Document rows of every Varma named in the question (deduplicated, in order)"""
+        rows: List[int] = []
+        for hit in self.match(question, fuzzy=fuzzy):
+            for row in hit["rows"]:
+                if row not in rows:
+                    rows.append(row)
+        return rows
+
+
+def load_matcher(names_path: Optional[Path], fallback_names: List[str]) -> VarmaNameMatcher:
+    """Matcher from the saved name table, or from bare names if none was built"""
+    if names_path is not None and Path(names_path).exists():
+        return VarmaNameMatcher(load_name_table(names_path))
+    print(f"⚠️ Name table {names_path} not found; matching on document ids only")
+    return VarmaNameMatcher.from_names(fallback_names)
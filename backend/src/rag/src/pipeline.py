@@ -0,0 +1,184 @@
+"""
+The RAG question pipeline, shared by rag_service.py and asgi_app.py:
+
+    search -> answer cache -> context packing -> LLM gateway -> answer cache
+
+RagPipeline owns the text-index retriever (reloaded when build_index.py
+rewrites the index files) and the answer cache of one process. answer()
+and stream() are blocking; the asyncio server runs them on a worker thread.
+Both raise LLMOverloaded when the gateway turns the question away.
+"""
+
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .answer_cache import AnswerCache
+from .llm.context_packer import PACK_STATS, fields_from_text, pack_texts
+from .llm.gateway import LLM_GATEWAY
+from .llm.generator import is_error_answer
+from .llm.prompt import build_prompt
+from .llm.streaming import STREAM_STATS, replay_answer, stream_answer
+from .retriever import VarmaRetriever
+
+# Fields quoted by the retrieval-only answer, in order
+FALLBACK_FIELDS = ("Indications", "Signs", "Surface Anatomy")
+
+
+def retrieval_only_answer(question: str, docs: List[Dict]) -> str:
+    """Answer from the retrieved documents alone, for when the LLM is failing or too slow"""
+    if not docs:
+        return "I couldn't find specific Varma points related to your question. Could you rephrase or provide more details?"
+
+    answer_parts = [f"Based on your question about '{question}', here's what I found:\n"]
+    for idx, doc in enumerate(docs[:3], 1):
+        _, fields = fields_from_text(doc.get("text", ""))
+        answer_parts.append(f"\n{idx}. **{doc.get('id', 'Unknown').replace('_', ' ')}**")
+        for label, body in fields:
+            if label in FALLBACK_FIELDS and body:
+                text = " ".join(body.split())
+                answer_parts.append(f"   - {label}: {text[:200] + '...' if len(text) > 200 else text}")
+    return "\n".join(answer_parts)
+
+
+class RagPipeline:
+    def __init__(self, index_path, store: Callable = None):
+        """
+        `index_path` is the FAISS index written by embeddings/build_index.py.
+        `store` returns the varma_knowledge store handed to every retriever
+        built from it (see VarmaRetriever).
+        """
+        self.index_path = Path(index_path)
+        self.store = store
+        self.retriever: Optional[VarmaRetriever] = None
+        self._reload_lock = threading.Lock()
+        try:
+            print(f"Loading retriever index from: {self.index_path}")
+            if not self.index_path.exists():
+                print(f"✗ Error: Index file not found at {self.index_path}")
+            else:
+                self.retriever = self._build()
+                print("\n✓ RAG Retriever initialized successfully!")
+        except Exception as e:
+            print(f"\n✗ Failed to initialize retriever: {e}")
+        self.answer_cache = AnswerCache.from_env(
+            self.retriever.index_version if self.retriever is not None else None
+        )
+
+    def _build(self, embedder=None) -> VarmaRetriever:
+        return VarmaRetriever(index_path=str(self.index_path),
+                              store=self.store() if self.store else None, embedder=embedder)
+
+    def current_retriever(self) -> Optional[VarmaRetriever]:
+        """
+        The retriever, rebuilt (keeping its loaded encoder) once build_index.py
+        has rewritten the index files. Cached answers from the old index are
+        dropped at the same time.
+        """
+        retriever = self.retriever
+        if retriever is not None and retriever.disk_version() != retriever.index_version:
+            with self._reload_lock:
+                old = self.retriever
+                if old.disk_version() != old.index_version:
+                    try:
+                        self.retriever = self._build(embedder=old.embedder)
+                        print("✓ RAG Retriever reloaded: index files changed")
+                    except Exception as e:
+                        # Mid-rebuild or broken files: keep answering from the old index
+                        print(f"✗ RAG index reload failed, keeping the loaded index: {e}")
+                retriever = self.retriever
+        if retriever is not None:
+            self.answer_cache.validate(retriever.index_version)
+        return retriever
+
+    def answer(self, question: str, retriever: VarmaRetriever = None) -> Dict:
+        """The /api/rag/query response for a question"""
+        rag = retriever or self.current_retriever()
+
+        # 1. Retrieve relevant documents (returns list of dicts with 'text' key)
+        found = rag.search(question)
+        docs = rag.documents(found)
+        doc_ids = [d.get("id", "") for d in docs]
+        if not docs:
+            # Nothing to ground an answer on: don't ask the model
+            print("⚠️ No documents retrieved; answering without the LLM")
+            return {
+                "answer": retrieval_only_answer(question, docs),
+                "sources": [],
+                "confidence": 0.0,
+                "cached": False,
+                "fallback": "no_match"
+            }
+
+        # 2. Reuse the answer to the same (or a paraphrased) question on the same documents
+        cached = self.answer_cache.get(question, doc_ids, found.embedding)
+        packed = None
+        fallback = None
+        if cached is not None:
+            print(f"✓ Answer cache hit ({cached.match}, similarity {cached.similarity})")
+            response_text = cached.answer
+        else:
+            # 3. Build Context: the most relevant fields within the token budget
+            packed = pack_texts(question, [d.get("text", "") for d in docs])
+            PACK_STATS.record(packed)
+            print(f"Context: {packed.tokens} tokens ({packed.tokens_saved} saved by packing)")
+
+            # 4. Generate Answer (bounded; the retrieval-only answer while the LLM is failing)
+            print("Generating answer with LLM...")
+            llm = LLM_GATEWAY.generate(build_prompt(question, packed.text),
+                                       fallback=lambda: retrieval_only_answer(question, docs))
+            response_text, fallback = llm.answer, llm.fallback
+            if fallback:
+                print(f"⚠️ Answered from retrieval only ({fallback})")
+            else:
+                if not is_error_answer(response_text):
+                    self.answer_cache.put(question, doc_ids, response_text, found.embedding)
+                print("LLM Response received.")
+
+        # The frontend expects 'answer', 'sources' and 'confidence'; this retriever
+        # has no per-source metadata or scores, so simplified values are given.
+        response = {
+            "answer": response_text,
+            "sources": ["Varma Text Index"],
+            "confidence": 1.0,
+            "cached": cached is not None
+        }
+        if packed is not None:
+            response["context"] = packed.report()
+        if fallback:
+            response["fallback"] = fallback
+        return response
+
+    def stream(self, question: str, retriever: VarmaRetriever = None) -> Iterator[Tuple[str, Dict]]:
+        """answer() as stream_answer() events: sources, tokens, then done"""
+        rag = retriever or self.current_retriever()
+        found = rag.search(question)
+        docs = rag.documents(found)
+        sources = [d.get("id", "") for d in docs]
+        if not docs:
+            return replay_answer(retrieval_only_answer(question, docs), sources, "", confidence=0.0,
+                                 extra={"retrieval_tier": found.tier, "cached": False, "fallback": "no_match"})
+        packed = pack_texts(question, [d.get("text", "") for d in docs])
+
+        cached = self.answer_cache.get(question, sources, found.embedding)
+        if cached is not None:
+            return replay_answer(cached.answer, sources, packed.text, confidence=1.0,
+                                 extra={"retrieval_tier": found.tier, "cached": True})
+
+        PACK_STATS.record(packed)
+        prompt = build_prompt(question, packed.text)
+        return stream_answer(
+            prompt, sources, packed.text, confidence=1.0,
+            extra={"retrieval_tier": found.tier, "cached": False, "context": packed.report()},
+            on_answer=lambda answer: self.answer_cache.put(question, sources, answer, found.embedding),
+            chunks=LLM_GATEWAY.stream(prompt, fallback=lambda: retrieval_only_answer(question, docs))
+        )
+
+    def get_metrics(self) -> Dict:
+        """Retriever cascade metrics plus streaming, answer cache, packing and gateway stats"""
+        metrics = self.retriever.get_metrics()
+        metrics['streaming'] = STREAM_STATS.snapshot()
+        metrics['answer_cache'] = self.answer_cache.get_metrics()
+        metrics['context_packing'] = PACK_STATS.snapshot()
+        metrics['llm_gateway'] = LLM_GATEWAY.get_metrics()
+        return metrics
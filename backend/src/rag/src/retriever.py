@@ -1,42 +1,286 @@
-import pickle
-import re
-from src.embeddings.embedder import VarmaEmbedder
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
 
+from .bm25 import BM25Index
+from .chunking import hinted_fields, join_chunks
+from .doc_store import DocStore
+from .embeddings.embedder import VarmaEmbedder
+from .name_matcher import load_matcher, tokenize as name_tokens
 
-def normalize(text: str) -> str:
-    text = text.lower().replace("_", " ")
-    return re.sub(r"\s+", " ", text).strip()
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_INDEX_PATH = "varma_index.faiss"
+DEFAULT_DOCS_NAME = "varma_docs.jsonl"
+DEFAULT_NAMES_NAME = "varma_names.json"
+# Written last by build_index.py, so it marks a finished build
+DEFAULT_MANIFEST_NAME = "varma_index.manifest.json"
+
+# BM25 answers on its own when its confidence (see bm25.py) is at least this
+BM25_CONFIDENCE = float(os.environ.get("VARMA_RAG_BM25_CONFIDENCE", 0.6))
+# "miss": nothing retrieved (no BM25 hit while the encoder is unavailable)
+TIERS = ("name", "bm25", "dense", "miss")
+# Field-level indexes rank this many chunks per requested Varma point before grouping
+CHUNK_FANOUT = 4
+
+
+class Retrieval(NamedTuple):
+    tier: str
+    rows: List[int]
+    embedding: Optional["np.ndarray"]   # the question's BGE embedding, if the dense tier ran
+    # Field-level index: the chunk rows kept for each of `rows` (None: the whole record)
+    chunks: Optional[Tuple[Optional[Tuple[int, ...]], ...]] = None
+
+
+def index_version(*paths) -> str:
+    """Identifies one build of the index files (size and mtime of each)"""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        except OSError:
+            digest.update(f"{path}:missing;".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_index(index_path):
+    """Open a native FAISS index with its vectors memory-mapped, not copied into RAM"""
+    import faiss
+
+    flags = faiss.IO_FLAG_READ_ONLY | getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(str(index_path), flags)
+    except RuntimeError:
+        # Index types without mmap support are read normally
+        return faiss.read_index(str(index_path))
 
 
 class VarmaRetriever:
-    def __init__(self, index_path="varma_index.pkl"):
-        with open(index_path, "rb") as f:
-            self.index, self.docs = pickle.load(f)
-
-        self.embedder = VarmaEmbedder()
-
-        # Build name lookup
-        self.varma_lookup = []
-        for d in self.docs:
-            text = d.get("text", "")
-            for line in text.splitlines():
-                if line.lower().startswith("varma name"):
-                    name = line.split(":", 1)[-1].strip()
-                    self.varma_lookup.append({
-                        "name": normalize(name),
-                        "doc": d
-                    })
+    def __init__(self, index_path=DEFAULT_INDEX_PATH, docs_path=None, store=None, embedder=None):
+        """
+        `index_path` is a FAISS index written by embeddings/build_index.py and
+        `docs_path` its document store (default: varma_docs.jsonl next to it).
+        Names and synonyms for name-first retrieval come from varma_names.json
+        next to the index.
 
-    def retrieve(self, query, top_k=3):
-        nq = normalize(query)
+        `store` is an optional varma_knowledge.VarmaKnowledgeStore. When its
+        records line up with the indexed documents, documents are rendered
+        from the store on demand and the document store is never read, so the
+        process keeps one copy of the Varma data.
+
+        `embedder` lets a reloaded retriever keep the previous one's encoder.
+
+        A field-level index (VARMA_RAG_INDEX_MODE=fields, see chunking.py)
+        searches chunks and groups them by record: result rows are still
+        record rows, and documents() renders only the chosen fields.
+
+        Rows tombstoned by incremental builds (DocStore.deleted) are never
+        returned, nor are vectors past the last document: an incremental
+        build replaces the index before it appends the documents.
+        """
+        index_path = Path(index_path)
+        docs_path = Path(docs_path) if docs_path else index_path.with_name(DEFAULT_DOCS_NAME)
+        if not index_path.exists() or not docs_path.exists():
+            raise FileNotFoundError(
+                f"RAG index not found ({index_path}, {docs_path}); "
+                f"run embeddings/build_index.py from src/rag to build it"
+            )
+
+        self.manifest_path = index_path.with_name(DEFAULT_MANIFEST_NAME)
+        self.index_version = index_version(self.manifest_path)
+        self.index = load_index(index_path)
+        self.doc_store = DocStore(docs_path)
+        if self.index.ntotal < len(self.doc_store):
+            raise ValueError(
+                f"{index_path} has {self.index.ntotal} vectors but {docs_path} has "
+                f"{len(self.doc_store)} documents; rebuild the index"
+            )
+        # Vectors appended by a build that has not written their documents yet
+        self.pending_vectors = self.index.ntotal - len(self.doc_store)
+
+        # Loaded on the first question that reaches the dense tier
+        self.embedder = embedder or VarmaEmbedder()
+
+        self.deleted = self.doc_store.deleted
+
+        # Record row -> its live chunk rows
+        self.chunked = self.doc_store.parents is not None
+        self.record_chunks: List[List[int]] = []
+        if self.chunked:
+            parents = self.doc_store.parents
+            self.record_chunks = [[] for _ in range(max(parents) + 1 if parents else 0)]
+            for row, parent in enumerate(parents):
+                if row not in self.deleted:
+                    self.record_chunks[parent].append(row)
+            self.ids = [self.doc_store.ids[rows[0]] if rows else "" for rows in self.record_chunks]
+        else:
+            self.ids = [name if row not in self.deleted else "" for row, name in enumerate(self.doc_store.ids)]
 
-        # 1️⃣ Name-based retrieval (guaranteed)
-        for v in self.varma_lookup:
-            if v["name"] in nq or nq in v["name"]:
-                return [v["doc"]]
+        self.store = None
+        if store is not None and not self.deleted and self.ids == store.record_names:
+            self.store = store
 
-        # 2️⃣ Semantic fallback
-        query_embedding = self.embedder.encode([query])
-        _, indices = self.index.search(query_embedding, top_k)
+        self.name_matcher = load_matcher(index_path.with_name(DEFAULT_NAMES_NAME), self.ids)
+        # Tombstoned rows are indexed as empty documents so BM25 rows stay index rows
+        self.bm25 = BM25Index(
+            "" if row in self.deleted else
+            (self.doc_store[row]["text"] if self.chunked else self.document(row)["text"])
+            for row in range(len(self.doc_store))
+        )
+        self.bm25_confidence = BM25_CONFIDENCE
+
+        self._stats_lock = threading.Lock()
+        self._stats = {tier: {"hits": 0, "total_ms": 0.0} for tier in TIERS}
+        self._stats["requests"] = 0
+        self._stats["dense_unavailable"] = 0
+
+    def document(self, row):
+        """The whole document of a record row"""
+        if self.store is not None:
+            return self.store.document(row)
+        if self.chunked:
+            return join_chunks([self.doc_store[chunk] for chunk in self.record_chunks[row]])
+        return self.doc_store[row]
+
+    def documents(self, found: Retrieval) -> List[Dict]:
+        """Documents for a search() result, limited to the chosen fields on a field-level index"""
+        if found.chunks is None:
+            return [self.document(row) for row in found.rows]
+        return [
+            self.document(row) if chunks is None else join_chunks([self.doc_store[c] for c in chunks])
+            for row, chunks in zip(found.rows, found.chunks)
+        ]
+
+    def _group(self, chunk_rows: List[int], top_k: int) -> Tuple[List[int], Tuple[Tuple[int, ...], ...]]:
+        """Ranked chunk rows -> up to top_k record rows, each with its chunks in field order"""
+        grouped: Dict[int, List[int]] = {}
+        for chunk in chunk_rows:
+            parent = self.doc_store.parents[chunk]
+            if parent in grouped:
+                grouped[parent].append(chunk)
+            elif len(grouped) < top_k:
+                grouped[parent] = [chunk]
+        return list(grouped), tuple(tuple(sorted(chunks)) for chunks in grouped.values())
+
+    def _named_fields(self, query, rows) -> Tuple[Optional[Tuple[int, ...]], ...]:
+        """
+        The fields of named Varma points that the rest of the question asks
+        about ("signs of utchi varmam", "where is kondai kolli"); the whole
+        record when it asks about none in particular.
+        """
+        tokens = name_tokens(query)
+        named = set()
+        for hit in self.name_matcher.match(query):
+            named.update(range(hit["start"], hit["end"]))
+        rest = " ".join(token for i, token in enumerate(tokens) if i not in named)
+        hinted = hinted_fields(rest)
+
+        candidates = [chunk for row in rows for chunk in self.record_chunks[row]]
+        scores = self.bm25.scores(rest, candidates)
+        chosen = []
+        for row in rows:
+            chunks = tuple(
+                chunk for chunk in self.record_chunks[row]
+                if scores[chunk] > 0 or self.doc_store.fields[chunk] in hinted
+            )
+            chosen.append(chunks or None)
+        return tuple(chosen)
+
+    def disk_version(self) -> str:
+        """
+        Version of the last finished build on disk, from its manifest (differs
+        from index_version once a rebuild has written every file)
+        """
+        return index_version(self.manifest_path)
+
+    def cascade(self, query, top_k=3):
+        """(tier, rows) for a question; see search()"""
+        found = self.search(query, top_k)
+        return found.tier, found.rows
+
+    def search(self, query, top_k=3) -> Retrieval:
+        """
+        Every Varma the question names; else the BM25 top hits when BM25 is
+        confident; else the dense BGE search. Without an encoder the BM25
+        hits are returned whatever their confidence, or a "miss" with no rows.
+        """
+        start = time.perf_counter()
+
+        # 1️⃣ Name-based retrieval (guaranteed): every Varma named in the question
+        rows = self.name_matcher.match_rows(query)
+        if rows:
+            chunks = self._named_fields(query, rows) if self.chunked else None
+            return self._record("name", rows, start, chunks=chunks)
+
+        # 2️⃣ BM25 over the documents (or field chunks)
+        fanout = top_k * CHUNK_FANOUT if self.chunked else top_k
+        ranked, confidence = self.bm25.search(query, fanout)
+        bm25_rows = [row for row, _ in ranked]
+        bm25_chunks = None
+        if self.chunked:
+            bm25_rows, bm25_chunks = self._group(bm25_rows, top_k)
+        if bm25_rows and confidence >= self.bm25_confidence:
+            return self._record("bm25", bm25_rows, start, chunks=bm25_chunks)
+
+        # 3️⃣ Dense fallback
+        try:
+            query_embedding = self.embedder.encode([query])
+        except ImportError as e:
+            # sentence-transformers missing: the lexical ranking is all there is
+            with self._stats_lock:
+                self._stats["dense_unavailable"] += 1
+            if not bm25_rows:
+                print(f"⚠️ Dense retrieval unavailable ({e}); no BM25 results either")
+                return self._record("miss", [], start)
+            print(f"⚠️ Dense retrieval unavailable ({e}); using BM25 results")
+            return self._record("bm25", bm25_rows, start, chunks=bm25_chunks)
+
+        skipped = len(self.deleted) + self.pending_vectors
+        _, indices = self.index.search(query_embedding, min(fanout + skipped, self.index.ntotal))
+        rows = [
+            int(i) for i in indices[0]
+            if 0 <= i < len(self.doc_store) and int(i) not in self.deleted
+        ][:fanout]
+        chunks = None
+        if self.chunked:
+            rows, chunks = self._group(rows, top_k)
+        return self._record("dense", rows, start, query_embedding[0], chunks)
+
+    def _record(self, tier, rows, start, embedding=None, chunks=None):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats[tier]["hits"] += 1
+            self._stats[tier]["total_ms"] += elapsed_ms
+        return Retrieval(tier, rows, embedding, chunks)
+
+    def retrieve(self, query, top_k=3):
+        return self.documents(self.search(query, top_k))
 
-        return [self.docs[i] for i in indices[0]]
+    def get_metrics(self):
+        with self._stats_lock:
+            requests = self._stats["requests"]
+            tiers = {}
+            for tier in TIERS:
+                hits = self._stats[tier]["hits"]
+                tiers[tier] = {
+                    "hits": hits,
+                    "hit_rate": round(hits / requests, 4) if requests else 0.0,
+                    "avg_latency_ms": round(self._stats[tier]["total_ms"] / hits, 3) if hits else None
+                }
+            dense_unavailable = self._stats["dense_unavailable"]
+        return {
+            "requests": requests,
+            "index_mode": "fields" if self.chunked else "records",
+            "tombstones": len(self.deleted),
+            "tiers": tiers,
+            "bm25_confidence_threshold": self.bm25_confidence,
+            "dense_unavailable": dense_unavailable,
+            "encoder_loaded": self.embedder.loaded,
+            "encoder_load_ms": round(self.embedder.load_ms, 1) if self.embedder.load_ms else None
+        }
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Tests import the backend the way app.py does: `src.main...`, `src.rag.src...`
+BACKEND = Path(__file__).resolve().parent.parent
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
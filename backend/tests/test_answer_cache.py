@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+
+from src.rag.src.answer_cache import AnswerCache, question_intent
+
+DOCS = ["Utchi_Varmam"]
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = AnswerCache()
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+
+    hit = cache.get("what is utchi varmam", DOCS)
+
+    assert hit.answer == "answer"
+    assert hit.match == "exact"
+
+
+def test_paraphrase_with_the_same_intent_hits():
+    cache = AnswerCache()
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+
+    hit = cache.get("Tell me about utchi varmam", DOCS)
+
+    assert hit is not None
+    assert hit.match == "similar"
+
+
+def test_different_intent_on_the_same_varma_misses():
+    cache = AnswerCache()
+    cache.put("What is Utchi Varmam?", DOCS, "what answer")
+
+    assert cache.get("Where is utchi varmam?", DOCS) is None
+    assert cache.get("How is utchi varmam?", DOCS) is None
+    assert cache.get_metrics()["misses"] == 2
+
+
+def test_different_intent_misses_even_with_identical_embeddings():
+    cache = AnswerCache()
+    embedding = np.ones(8, dtype=np.float32)
+    cache.put("What is Utchi Varmam?", DOCS, "what answer", embedding)
+
+    assert cache.get("Where is utchi varmam?", DOCS, embedding) is None
+    assert cache.get("What's utchi varmam", DOCS, embedding).match == "similar"
+
+
+def test_other_documents_miss():
+    cache = AnswerCache()
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+
+    assert cache.get("What is Utchi Varmam?", ["Kondai_Kolli"]) is None
+
+
+def test_index_change_clears_entries():
+    cache = AnswerCache(index_version="v1")
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+
+    cache.validate("v2")
+
+    assert cache.get("What is Utchi Varmam?", DOCS) is None
+    assert cache.get_metrics()["invalidations"] == 1
+
+
+def test_expired_and_evicted_entries_miss():
+    cache = AnswerCache(max_entries=1, ttl_s=0.01)
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+    time.sleep(0.02)
+    assert cache.get("What is Utchi Varmam?", DOCS) is None
+
+    cache = AnswerCache(max_entries=1)
+    cache.put("What is Utchi Varmam?", DOCS, "first")
+    cache.put("Where is Utchi Varmam?", DOCS, "second")
+    assert cache.get("What is Utchi Varmam?", DOCS) is None
+    assert cache.get_metrics()["evictions"] == 1
+
+
+def test_question_intent():
+    assert question_intent("Where is Utchi Varmam located?") == {"where"}
+    assert question_intent("Utchi varmam") == frozenset()
+
+
+def test_hit_rate_counts_exact_and_similar_hits():
+    cache = AnswerCache()
+    cache.put("What is Utchi Varmam?", DOCS, "answer")
+
+    cache.get("what is utchi varmam", DOCS)
+    cache.get("Tell me about utchi varmam", DOCS)
+    cache.get("Where is utchi varmam?", DOCS)
+    metrics = cache.get_metrics()
+
+    assert (metrics["exact_hits"], metrics["similar_hits"], metrics["misses"]) == (1, 1, 1)
+    assert metrics["hit_rate"] == round(2 / 3, 4)
+    assert (metrics["entries"], metrics["stores"]) == (1, 1)
+
+
+def test_bounds_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("VARMA_RAG_CACHE_SIZE", "8")
+    monkeypatch.setenv("VARMA_RAG_CACHE_TTL", "60")
+
+    metrics = AnswerCache.from_env("v1").get_metrics()
+
+    assert (metrics["max_entries"], metrics["ttl_s"], metrics["index_version"]) == (8, 60.0, "v1")
@@ -0,0 +1,210 @@
+import hashlib
+import json
+
+import faiss
+import numpy as np
+import pytest
+
+from src.rag.src.embeddings import build_index as builder
+from src.rag.src.doc_store import DocStore
+from src.rag.src.name_matcher import load_name_table
+from src.rag.src.pipeline import RagPipeline
+from src.rag.src.retriever import VarmaRetriever
+
+
+def record(name, signs):
+    return {"varmaName": name, "signs": signs, "indications": f"Used for {name}"}
+
+
+RECORDS = [
+    record("Utchi_Varmam", "Loss of head control, headache"),
+    record("Thilartha_Varmam", "Giddiness, fainting"),
+    record("Natchathira_Varmam", "Blurred vision"),
+    record("Pidari_Varmam", "Neck stiffness"),
+]
+
+
+def fake_vector(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return np.frombuffer(digest[:32], dtype=np.uint8).astype("float32")
+
+
+class Build:
+    def __init__(self, tmp_path, monkeypatch):
+        self.data = tmp_path / "varma_data.json"
+        self.index = tmp_path / "varma_index.faiss"
+        self.docs = tmp_path / "varma_docs.jsonl"
+        self.names = tmp_path / "varma_names.json"
+        self.manifest = tmp_path / "varma_index.manifest.json"
+        for name, path in [("DATA_PATH", self.data), ("INDEX_PATH", self.index), ("DOCS_PATH", self.docs),
+                           ("NAMES_PATH", self.names), ("MANIFEST_PATH", self.manifest)]:
+            monkeypatch.setattr(builder, name, str(path))
+        self.encoded = []
+        monkeypatch.setattr(builder, "encode", self.encode)
+        monkeypatch.setattr(builder, "COMPACT_RATIO", 1.0)
+
+    def encode(self, texts, batch_size, workers):
+        self.encoded.extend(texts)
+        return np.vstack([fake_vector(text) for text in texts]) if texts else None
+
+    def run(self, records, mode="records", full=False):
+        self.data.write_text(json.dumps({"varmas": records}), encoding="utf-8")
+        self.encoded = []
+        builder.build_index(mode, full, batch_size=2, workers=1)
+
+    def store(self):
+        store = DocStore(self.docs)
+        return store, [store[row] for row in range(len(store))]
+
+    def vectors(self):
+        index = faiss.read_index(str(self.index))
+        return np.vstack([index.reconstruct(row) for row in range(index.ntotal)])
+
+    def read_manifest(self):
+        return json.loads(self.manifest.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    return Build(tmp_path, monkeypatch)
+
+
+def test_first_build_embeds_every_record(build):
+    build.run(RECORDS)
+
+    manifest = build.read_manifest()
+    store, docs = build.store()
+    assert len(build.encoded) == 4
+    assert manifest["rows"] == 4
+    assert [entry["rows"] for entry in manifest["records"]] == [[0], [1], [2], [3]]
+    assert [doc["id"] for doc in docs] == [r["varmaName"] for r in RECORDS]
+    assert store.deleted == frozenset()
+
+
+def test_unchanged_data_encodes_nothing(build):
+    build.run(RECORDS)
+    before = build.index.read_bytes()
+
+    build.run(RECORDS)
+
+    assert build.encoded == []
+    assert build.index.read_bytes() == before
+
+
+def test_changed_record_is_appended_and_its_old_row_tombstoned(build):
+    build.run(RECORDS)
+    changed = RECORDS[:1] + [record("Thilartha_Varmam", "Giddiness, fainting, vomiting")] + RECORDS[2:]
+
+    build.run(changed)
+
+    store, docs = build.store()
+    manifest = build.read_manifest()
+    assert build.encoded == [builder.varma_to_text(changed[1])]
+    assert len(store) == 5
+    assert store.deleted == {1}
+    assert docs[4]["id"] == "Thilartha_Varmam"
+    assert manifest["records"][1]["rows"] == [4]
+    assert build.vectors().shape[0] == 5
+    # The name table points the changed record at its new row
+    rows = {entry["name"]: entry["row"] for entry in load_name_table(build.names)}
+    assert rows["Thilartha_Varmam"] == 4
+
+
+def test_removed_record_is_tombstoned_and_added_record_appended(build):
+    build.run(RECORDS)
+    updated = RECORDS[:2] + RECORDS[3:] + [record("Kondai_Kolli", "Dizziness")]
+
+    build.run(updated)
+
+    store, docs = build.store()
+    manifest = build.read_manifest()
+    assert len(build.encoded) == 1
+    assert store.deleted == {2}
+    assert [entry["rows"] for entry in manifest["records"]] == [[0], [1], [3], [4]]
+    assert docs[4]["id"] == "Kondai_Kolli"
+
+
+def test_compaction_matches_a_full_rebuild(build, monkeypatch):
+    build.run(RECORDS)
+    monkeypatch.setattr(builder, "COMPACT_RATIO", 0.1)
+    changed = RECORDS[:3] + [record("Pidari_Varmam", "Neck stiffness, fever")]
+
+    build.run(changed)
+
+    store, _ = build.store()
+    compacted = build.vectors()
+    assert build.encoded == [builder.varma_to_text(changed[3])]
+    assert len(store) == 4
+    assert store.deleted == frozenset()
+    assert [entry["rows"] for entry in build.read_manifest()["records"]] == [[0], [1], [2], [3]]
+
+    build.run(changed, full=True)
+    np.testing.assert_array_equal(compacted, build.vectors())
+
+
+def test_fields_mode_replaces_every_chunk_of_a_changed_record(build):
+    build.run(RECORDS, mode="fields")
+    first = build.read_manifest()["records"]
+    changed = [record("Utchi_Varmam", "Headache")] + RECORDS[1:]
+
+    build.run(changed, mode="fields")
+
+    store, docs = build.store()
+    manifest = build.read_manifest()
+    assert store.deleted == set(first[0]["rows"])
+    new_rows = manifest["records"][0]["rows"]
+    assert new_rows[0] == first[-1]["rows"][-1] + 1
+    assert {docs[row]["parent"] for row in new_rows} == {manifest["records"][0]["record"]}
+    assert manifest["next_record"] == 5
+
+
+def test_a_different_mode_rebuilds_from_scratch(build):
+    build.run(RECORDS)
+
+    build.run(RECORDS, mode="fields")
+
+    store, _ = build.store()
+    assert store.deleted == frozenset()
+    assert build.read_manifest()["mode"] == "fields"
+    assert len(build.encoded) == len(store)
+
+
+class FixedEmbedder:
+    """Encodes every question to one vector, so dense search can aim at a row"""
+    loaded = True
+    load_ms = None
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def encode(self, texts):
+        return np.vstack([self.vector for _ in texts])
+
+
+def test_readers_mid_build_keep_a_consistent_index(build, monkeypatch):
+    build.run(RECORDS)
+    pipeline = RagPipeline(build.index)
+    loaded = pipeline.current_retriever()
+    changed = RECORDS[:1] + [record("Thilartha_Varmam", "Giddiness, fainting, vomiting")] + RECORDS[2:]
+    new_vector = fake_vector(builder.varma_to_text(changed[1]))
+    append_doc_store = builder.append_doc_store
+    seen = []
+
+    def append_after_a_reader(docs, docs_path, deleted=()):
+        # The index already holds the new vector; its document is not written yet
+        fresh = VarmaRetriever(build.index, embedder=FixedEmbedder(new_vector))
+        fresh.bm25_confidence = float("inf")
+        found = fresh.search("no varma is named here", top_k=2)
+        seen.append((pipeline.current_retriever(), fresh.pending_vectors, found.tier, found.rows))
+        append_doc_store(docs, docs_path, deleted)
+
+    monkeypatch.setattr(builder, "append_doc_store", append_after_a_reader)
+    build.run(changed)
+
+    (mid_build, pending, tier, rows), = seen
+    assert mid_build is loaded and pending == 1
+    assert tier == "dense" and len(rows) == 2 and 4 not in rows
+    # The finished build (its manifest) is what triggers the reload
+    reloaded = pipeline.current_retriever()
+    assert reloaded is not loaded and reloaded.pending_vectors == 0
+    assert reloaded.ids[4] == "Thilartha_Varmam" and reloaded.deleted == {1}
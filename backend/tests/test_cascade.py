@@ -0,0 +1,159 @@
+import json
+import time
+
+import pytest
+
+from src.main.cascade import CascadePolicy
+from src.main.medical_synonyms import MedicalSynonymDict
+from src.main.scoring_and_retrieval import VarmaRetriever
+
+VARMA_TO_SYMPTOM = {
+    "Utchi_Varmam": ["headache", "tinnitus", "loss of head control"],
+    "Pidari_Varmam": ["neck pain", "fever"],
+    "Thilartha_Varmam": ["giddiness", "headache", "vomiting"],
+}
+
+
+def build_retriever(tmp_path, semantic_delay_s=0.0, **kwargs):
+    symptom_to_varma = {}
+    for varma, symptoms in VARMA_TO_SYMPTOM.items():
+        for symptom in symptoms:
+            symptom_to_varma.setdefault(symptom, []).append(varma)
+    varma_path = tmp_path / "02_varma_to_symptom.json"
+    symptom_path = tmp_path / "02_symptom_to_varma.json"
+    varma_path.write_text(json.dumps(VARMA_TO_SYMPTOM), encoding="utf-8")
+    symptom_path.write_text(json.dumps(symptom_to_varma), encoding="utf-8")
+
+    retriever = VarmaRetriever(varma_path, symptom_path, **kwargs)
+    # Stand-in for PubMedBERT: "ringing in ears" means tinnitus
+    retriever.semantic_matcher.semantic_available = True
+    retriever.semantic_searches = []
+
+    def semantic_search(query, top_k, threshold):
+        retriever.semantic_searches.append(query)
+        time.sleep(semantic_delay_s)
+        return [("tinnitus", 0.9)]
+
+    retriever.semantic_matcher.find_matches = semantic_search
+    return retriever
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    retriever = build_retriever(tmp_path, parallel_stages=True, semantic_workers=1, cascade=CascadePolicy())
+    yield retriever
+    retriever._executor.shutdown(wait=True)
+
+
+def test_policy_skips_semantic_only_for_clear_covering_matches():
+    policy = CascadePolicy()
+    synonyms = MedicalSynonymDict()
+    clear = [("headache", 1.0), ("fever", 0.95), ("vomiting", 0.9), ("neck pain", 0.5)]
+
+    assert policy.should_skip_semantic(["headache", "fever", "vomiting"], clear, synonyms)[0]
+    assert not policy.should_skip_semantic(["headache", "fever"], clear[:2], synonyms)[0]
+    assert not policy.should_skip_semantic(["headache", "fever", "vomiting", "rash"], clear, synonyms)[0]
+    close = clear[:3] + [("neck pain", 0.8 - 0.01)]
+    assert not policy.should_skip_semantic(["headache", "fever", "vomiting"], close, synonyms)[0]
+    assert not CascadePolicy(early_exit=False).should_skip_semantic(["headache"], clear, synonyms)[0]
+
+
+def test_speculative_semantic_result_is_used_when_lexical_is_not_enough(retriever):
+    result = retriever.retrieve("headache with ringing in ears")
+
+    stages = retriever.get_metrics()['stages']
+    assert result['semantic_stage'] == 'completed'
+    assert retriever.semantic_searches == ["headache with ringing in ears"]
+    assert (stages['speculative_semantic_started'], stages['speculative_semantic_used']) == (1, 1)
+
+
+def test_speculative_semantic_result_is_dropped_when_lexical_fills_the_results(retriever):
+    retriever.retrieve("headache", top_symptoms=1)
+
+    stages = retriever.get_metrics()['stages']
+    assert stages['speculative_semantic_started'] == 1
+    assert stages['speculative_semantic_discarded'] == 1
+    assert stages['speculative_semantic_used'] == 0
+
+
+def test_early_exit_discards_the_speculative_semantic_stage(retriever):
+    result = retriever.retrieve("headache, fever and vomiting")
+
+    stages = retriever.get_metrics()['stages']
+    assert result['semantic_stage'] == 'skipped-early-exit'
+    assert stages['semantic_skipped_early_exit'] == 1
+    assert stages['speculative_semantic_discarded'] == 1
+    assert stages['speculative_semantic_used'] == 0
+
+
+def test_discarded_speculative_runs_stay_out_of_the_cost_estimate(tmp_path):
+    retriever = build_retriever(tmp_path, semantic_delay_s=0.05, parallel_stages=True, semantic_workers=1,
+                                cascade=CascadePolicy(initial_semantic_cost_ms=1))
+    # Slow lexical stage, so the speculative run has started when the gate drops it
+    lexical = retriever.lexical_matcher.find_matches
+    retriever.lexical_matcher.find_matches = lambda *args: time.sleep(0.02) or lexical(*args)
+    try:
+        result = retriever.retrieve("headache, fever and vomiting")
+    finally:
+        retriever._executor.shutdown(wait=True)
+
+    metrics = retriever.get_metrics()
+    stages = metrics['stages']
+    assert result['semantic_stage'] == 'skipped-early-exit'
+    assert stages['speculative_semantic_discarded'] == stages['speculative_semantic_discarded_runs'] == 1
+    assert stages['semantic_runs'] == 0
+    assert metrics['cascade']['semantic_cost_estimate_ms'] == 1
+
+
+def test_budget_too_small_for_the_semantic_stage_skips_it(tmp_path):
+    retriever = build_retriever(tmp_path, cascade=CascadePolicy(initial_semantic_cost_ms=500))
+
+    result = retriever.retrieve("headache with ringing in ears", latency_budget_ms=100)
+
+    metrics = retriever.get_metrics()
+    assert result['semantic_stage'] == 'skipped-budget' and result['partial']
+    assert retriever.semantic_searches == []
+    assert metrics['stages']['semantic_skipped_budget'] == 1
+    assert metrics['stages']['partial_results'] == 1
+    assert metrics['cascade']['semantic_skip_rate'] == 1.0
+
+
+def test_policy_budget_applies_when_the_request_sets_none(tmp_path):
+    retriever = build_retriever(tmp_path, cascade=CascadePolicy(latency_budget_ms=100, initial_semantic_cost_ms=500))
+
+    assert retriever.retrieve("headache with ringing in ears")['semantic_stage'] == 'skipped-budget'
+    # An explicit budget overrides the policy's
+    result = retriever.retrieve("headache with ringing in ears", latency_budget_ms=10000)
+    assert result['semantic_stage'] == 'completed' and not result['partial']
+    assert retriever.get_metrics()['cascade']['semantic_skip_rate'] == 0.5
+
+
+def test_speculative_semantic_stage_is_abandoned_at_the_deadline(tmp_path):
+    retriever = build_retriever(tmp_path, semantic_delay_s=0.3, parallel_stages=True, semantic_workers=1,
+                                cascade=CascadePolicy())
+    try:
+        result = retriever.retrieve("headache with ringing in ears", latency_budget_ms=50)
+    finally:
+        retriever._executor.shutdown(wait=True)
+
+    stages = retriever.get_metrics()['stages']
+    assert result['semantic_stage'] == 'timed-out' and result['partial']
+    assert stages['semantic_timeouts'] == 1 and stages['partial_results'] == 1
+    assert "tinnitus" not in [m['symptom'] for m in result['matched_symptoms']]
+    # The stage was needed, so the late run still counts towards its cost
+    assert stages['semantic_runs'] == 1
+    assert retriever.get_metrics()['cascade']['semantic_cost_estimate_ms'] > 50
+
+
+def test_requests_over_budget_count_as_overruns(tmp_path):
+    # The estimate says the semantic stage fits in the budget; it takes 100ms
+    retriever = build_retriever(tmp_path, semantic_delay_s=0.1, cascade=CascadePolicy(initial_semantic_cost_ms=1))
+
+    result = retriever.retrieve("headache with ringing in ears", latency_budget_ms=20)
+    retriever.retrieve("fever")
+
+    metrics = retriever.get_metrics()
+    assert result['semantic_stage'] == 'completed' and not result['partial']
+    assert metrics['stages']['budget_overruns'] == 1
+    assert metrics['cascade']['budget_overrun_rate'] == 0.5
+    assert metrics['cascade']['semantic_cost_estimate_ms'] > 1
@@ -0,0 +1,108 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+from src.rag.src.chunking import hinted_fields, join_chunks, split_document
+from src.rag.src.embeddings import build_index as builder
+from src.rag.src.retriever import VarmaRetriever
+
+DOC = {
+    "id": "Utchi_Varmam",
+    "text": (
+        "Varma Name: Utchi_Varmam\n\n"
+        "Signs:\nLoss of head control, headache\n\n"
+        "Indications:\nUsed for giddiness\n\n"
+        "Surface Anatomy:\nVertex of the skull\n\n"
+        "Laterality:\n\n\n"
+        "Anatomical Relations:\nMuscles: \nArteries: \nVeins: \nNerves: "
+    )
+}
+RECORDS = [
+    {"varmaName": "Utchi_Varmam", "signs": "Loss of head control, headache",
+     "indications": "Used for giddiness", "surfaceAnatomy": "Vertex of the skull"},
+    {"varmaName": "Thilartha_Varmam", "signs": "Fainting and vomiting",
+     "indications": "Used for fainting", "surfaceAnatomy": "Lateral end of the eyebrow"},
+    {"varmaName": "Pidari_Varmam", "signs": "Neck stiffness",
+     "indications": "Used for neck pain", "surfaceAnatomy": "Back of the neck"},
+]
+
+
+def fake_vector(text):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return np.frombuffer(digest[:32], dtype=np.uint8).astype("float32")
+
+
+@pytest.fixture
+def retriever(tmp_path, monkeypatch):
+    """A retriever over a field-level index of RECORDS"""
+    data = tmp_path / "varma_data.json"
+    data.write_text(json.dumps({"varmas": RECORDS}), encoding="utf-8")
+    for name, file_name in [("DATA_PATH", data.name), ("INDEX_PATH", "varma_index.faiss"),
+                            ("DOCS_PATH", "varma_docs.jsonl"), ("NAMES_PATH", "varma_names.json"),
+                            ("MANIFEST_PATH", "varma_index.manifest.json")]:
+        monkeypatch.setattr(builder, name, str(tmp_path / file_name))
+    monkeypatch.setattr(builder, "encode",
+                        lambda texts, batch_size, workers: np.vstack([fake_vector(t) for t in texts]))
+    builder.build_index("fields", True, batch_size=4, workers=1)
+    return VarmaRetriever(tmp_path / "varma_index.faiss")
+
+
+def test_split_keeps_the_title_and_drops_empty_fields():
+    chunks = split_document(DOC, parent=7)
+
+    assert [chunk["field"] for chunk in chunks] == ["Signs", "Indications", "Surface Anatomy"]
+    assert all(chunk["parent"] == 7 and chunk["id"] == "Utchi_Varmam" for chunk in chunks)
+    assert chunks[0]["text"] == "Varma Name: Utchi_Varmam\n\nSigns:\nLoss of head control, headache"
+    # A document without fields keeps its title alone
+    assert split_document({"id": "X", "text": "Varma Name: X"}, 0)[0]["field"] == "Varma Name"
+
+
+def test_join_rebuilds_a_document_from_the_chosen_fields():
+    signs, _, anatomy = split_document(DOC, parent=0)
+
+    joined = join_chunks([signs, anatomy])
+
+    assert joined["id"] == "Utchi_Varmam" and joined["fields"] == ["Signs", "Surface Anatomy"]
+    assert joined["text"] == (
+        "Varma Name: Utchi_Varmam\n\nSigns:\nLoss of head control, headache\n\n"
+        "Surface Anatomy:\nVertex of the skull"
+    )
+
+
+def test_question_words_hint_at_fields():
+    assert hinted_fields("Where is it located?") == {"Surface Anatomy"}
+    assert hinted_fields("what does it treat and what are the symptoms") == {"Indications", "Signs"}
+    assert hinted_fields("tell me more") == set()
+
+
+def test_group_returns_record_rows_with_their_chunks_in_field_order(retriever):
+    utchi, thilartha, pidari = retriever.record_chunks
+
+    rows, chunks = retriever._group([thilartha[2], utchi[1], thilartha[0], pidari[0]], top_k=2)
+
+    assert rows == [1, 0]
+    assert chunks == ((thilartha[0], thilartha[2]), (utchi[1],))
+
+
+def test_named_points_bring_only_the_fields_asked_about(retriever):
+    where = retriever.search("where is thilartha varmam")
+    signs = retriever.search("signs of utchi varmam")
+    whole = retriever.search("utchi varmam")
+
+    assert (where.tier, where.rows) == ("name", [1])
+    assert retriever.documents(where)[0]["fields"] == ["Surface Anatomy"]
+    assert retriever.documents(signs)[0]["fields"] == ["Signs"]
+    # Nothing asked in particular: the whole record
+    assert whole.chunks == (None,)
+    assert "Indications:" in retriever.documents(whole)[0]["text"]
+
+
+def test_bm25_ranks_chunks_and_groups_them_by_record(retriever):
+    found = retriever.search("fainting and vomiting", top_k=1)
+    doc = retriever.documents(found)[0]
+
+    assert (found.tier, found.rows) == ("bm25", [1])
+    assert doc["id"] == "Thilartha_Varmam" and "Surface Anatomy" not in doc["fields"]
+    assert retriever.get_metrics()["index_mode"] == "fields"
@@ -0,0 +1,63 @@
+from src.rag.src.llm.context_packer import count_tokens, fields_from_text, pack_documents, pack_texts
+
+
+def document(name, signs, indications, tamil="", anatomy=""):
+    return (
+        f"Varma Name: {name}\n\n"
+        f"Signs:\n{signs}\n\n"
+        f"Indications:\n{indications}\n\n"
+        f"Tamil Literature:\n{tamil}\n\n"
+        f"Surface Anatomy:\n{anatomy}"
+    )
+
+
+def test_fields_from_text_reads_the_load_json_layout():
+    title, fields = fields_from_text(document("Utchi_Varmam", "Headache", "Stress management."))
+
+    assert title == "Varma Name: Utchi_Varmam"
+    assert fields[:2] == [("Signs", "Headache"), ("Indications", "Stress management.")]
+    assert fields[2] == ("Tamil Literature", "")
+
+
+def test_empty_fields_and_repeated_items_are_dropped():
+    texts = [
+        document("Utchi_Varmam", "Headache, tinnitus, ear pain", "Headache"),
+        document("Utchi_Varmam", "Headache, tinnitus, ear pain", "Stress management."),
+    ]
+
+    packed = pack_texts("headache", texts, budget=1000)
+
+    assert "Tamil Literature" not in packed.text
+    assert packed.text.count("tinnitus") == 1
+    assert packed.tokens < packed.original_tokens
+
+
+def test_packed_context_stays_within_the_budget_and_keeps_every_name():
+    long_field = ". ".join(f"Relieves condition number {i} of the neck" for i in range(60)) + "."
+    texts = [
+        document("Utchi_Varmam", "Headache", long_field, anatomy="Top of the head"),
+        document("Pidari_Varmam", "Neck stiffness", long_field, anatomy="Back of the neck"),
+    ]
+
+    packed = pack_texts("neck stiffness", texts, budget=120)
+
+    assert packed.tokens <= 120
+    assert "Varma Name: Utchi_Varmam" in packed.text
+    assert "Varma Name: Pidari_Varmam" in packed.text
+    assert "Signs: Neck stiffness" in packed.text
+    assert packed.dropped_chunks > 0
+
+
+def test_matching_fields_win_and_keep_their_order():
+    documents = [("Varma Name: Utchi_Varmam", [
+        ("Signs", "Loss of head control"),
+        ("Surface Anatomy", "Located at the crown of the head, at the junction of the sutures"),
+        ("Indications", "Regulates hormonal imbalance"),
+    ])]
+    tokens_for_one_field = count_tokens("Varma Name: Utchi_Varmam") + count_tokens(
+        "Surface Anatomy Located at the crown of the head, at the junction of the sutures") + 2
+
+    packed = pack_documents("where is the crown junction located", documents, budget=tokens_for_one_field)
+
+    assert packed.text == ("Varma Name: Utchi_Varmam\n"
+                           "Surface Anatomy: Located at the crown of the head, at the junction of the sutures")
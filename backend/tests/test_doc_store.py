@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+
+from src.rag.src.doc_store import DocStore, append_doc_store, write_doc_store
+from src.rag.src.retriever import load_index
+
+DOCS = [
+    {"id": "Utchi_Varmam", "text": "Varma Name: Utchi_Varmam\n\nSigns:\nheadache"},
+    {"id": "Thilartha_Varmam", "text": "Varma Name: Thilartha_Varmam\n\nSigns:\ngiddiness – fainting"},
+]
+MAPS = Path("/proc/self/maps")
+
+
+def is_mapped(path):
+    return any(str(path) in line for line in MAPS.read_text().splitlines())
+
+
+def test_documents_are_parsed_from_the_map_on_demand(tmp_path):
+    docs_path = tmp_path / "varma_docs.jsonl"
+    write_doc_store(DOCS, docs_path)
+    store = DocStore(docs_path)
+
+    assert len(store) == 2 and store.ids == ["Utchi_Varmam", "Thilartha_Varmam"]
+    # Opening reads the .idx file only
+    assert store._map is None
+    assert store[1] == DOCS[1] and store[-2] == DOCS[0]
+    assert store._map is not None
+    store.close()
+
+
+def test_open_readers_keep_their_rows_while_a_build_appends(tmp_path):
+    docs_path = tmp_path / "varma_docs.jsonl"
+    write_doc_store(DOCS, docs_path)
+    reader = DocStore(docs_path)
+    assert reader[0] == DOCS[0]
+
+    changed = {"id": "Utchi_Varmam", "text": "Varma Name: Utchi_Varmam\n\nSigns:\ntinnitus"}
+    append_doc_store([changed], docs_path, deleted=[0])
+    updated = DocStore(docs_path)
+
+    assert len(reader) == 2 and reader[0] == DOCS[0] and not reader.deleted
+    assert len(updated) == 3 and updated[2] == changed and updated.deleted == {0}
+    reader.close()
+    updated.close()
+
+
+@pytest.mark.skipif(not MAPS.exists(), reason="needs /proc/self/maps")
+def test_load_index_memory_maps_the_vectors(tmp_path):
+    index_path = tmp_path / "varma_index.faiss"
+    vectors = np.random.default_rng(0).random((64, 8), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(8)
+    index.add(vectors)
+    faiss.write_index(index, str(index_path))
+
+    loaded = load_index(index_path)
+    _, rows = loaded.search(vectors[5:6], 1)
+
+    assert loaded.ntotal == 64 and rows[0][0] == 5
+    assert is_mapped(index_path)
@@ -0,0 +1,162 @@
+import threading
+
+import pytest
+
+from src.rag.src.llm import gateway as gateway_module
+from src.rag.src.llm.gateway import CircuitBreaker, LLMGateway, LLMOverloaded
+from src.rag.src.llm.generator import TimeoutAnswer
+
+
+def expire(breaker: CircuitBreaker):
+    """Move the breaker's open time (and any trial) back past reset_after"""
+    breaker.opened_at -= breaker.reset_after
+    if breaker._trial_at is not None:
+        breaker._trial_at -= breaker.reset_after
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=30)
+
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.opened == 1
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record(False)
+    expire(breaker)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record(True)
+
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record(False)
+    expire(breaker)
+    assert breaker.allow()
+
+    breaker.record(False)
+
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_cancelled_or_expired_trial_allows_another():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30)
+    breaker.record(False)
+    expire(breaker)
+    assert breaker.allow()
+
+    breaker.cancel_trial()
+    assert breaker.allow()
+
+    # A trial that never reports back expires after reset_after
+    expire(breaker)
+    assert breaker.allow()
+
+
+def test_timeout_counts_the_deadline_and_uses_the_fallback(monkeypatch):
+    monkeypatch.setattr(gateway_module, "generate",
+                        lambda prompt, model, timeout: TimeoutAnswer("Error generating response: timed out"))
+    gateway = LLMGateway(breaker=CircuitBreaker(failure_threshold=5))
+
+    result = gateway.generate("prompt", fallback=lambda: "from retrieval")
+
+    assert result.answer == "from retrieval"
+    assert result.fallback == "llm_error"
+    metrics = gateway.get_metrics()
+    assert metrics["deadline_exceeded"] == 1
+    assert metrics["failed"] == 1
+    assert metrics["fallbacks"] == 1
+
+
+def test_error_text_alone_is_not_a_timeout(monkeypatch):
+    monkeypatch.setattr(gateway_module, "generate",
+                        lambda prompt, model, timeout: "Error generating response: model did not answer within 5s")
+    gateway = LLMGateway()
+
+    gateway.generate("prompt", fallback=lambda: "from retrieval")
+
+    assert gateway.get_metrics()["deadline_exceeded"] == 0
+    assert gateway.get_metrics()["failed"] == 1
+
+
+def test_stream_counts_a_timed_out_close(monkeypatch):
+    def timed_out_stream(prompt, model, timeout):
+        yield {"response": "Error generating response: timed out", "done": False}
+        yield {"done": True, "error": "timed out", "timeout": True}
+
+    monkeypatch.setattr(gateway_module, "generate_stream", timed_out_stream)
+    gateway = LLMGateway()
+
+    chunks = list(gateway.stream("prompt", fallback=lambda: "from retrieval"))
+
+    assert chunks == [{"response": "from retrieval", "done": False},
+                      {"done": True, "fallback": "llm_error"}]
+    assert gateway.get_metrics()["deadline_exceeded"] == 1
+
+
+def test_open_circuit_answers_from_the_fallback_without_calling_the_model(monkeypatch):
+    calls = []
+    monkeypatch.setattr(gateway_module, "generate",
+                        lambda prompt, model, timeout: calls.append(prompt) or "answer")
+    gateway = LLMGateway(breaker=CircuitBreaker(failure_threshold=1))
+    gateway.breaker.record(False)
+
+    result = gateway.generate("prompt", fallback=lambda: "from retrieval")
+
+    assert result.fallback == "circuit_open"
+    assert calls == []
+    with pytest.raises(LLMOverloaded) as rejected:
+        gateway.generate("prompt")
+    assert rejected.value.status == 503
+
+
+def test_full_queue_is_rejected_with_429_and_a_queue_timeout_with_503():
+    gateway = LLMGateway(max_concurrent=1, max_waiting=1, queue_timeout=0.05)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        with gateway.admit():
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    holding.wait(5)
+    try:
+        # One caller may wait; it gives up after queue_timeout
+        with pytest.raises(LLMOverloaded) as timed_out:
+            with gateway.admit():
+                pass
+        assert (timed_out.value.reason, timed_out.value.status) == ("queue_timeout", 503)
+
+        gateway.waiting = 1
+        with pytest.raises(LLMOverloaded) as full:
+            gateway.check()
+        assert (full.value.reason, full.value.status) == ("queue_full", 429)
+        gateway.waiting = 0
+    finally:
+        release.set()
+        holder.join()
+
+    metrics = gateway.get_metrics()
+    assert metrics["rejected_queue_timeout"] == 1
+    assert metrics["rejected_queue_full"] == 1
+    assert metrics["active"] == 0
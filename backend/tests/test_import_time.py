@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+from check_import_time import HEAVY_MODULES, TARGETS, measure
+
+# Budgets are multiplied by this on slow or shared machines
+SCALE = float(os.environ.get("VARMA_IMPORT_TIME_SCALE", 1.0))
+RUNS = 3
+
+
+@pytest.mark.parametrize("module, cwd, budget_ms", TARGETS, ids=[target[0] for target in TARGETS])
+def test_import_stays_light_and_within_budget(module, cwd, budget_ms):
+    best_ms = None
+    heavy = set()
+    for _ in range(RUNS):
+        elapsed_ms, imported = measure(module, cwd)
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+        heavy |= imported & HEAVY_MODULES
+
+    assert not heavy, f"{module} imports {', '.join(sorted(heavy))} at import time"
+    assert best_ms <= budget_ms * SCALE, f"{module}: {best_ms:.1f}ms > {budget_ms * SCALE:.0f}ms"
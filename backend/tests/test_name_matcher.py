@@ -0,0 +1,54 @@
+from src.rag.src.name_matcher import VarmaNameMatcher, load_matcher, name_aliases, write_name_table
+
+ENTRIES = [
+    {"row": 0, "name": "Manibantha_Varmam"},
+    {"row": 1, "name": "Visha_Manibantha_Varmam"},
+    {"row": 2, "name": "Adhipathi_Varmam"},
+    {"row": 3, "name": "Utchi_Varmam"},
+]
+
+
+def test_aliases_cover_splits_alternatives_and_synonyms():
+    assert name_aliases("Visha_Manibantha_Varmam") == [
+        "visha manibantha varmam", "visha manibantha"
+    ]
+    assert name_aliases("AdhipathiVarmam & Uchi Kalam") == [
+        "adhipathivarmam", "adhipathi varmam", "adhipathi", "uchi kalam", "uchi"
+    ]
+    assert "thilartha" in name_aliases("Thilartha_Kalam", "Thilartha, Netri Varmam. Located on the forehead")
+    assert "netri varmam" in name_aliases("Thilartha_Kalam", "Thilartha, Netri Varmam. Located on the forehead")
+
+
+def test_longest_overlapping_alias_wins():
+    matcher = VarmaNameMatcher(ENTRIES)
+
+    hits = matcher.match("Where is visha manibantha varmam?")
+
+    assert [(hit["alias"], hit["rows"], hit["match"]) for hit in hits] == [
+        ("visha manibantha varmam", [1], "exact")
+    ]
+
+
+def test_every_named_point_is_found_in_order():
+    matcher = VarmaNameMatcher(ENTRIES)
+
+    assert matcher.match_rows("Compare utchi varmam and adhipathi varmam") == [3, 2]
+
+
+def test_fuzzy_match_tolerates_transliteration_only_without_an_exact_hit():
+    matcher = VarmaNameMatcher(ENTRIES)
+
+    hits = matcher.match("what is adhipathy")
+
+    assert [(hit["alias"], hit["match"]) for hit in hits] == [("adhipathi", "fuzzy")]
+    assert matcher.match("what is adhipathy", fuzzy=False) == []
+    assert matcher.match("what is varmam") == []
+
+
+def test_name_table_round_trip_keeps_rows(tmp_path):
+    path = tmp_path / "varma_names.json"
+    write_name_table([{"varmaName": "Utchi_Varmam", "synonyms": "Uchi"}], path, rows=[7])
+
+    matcher = load_matcher(path, [])
+
+    assert matcher.match_rows("uchi") == [7]
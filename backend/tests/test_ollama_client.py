@@ -0,0 +1,163 @@
+import asyncio
+import sys
+
+import pytest
+import requests
+
+from src.rag.src.llm import generator
+from src.rag.src.llm import ollama_client as client_module
+from src.rag.src.llm import stub_server
+from src.rag.src.llm.generator import TimeoutAnswer
+from src.rag.src.llm.ollama_client import (
+    AsyncOllamaClient, OllamaClient, OllamaConfig, OllamaTimeout, OllamaUnavailable
+)
+from src.rag.src.llm.stub_server import start_stub_server, stub_answer
+
+PROMPT = "Context about Varma points\n\nQUESTION: where is utchi varmam\n\nANSWER:"
+
+
+@pytest.fixture
+def stub():
+    """start(**settings) -> (StubSettings, base URL) of a stub server on a free port"""
+    servers = []
+
+    def start(**settings):
+        server, url = start_stub_server(port=0, **settings)
+        servers.append(server)
+        return server.RequestHandlerClass.settings, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def refused_url() -> str:
+    """URL of a port that refuses connections"""
+    server, url = start_stub_server(port=0)
+    server.shutdown()
+    server.server_close()
+    return url
+
+
+def config(url, **overrides) -> OllamaConfig:
+    settings = {"host": url, "retries": 2, "backoff": 0.0, "read_timeout": 5.0}
+    settings.update(overrides)
+    return OllamaConfig(**settings)
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Point generate(), generate_stream() and agenerate() at a client with the given config"""
+    monkeypatch.setattr(generator, "LLM_BACKEND", "auto")
+    monkeypatch.setattr(generator, "_http_down_until", 0.0)
+
+    def use(cfg: OllamaConfig):
+        monkeypatch.setattr(client_module, "_client", OllamaClient(cfg))
+        monkeypatch.setattr(generator, "_async_client", lambda: AsyncOllamaClient(cfg))
+
+    return use
+
+
+def test_generate_stream_and_agenerate_go_through_the_http_api(stub, use_client):
+    settings, url = stub()
+    use_client(config(url))
+
+    answer = generator.generate(PROMPT)
+    chunks = list(generator.generate_stream(PROMPT))
+    async_answer = asyncio.run(generator.agenerate(PROMPT))
+
+    expected = stub_answer(PROMPT)
+    assert answer == async_answer == expected
+    assert "".join(c.get("response", "") for c in chunks[:-1]) == expected
+    assert chunks[-1]["done"] and chunks[-1]["eval_count"] == len(chunks) - 1
+    assert settings.requests == 3
+
+
+def test_every_request_carries_keep_alive(stub):
+    settings, url = stub()
+    client = OllamaClient(config(url, keep_alive="45m"))
+
+    client.generate(PROMPT)
+    list(client.stream(PROMPT))
+    assert client.preload()
+
+    assert [body["keep_alive"] for body in settings.bodies] == ["45m"] * 3
+    assert [body["stream"] for body in settings.bodies] == [False, True, False]
+    assert settings.bodies[-1]["prompt"] == ""
+
+
+@pytest.mark.parametrize("status", [502, 503])
+def test_502_and_503_are_retried(stub, monkeypatch, status):
+    settings, url = stub(fail_rate=0.5, fail_status=status)
+    # The first two requests fail, the rest succeed
+    outcomes = iter([0.0, 0.0])
+    monkeypatch.setattr(stub_server.random, "random", lambda: next(outcomes, 1.0))
+
+    assert OllamaClient(config(url)).generate(PROMPT) == stub_answer(PROMPT)
+    assert asyncio.run(AsyncOllamaClient(config(url, retries=0)).generate(PROMPT)) == stub_answer(PROMPT)
+    assert settings.requests == 4
+
+
+def test_persistent_503_gives_up_after_the_retries(stub):
+    settings, url = stub(fail_rate=1.0)
+
+    with pytest.raises(OllamaUnavailable, match="HTTP 503"):
+        OllamaClient(config(url, retries=1)).generate(PROMPT)
+    assert settings.requests == 2
+
+
+def test_connection_errors_are_retried(stub, monkeypatch):
+    settings, url = stub()
+    client = OllamaClient(config(url))
+    post = client.session.post
+    attempts = []
+
+    def flaky_post(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise requests.exceptions.ConnectionError("connection refused")
+        return post(*args, **kwargs)
+
+    monkeypatch.setattr(client.session, "post", flaky_post)
+
+    assert client.generate(PROMPT) == stub_answer(PROMPT)
+    assert len(attempts) == 2 and settings.requests == 1
+
+    with pytest.raises(OllamaUnavailable, match="unreachable"):
+        OllamaClient(config(refused_url(), retries=1)).generate(PROMPT)
+
+
+def test_read_timeout_maps_to_ollama_timeout(stub, use_client):
+    _, url = stub(delay_ms=500)
+    slow = config(url, read_timeout=0.1, retries=2)
+
+    with pytest.raises(OllamaTimeout):
+        OllamaClient(slow).generate(PROMPT)
+    with pytest.raises(OllamaTimeout):
+        list(OllamaClient(slow).stream(PROMPT))
+    with pytest.raises(OllamaTimeout):
+        asyncio.run(AsyncOllamaClient(slow).generate(PROMPT))
+
+    # The generator turns it into a TimeoutAnswer instead of falling back to `ollama run`
+    use_client(slow)
+    assert isinstance(generator.generate(PROMPT), TimeoutAnswer)
+    assert isinstance(asyncio.run(generator.agenerate(PROMPT)), TimeoutAnswer)
+    assert list(generator.generate_stream(PROMPT))[-1]["timeout"] is True
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses a shell script as the ollama executable")
+def test_unreachable_server_falls_back_to_ollama_run(tmp_path, use_client, monkeypatch):
+    fake_ollama = tmp_path / "ollama"
+    fake_ollama.write_text('#!/bin/sh\ncat > /dev/null\necho "answer from ollama run $2"\n')
+    fake_ollama.chmod(0o755)
+    monkeypatch.setattr(generator, "_ollama_command", lambda: str(fake_ollama))
+    use_client(config(refused_url(), retries=0))
+
+    assert generator.generate(PROMPT) == "answer from ollama run llama3"
+    assert generator._http_down_until > 0
+    # Within the retry window the HTTP path is skipped
+    assert list(generator.generate_stream(PROMPT)) == [
+        {"response": "answer from ollama run llama3", "done": False}, {"done": True}
+    ]
+    assert asyncio.run(generator.agenerate(PROMPT)) == "answer from ollama run llama3"
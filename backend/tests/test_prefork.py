@@ -0,0 +1,52 @@
+import gc
+import importlib
+import os
+from pathlib import Path
+
+import pytest
+
+from process_memory import memory_usage
+
+HAS_SMAPS = Path("/proc/self/smaps_rollup").exists()
+
+
+@pytest.mark.skipif(not HAS_SMAPS, reason="needs /proc/<pid>/smaps_rollup")
+def test_memory_usage_reports_pss_and_sharing():
+    usage = memory_usage()
+
+    assert set(usage) == {'rss_mb', 'pss_mb', 'shared_mb', 'private_mb'}
+    assert 0 < usage['pss_mb'] <= usage['rss_mb']
+    assert memory_usage(os.getpid())['rss_mb'] > 0
+
+
+@pytest.mark.skipif(not HAS_SMAPS or not hasattr(os, "fork"), reason="needs fork and smaps_rollup")
+def test_pages_loaded_before_fork_are_shared_with_the_child():
+    # Stands in for the model weights the gunicorn master preloads
+    preloaded = bytearray(os.urandom(1024)) * (48 * 1024)
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        os.write(write_end, str(memory_usage()['shared_mb']).encode())
+        os._exit(0)
+
+    os.close(write_end)
+    shared_mb = float(os.read(read_end, 64).decode())
+    os.close(read_end)
+    os.waitpid(pid, 0)
+
+    assert len(preloaded) == 48 * 1024 * 1024
+    assert shared_mb >= 40
+
+
+def test_wsgi_entry_point_freezes_the_preloaded_heap(tmp_path, monkeypatch):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    monkeypatch.setenv("VARMA_SNAPSHOT", str(tmp_path / "varma_retriever.snapshot"))
+    app = importlib.import_module("app")
+    try:
+        wsgi = importlib.import_module("wsgi")
+
+        assert wsgi.application is app.app
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
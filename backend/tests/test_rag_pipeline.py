@@ -0,0 +1,105 @@
+import copy
+import importlib
+from pathlib import Path
+
+import pytest
+from starlette.testclient import TestClient
+
+from src.rag.src.llm import gateway as gateway_module
+from src.rag.src.pipeline import RagPipeline
+
+RAG_INDEX = Path(__file__).resolve().parent.parent / "src" / "rag" / "varma_index.faiss"
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Stand-in for Ollama behind LLM_GATEWAY; records the prompts it gets"""
+    prompts = []
+
+    def generate(prompt, model, timeout):
+        prompts.append(prompt)
+        return "Utchi Varmam lies on the crown of the head."
+
+    monkeypatch.setattr(gateway_module, "generate", generate)
+    return prompts
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = RagPipeline(RAG_INDEX)
+    if pipeline.retriever is None:
+        pytest.skip("the RAG index could not be loaded here")
+    return pipeline
+
+
+@pytest.fixture(scope="module")
+def asgi(tmp_path_factory):
+    # asgi_app imports app, which builds its retriever at import
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        return importlib.import_module("asgi_app")
+
+
+def test_answer_packs_the_context_and_caches_the_model_answer(pipeline, model):
+    first = pipeline.answer("what is utchi varmam")
+    second = pipeline.answer("What is Utchi Varmam?")
+
+    assert first["answer"] == "Utchi Varmam lies on the crown of the head."
+    assert not first["cached"] and first["context"]["tokens"] > 0
+    assert second["cached"] and "context" not in second
+    assert len(model) == 1 and "Utchi" in model[0]
+
+
+def test_failed_model_answers_are_not_cached(pipeline, monkeypatch):
+    replies = ["Ollama error: 500", "Thilartha Varmam lies at the temple."]
+    monkeypatch.setattr(gateway_module, "generate", lambda prompt, model, timeout: replies.pop(0))
+
+    failed = pipeline.answer("where is thilartha varmam")
+    retried = pipeline.answer("where is thilartha varmam")
+
+    assert failed["fallback"] == "llm_error" and not failed["cached"]
+    assert retried["answer"] == "Thilartha Varmam lies at the temple." and not retried["cached"]
+
+
+def test_rebuilt_index_clears_the_answer_cache(pipeline, model, monkeypatch):
+    pipeline.answer("what is utchi varmam")
+    # As if build_index.py had rewritten the index files
+    rebuilt = copy.copy(pipeline.retriever)
+    rebuilt.index_version = "rebuilt"
+    monkeypatch.setattr(type(rebuilt), "disk_version", lambda self: "rebuilt")
+    monkeypatch.setattr(pipeline, "_build", lambda embedder=None: rebuilt)
+
+    assert pipeline.current_retriever() is rebuilt
+    assert pipeline.answer_cache.get_metrics()["invalidations"] == 1
+    assert not pipeline.answer("what is utchi varmam")["cached"]
+    assert len(model) == 2
+
+
+def test_asgi_route_runs_the_shared_pipeline(asgi, pipeline, model, monkeypatch):
+    monkeypatch.setattr(asgi, "_rag_pipeline", pipeline)
+    client = TestClient(asgi.app)
+
+    first = client.post("/api/rag/query", json={"question": "what is utchi varmam"})
+    second = client.post("/api/rag/query", json={"question": "what is utchi varmam"})
+
+    assert first.status_code == 200
+    assert first.json()["answer"] == "Utchi Varmam lies on the crown of the head."
+    assert second.json()["cached"] is True
+    assert len(model) == 1
+
+
+def test_asgi_route_rejects_while_the_llm_queue_is_full(asgi, pipeline, model, monkeypatch):
+    monkeypatch.setattr(asgi, "_rag_pipeline", pipeline)
+    gateway = gateway_module.LLM_GATEWAY
+    rejected = gateway.get_metrics()["rejected_queue_full"]
+    monkeypatch.setattr(gateway, "active", gateway.max_concurrent)
+    monkeypatch.setattr(gateway, "waiting", gateway.max_waiting)
+
+    response = TestClient(asgi.app).post("/api/rag/query", json={"question": "what is utchi varmam"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["reason"] == "queue_full"
+    assert gateway.get_metrics()["rejected_queue_full"] == rejected + 1
+    assert model == []
@@ -0,0 +1,80 @@
+import importlib
+import threading
+import time
+
+import pytest
+
+from src.main.registry import SYMPTOM_DATASET, RetrieverRegistry
+
+
+class CountingFactory:
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.builds = 0
+
+    def __call__(self):
+        self.builds += 1
+        time.sleep(self.delay_s)
+        return object()
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        return importlib.import_module("app")
+
+
+def test_concurrent_first_requests_build_once():
+    registry = RetrieverRegistry()
+    factory = CountingFactory(delay_s=0.05)
+    registry.register("symptoms", factory)
+    got = []
+
+    threads = [threading.Thread(target=lambda: got.append(registry.get("symptoms"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert factory.builds == 1
+    assert len(got) == 8 and all(instance is got[0] for instance in got)
+    assert registry.peek("symptoms") is got[0]
+
+
+def test_register_keeps_the_first_factory_unless_replaced():
+    registry = RetrieverRegistry()
+    first, second = CountingFactory(), CountingFactory()
+    registry.register("symptoms", first)
+    registry.register("symptoms", second)
+    instance = registry.get("symptoms")
+
+    registry.register("symptoms", second, replace=True)
+
+    assert (first.builds, second.builds) == (1, 0)
+    # A built instance survives a replaced factory
+    assert registry.get("symptoms") is instance
+    with pytest.raises(KeyError):
+        registry.get("unknown")
+
+
+def test_blueprints_and_apps_share_the_registry_instance(app_module):
+    from src.rag import api_routes
+
+    registry = RetrieverRegistry()
+    first_app = app_module.create_app(registry, eager=False)
+    factory = CountingFactory()
+    registry.register(SYMPTOM_DATASET, factory, replace=True)
+
+    with first_app.app_context():
+        search_retriever = app_module.get_retriever()
+        rag_retriever = api_routes.get_retriever()
+    # A second app on the same registry re-registers the dataset but reuses the built instance
+    second_app = app_module.create_app(registry, eager=False)
+    with second_app.app_context():
+        other_app_retriever = app_module.get_retriever()
+
+    assert search_retriever is rag_retriever is other_app_retriever
+    assert factory.builds == 1
@@ -0,0 +1,174 @@
+import importlib
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from src.main.registry import RetrieverRegistry
+from src.main.scoring_and_retrieval import VarmaRetriever
+from src.main.semantic_matching import SemanticMatcher
+
+VARMA_TO_SYMPTOM = {
+    "Utchi_Varmam": ["headache", "tinnitus", "loss of head control"],
+    "Pidari_Varmam": ["neck pain", "fever"],
+    "Thilartha_Varmam": ["giddiness", "headache"],
+}
+UPDATED = dict(VARMA_TO_SYMPTOM, Kondai_Kolli=["headache", "dizziness"])
+
+
+def write_sources(tmp_path, varma_to_symptom):
+    symptom_to_varma = {}
+    for varma, symptoms in varma_to_symptom.items():
+        for symptom in symptoms:
+            symptom_to_varma.setdefault(symptom, []).append(varma)
+    varma_path = tmp_path / "02_varma_to_symptom.json"
+    symptom_path = tmp_path / "02_symptom_to_varma.json"
+    varma_path.write_text(json.dumps(varma_to_symptom), encoding="utf-8")
+    symptom_path.write_text(json.dumps(symptom_to_varma), encoding="utf-8")
+    return varma_path, symptom_path
+
+
+def varma_names(result):
+    return {point["varma_name"] for point in result["varma_points"]}
+
+
+@pytest.fixture
+def registry(tmp_path):
+    varma_path, symptom_path = write_sources(tmp_path, VARMA_TO_SYMPTOM)
+    registry = RetrieverRegistry()
+    registry.register_dataset("symptoms", varma_symptoms_path=varma_path, symptom_to_varma_path=symptom_path,
+                              snapshot_path=tmp_path / "varma_retriever.snapshot")
+    return registry
+
+
+def test_derive_reuses_the_model_and_known_embeddings(monkeypatch):
+    previous = SemanticMatcher.__new__(SemanticMatcher)
+    previous.all_symptoms = ["headache", "fever"]
+    previous.semantic_available = True
+    previous.tokenizer, previous.model = object(), object()
+    previous.symptom_embeddings = np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    encoded = []
+
+    def compute_embeddings(self, symptoms):
+        encoded.extend(symptoms)
+        return np.full((len(symptoms), 2), 0.5, dtype=np.float32)
+
+    monkeypatch.setattr(SemanticMatcher, "_compute_embeddings", compute_embeddings)
+    matcher = SemanticMatcher.derive(previous, ["fever", "dizziness", "headache"])
+
+    assert encoded == ["dizziness"]
+    assert matcher.model is previous.model and matcher.tokenizer is previous.tokenizer
+    np.testing.assert_array_equal(matcher.symptom_embeddings,
+                                  [[0.0, 1.0], [0.5, 0.5], [1.0, 0.0]])
+
+
+def test_reload_from_keeps_unchanged_data_and_shares_the_runtime(tmp_path):
+    varma_path, symptom_path = write_sources(tmp_path, VARMA_TO_SYMPTOM)
+    current = VarmaRetriever(varma_path, symptom_path, parallel_stages=True, semantic_workers=1)
+
+    assert VarmaRetriever.reload_from(current) is current
+
+    write_sources(tmp_path, UPDATED)
+    reloaded = VarmaRetriever.reload_from(current)
+
+    assert reloaded.dataset_version != current.dataset_version
+    assert "dizziness" in reloaded.all_symptoms and "dizziness" not in current.all_symptoms
+    assert reloaded._executor is current._executor and reloaded.cascade is current.cascade
+    assert "Kondai_Kolli" in varma_names(reloaded.retrieve("headache and dizziness"))
+    assert "Kondai_Kolli" not in varma_names(current.retrieve("headache and dizziness"))
+    current._executor.shutdown(wait=True)
+
+
+def test_registry_reload_swaps_in_new_data_and_keeps_it_on_failure(registry, tmp_path):
+    swaps = []
+    registry.add_swap_listener(lambda name, old, new: swaps.append((name, old, new)))
+    old = registry.get("symptoms")
+
+    unchanged = registry.reload("symptoms", background=False)
+    assert (unchanged["state"], unchanged["swapped"]) == ("completed", False)
+
+    write_sources(tmp_path, UPDATED)
+    status = registry.reload("symptoms", background=False)
+    new = registry.get("symptoms")
+
+    assert (status["state"], status["swapped"]) == ("completed", True)
+    assert status["previous_version"] == old.dataset_version
+    assert status["dataset_version"] == new.dataset_version != old.dataset_version
+    assert swaps == [("symptoms", old, new)]
+
+    (tmp_path / "02_varma_to_symptom.json").write_text("{not json", encoding="utf-8")
+    failed = registry.reload("symptoms", background=False)
+
+    assert failed["state"] == "failed"
+    assert registry.get("symptoms") is new
+
+
+def test_reload_is_atomic_for_requests_in_flight(registry, tmp_path):
+    old = registry.get("symptoms")
+    before = varma_names(old.retrieve("headache"))
+    write_sources(tmp_path, UPDATED)
+    expected_after = before | {"Kondai_Kolli"}
+
+    seen = []
+    errors = []
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                seen.append(varma_names(registry.get("symptoms").retrieve("headache")))
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=serve) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        status = registry.reload("symptoms", background=False)
+        # A request still holding the old instance finishes on the old data
+        assert varma_names(old.retrieve("headache")) == before
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+    assert status["swapped"] and not errors
+    assert seen and all(names in (before, expected_after) for names in seen)
+    assert varma_names(registry.get("symptoms").retrieve("headache")) == expected_after
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        return importlib.import_module("app")
+
+
+@pytest.fixture
+def admin_client(app_module):
+    return app_module.create_app(RetrieverRegistry(), eager=False).test_client()
+
+
+def test_admin_routes_need_the_token(admin_client, monkeypatch):
+    monkeypatch.delenv("VARMA_ADMIN_TOKEN", raising=False)
+    monkeypatch.delenv("VARMA_ADMIN_ALLOW_LOCAL", raising=False)
+
+    # Local clients are not trusted by default
+    assert admin_client.post("/api/admin/reload").status_code == 403
+    assert admin_client.get("/api/admin/reload/status").status_code == 403
+
+    monkeypatch.setenv("VARMA_ADMIN_TOKEN", "s3cret")
+    assert admin_client.get("/api/admin/reload/status", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    status = admin_client.get("/api/admin/reload/status", headers={"X-Admin-Token": "s3cret"})
+    assert status.status_code == 200 and status.get_json()["state"] == "idle"
+
+
+def test_local_admin_access_is_opt_in_and_reload_is_post_only(admin_client, monkeypatch):
+    monkeypatch.delenv("VARMA_ADMIN_TOKEN", raising=False)
+    monkeypatch.setenv("VARMA_ADMIN_ALLOW_LOCAL", "1")
+
+    assert admin_client.get("/api/admin/reload/status").status_code == 200
+    assert admin_client.get("/api/admin/reload").status_code == 405
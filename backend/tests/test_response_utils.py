@@ -0,0 +1,98 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from response_utils import (
+    MIN_COMPRESS_BYTES, dumps, etag_matches, install_compression, json_response, matched_etag, negotiate_encoding,
+    parse_fields, shape_symptom_search_response
+)
+
+RESPONSE = {
+    "query": "headache and neck pain",
+    "varma_points": [
+        {"varma_name": "Utchi_Varmam", "score": 0.9, "matched_symptoms": ["headache"],
+         "all_symptoms": ["headache", "tinnitus"], "description": "Treats headache, tinnitus",
+         "treatment_methods": ["massage"], "contraindications": ["pregnancy"]},
+        {"varma_name": "Pidari_Varmam", "score": 0.7, "matched_symptoms": ["neck pain", "headache"],
+         "all_symptoms": ["neck pain", "headache"], "description": "Treats neck pain, headache",
+         "treatment_methods": ["massage"], "contraindications": ["pregnancy"]},
+    ],
+    "matched_symptoms_details": [{"symptom": "headache", "score": 1.0}, {"symptom": "neck pain", "score": 1.0}],
+}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    install_compression(app)
+
+    @app.route('/big')
+    def big():
+        response = json_response({"symptoms": ["headache"] * MIN_COMPRESS_BYTES})
+        response.set_etag("v1")
+        return response
+
+    @app.route('/small')
+    def small():
+        return json_response({"ok": True})
+
+    return app.test_client()
+
+
+def test_fields_projection_keeps_only_the_requested_fields():
+    shaped = shape_symptom_search_response(RESPONSE, fields=parse_fields("varma_name, score,unknown"))
+
+    assert shaped["varma_points"] == [{"varma_name": "Utchi_Varmam", "score": 0.9},
+                                      {"varma_name": "Pidari_Varmam", "score": 0.7}]
+    assert shaped["query"] == RESPONSE["query"]
+    assert "description" in RESPONSE["varma_points"][0]
+
+
+def test_compact_mode_drops_repeated_fields_and_indexes_symptoms():
+    shaped = shape_symptom_search_response(RESPONSE, compact=True)
+    table = shaped["symptoms"]
+
+    first, second = shaped["varma_points"]
+    assert shaped["compact"] is True
+    assert not {"description", "treatment_methods", "contraindications"} & set(first)
+    assert [table[i] for i in second["matched_symptoms"]] == ["neck pain", "headache"]
+    assert [table[i] for i in first["all_symptoms"]] == ["headache", "tinnitus"]
+    assert len(table) == len(set(table)) == 3
+    assert [table[d["symptom"]] for d in shaped["matched_symptoms_details"]] == ["headache", "neck pain"]
+    # Compact output is smaller than the full one
+    assert len(dumps(shaped)) < len(dumps(RESPONSE))
+
+
+def test_encoding_negotiation_honours_q_values():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity") is None
+    assert negotiate_encoding("*") in ("br", "gzip")
+    assert negotiate_encoding("") is None
+
+
+def test_large_json_is_gzipped_with_a_suffixed_etag(client):
+    response = client.get('/big', headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["ETag"] == '"v1-gzip"'
+    assert json.loads(gzip.decompress(response.get_data()))["symptoms"][0] == "headache"
+
+
+def test_small_or_unaccepted_bodies_are_sent_as_is(client):
+    small = client.get('/small', headers={"Accept-Encoding": "gzip"})
+    identity = client.get('/big', headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in small.headers
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["ETag"] == '"v1"'
+    assert json.loads(identity.get_data())["symptoms"][0] == "headache"
+
+
+def test_etags_match_across_encodings_and_weak_prefixes():
+    assert matched_etag('W/"v1-gzip", "v0"', '"v1"') == "v1-gzip"
+    assert matched_etag('"v1-br"', "v1") == "v1-br"
+    assert matched_etag("*", '"v1"') == "v1"
+    assert not etag_matches('"v1-deflate", "v2"', '"v1"')
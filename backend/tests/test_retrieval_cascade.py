@@ -0,0 +1,122 @@
+import faiss
+import numpy as np
+import pytest
+
+from src.rag.src.bm25 import BM25Index
+from src.rag.src.doc_store import write_doc_store
+from src.rag.src.name_matcher import write_name_table
+from src.rag.src.retriever import VarmaRetriever
+
+RECORDS = [
+    {"varmaName": "Utchi_Varmam", "signs": "Loss of head control, headache, tinnitus"},
+    {"varmaName": "Thilartha_Varmam", "signs": "Giddiness, fainting, vomiting"},
+    {"varmaName": "Pidari_Varmam", "signs": "Neck stiffness, shoulder pain"},
+]
+
+
+class FakeEmbedder:
+    """Row i's vector is the i-th unit vector; questions land on the last record"""
+
+    def __init__(self, unavailable=False):
+        self.unavailable = unavailable
+        self.calls = 0
+        self.loaded = False
+        self.load_ms = None
+
+    def encode(self, texts):
+        self.calls += 1
+        if self.unavailable:
+            raise ImportError("sentence_transformers is not installed")
+        return np.tile(np.eye(len(RECORDS), dtype="float32")[-1], (len(texts), 1))
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    docs = [
+        {"id": r["varmaName"], "text": f"Varma Name: {r['varmaName']}\n\nSigns:\n{r['signs']}"}
+        for r in RECORDS
+    ]
+    index = faiss.IndexFlatL2(len(RECORDS))
+    index.add(np.eye(len(RECORDS), dtype="float32"))
+    path = tmp_path / "varma_index.faiss"
+    faiss.write_index(index, str(path))
+    write_doc_store(docs, tmp_path / "varma_docs.jsonl")
+    write_name_table(RECORDS, tmp_path / "varma_names.json")
+    return path
+
+
+def test_bm25_ranks_by_term_weight_and_reports_confidence():
+    bm25 = BM25Index(["headache and tinnitus", "neck stiffness", "headache after a fall"])
+
+    ranked, confidence = bm25.search("tinnitus headache")
+    _, weaker = bm25.search("headache with fever")
+
+    assert [row for row, _ in ranked] == [0, 2]
+    assert 0.0 < weaker < confidence <= 1.0
+    assert bm25.search("what is it") == ([], 0.0)
+
+
+def test_named_varma_is_answered_by_the_name_tier(index_path):
+    embedder = FakeEmbedder()
+    retriever = VarmaRetriever(index_path)
+    retriever.embedder = embedder
+
+    assert retriever.cascade("What are the signs of thilartha varmam?") == ("name", [1])
+    assert embedder.calls == 0
+
+
+def test_confident_keywords_are_answered_by_bm25(index_path):
+    embedder = FakeEmbedder()
+    retriever = VarmaRetriever(index_path)
+    retriever.embedder = embedder
+
+    assert retriever.cascade("giddiness and fainting", top_k=1) == ("bm25", [1])
+    assert embedder.calls == 0
+
+
+def test_unconfident_keywords_fall_through_to_the_encoder(index_path):
+    embedder = FakeEmbedder()
+    retriever = VarmaRetriever(index_path)
+    retriever.embedder = embedder
+    retriever.bm25_confidence = 1.1
+
+    assert retriever.cascade("headache remedy", top_k=1) == ("dense", [2])
+    assert retriever.get_metrics()["tiers"]["dense"]["hits"] == 1
+
+
+def test_missing_encoder_keeps_the_bm25_ranking(index_path):
+    retriever = VarmaRetriever(index_path)
+    retriever.embedder = FakeEmbedder(unavailable=True)
+    retriever.bm25_confidence = 1.1
+
+    assert retriever.cascade("headache remedy", top_k=1) == ("bm25", [0])
+    assert retriever.get_metrics()["dense_unavailable"] == 1
+
+
+def test_missing_encoder_without_bm25_hits_is_a_miss(index_path):
+    retriever = VarmaRetriever(index_path)
+    retriever.embedder = FakeEmbedder(unavailable=True)
+
+    assert retriever.cascade("xyzzy") == ("miss", [])
+    tiers = retriever.get_metrics()["tiers"]
+    assert tiers["miss"]["hits"] == 1 and tiers["bm25"]["hits"] == 0
+
+
+def test_nothing_retrieved_is_answered_without_the_llm(index_path, monkeypatch):
+    from src.rag.src.llm import gateway as gateway_module
+    from src.rag.src.pipeline import RagPipeline
+
+    calls = []
+    monkeypatch.setattr(gateway_module, "generate", lambda prompt, model, timeout: calls.append(prompt) or "answer")
+    monkeypatch.setattr(gateway_module, "generate_stream", lambda prompt, model, timeout: calls.append(prompt) or iter(()))
+    pipeline = RagPipeline(index_path)
+    pipeline.retriever.embedder = FakeEmbedder(unavailable=True)
+
+    response = pipeline.answer("xyzzy")
+    events = list(pipeline.stream("xyzzy"))
+
+    assert response["fallback"] == "no_match" and response["sources"] == []
+    assert response["answer"].startswith("I couldn't find specific Varma points")
+    assert [event for event, _ in events] == ["sources", "token", "done"]
+    assert events[-1][1]["fallback"] == "no_match"
+    assert calls == []
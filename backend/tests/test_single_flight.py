@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from src.main.single_flight import SingleFlight
+
+
+def run_concurrently(flight, key, fn, callers):
+    """Start `callers` threads on flight.do(key, fn); returns their results or errors"""
+    outcomes = [None] * callers
+
+    def call(i):
+        try:
+            outcomes[i] = flight.do(key, fn)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_waiters(flight, count):
+    while flight.get_stats()['coalesced_waiters'] < count:
+        time.sleep(0.001)
+
+
+def test_concurrent_identical_calls_run_once_and_share_the_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def slow():
+        executions.append(1)
+        release.wait(5)
+        return {"results": [1, 2]}
+
+    threads, outcomes = run_concurrently(flight, "headache", slow, 4)
+    wait_for_waiters(flight, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+    stats = flight.get_stats()
+    assert (stats['executions'], stats['coalesced_waiters'], stats['in_flight']) == (1, 3, 0)
+
+
+def test_waiters_receive_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("index not ready")
+
+    threads, outcomes = run_concurrently(flight, "fever", failing, 3)
+    wait_for_waiters(flight, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+
+def test_sequential_calls_and_other_keys_run_again():
+    flight = SingleFlight()
+    calls = []
+
+    assert flight.do("a", lambda: calls.append("a") or 1) == 1
+    assert flight.do("a", lambda: calls.append("a") or 2) == 2
+    assert flight.do("b", lambda: calls.append("b") or 3) == 3
+
+    assert calls == ["a", "a", "b"]
+    with pytest.raises(KeyError):
+        flight.do("c", lambda: {}["missing"])
+    assert flight.get_stats()['in_flight'] == 0
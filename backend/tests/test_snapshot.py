@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.main.scoring_and_retrieval import VarmaRetriever
+from src.main.snapshot import SnapshotError, load_snapshot, save_snapshot
+
+VARMA_TO_SYMPTOM = {
+    "Utchi_Varmam": ["headache", "tinnitus", "loss of head control"],
+    "Pidari_Varmam": ["neck pain", "fever"],
+    "Thilartha_Varmam": ["giddiness", "headache"],
+}
+
+
+def symptom_to_varma(varma_to_symptom):
+    index = {}
+    for varma, symptoms in varma_to_symptom.items():
+        for symptom in symptoms:
+            index.setdefault(symptom, []).append(varma)
+    return index
+
+
+@pytest.fixture
+def sources(tmp_path):
+    varma_path = tmp_path / "02_varma_to_symptom.json"
+    symptom_path = tmp_path / "02_symptom_to_varma.json"
+    varma_path.write_text(json.dumps(VARMA_TO_SYMPTOM), encoding="utf-8")
+    symptom_path.write_text(json.dumps(symptom_to_varma(VARMA_TO_SYMPTOM)), encoding="utf-8")
+    return tmp_path / "varma_retriever.snapshot", varma_path, symptom_path
+
+
+def test_snapshot_round_trip_gives_the_same_results(sources, monkeypatch):
+    built = VarmaRetriever.from_snapshot(*sources)
+    expected = built.retrieve("headache and neck pain")
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("retriever rebuilt instead of loaded from the snapshot")
+
+    monkeypatch.setattr(VarmaRetriever, "__init__", no_rebuild)
+    loaded = VarmaRetriever.from_snapshot(*sources)
+
+    assert loaded.dataset_version == built.dataset_version
+    assert loaded.all_symptoms == built.all_symptoms
+    assert loaded.symptom_to_varma_norm == built.symptom_to_varma_norm
+    assert loaded.retrieve("headache and neck pain") == expected
+
+
+def test_changed_source_data_rebuilds_and_refreshes_the_snapshot(sources):
+    _, varma_path, symptom_path = sources
+    first = VarmaRetriever.from_snapshot(*sources)
+    updated = dict(VARMA_TO_SYMPTOM, Kondai_Kolli=["dizziness"])
+    varma_path.write_text(json.dumps(updated), encoding="utf-8")
+    symptom_path.write_text(json.dumps(symptom_to_varma(updated)), encoding="utf-8")
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(*sources)
+    rebuilt = VarmaRetriever.from_snapshot(*sources)
+
+    assert rebuilt.dataset_version != first.dataset_version
+    assert "dizziness" in rebuilt.all_symptoms
+    assert load_snapshot(*sources)['source_hashes'] == rebuilt.source_hashes
+
+
+def test_corrupt_snapshot_is_rejected(sources):
+    snapshot_path = sources[0]
+    snapshot_path.write_bytes(b"not a snapshot at all")
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(*sources)
+    assert VarmaRetriever.from_snapshot(*sources).retrieve("fever")["varma_points"]
+
+
+def test_embeddings_are_memory_mapped_back(sources):
+    snapshot_path = sources[0]
+    retriever = VarmaRetriever.from_snapshot(*sources, save_on_rebuild=False)
+    embeddings = np.arange(len(retriever.all_symptoms) * 4, dtype=np.float32).reshape(-1, 4)
+    retriever.semantic_matcher.symptom_embeddings = embeddings
+
+    save_snapshot(retriever, snapshot_path)
+    state = load_snapshot(*sources)
+
+    assert isinstance(state['embeddings'], np.memmap)
+    np.testing.assert_array_equal(state['embeddings'], embeddings)
+    np.testing.assert_array_equal(load_snapshot(*sources, mmap=False)['embeddings'], embeddings)
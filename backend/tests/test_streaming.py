@@ -0,0 +1,133 @@
+import importlib
+import json
+from pathlib import Path
+
+import pytest
+
+from src.rag.src.llm import generator
+from src.rag.src.llm import ollama_client as client_module
+from src.rag.src.llm.gateway import LLM_GATEWAY, CircuitBreaker
+from src.rag.src.llm.ollama_client import OllamaClient, OllamaConfig
+from src.rag.src.llm.streaming import stream_answer
+from src.rag.src.llm.stub_server import start_stub_server, stub_answer
+from src.rag.src.pipeline import RagPipeline
+
+RAG_INDEX = Path(__file__).resolve().parent.parent / "src" / "rag" / "varma_index.faiss"
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """start(**settings) -> StubSettings of a stub Ollama that generate_stream() talks to"""
+    servers = []
+    monkeypatch.setattr(generator, "LLM_BACKEND", "http")
+    monkeypatch.setattr(LLM_GATEWAY, "breaker", CircuitBreaker())
+
+    def start(**settings):
+        server, url = start_stub_server(port=0, **settings)
+        servers.append(server)
+        monkeypatch.setattr(client_module, "_client",
+                            OllamaClient(OllamaConfig(host=url, retries=0, read_timeout=5.0)))
+        return server.RequestHandlerClass.settings
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        app = importlib.import_module("app")
+    with app.app.app_context():
+        if app.get_retriever() is None:
+            pytest.skip("the symptom retriever could not be built here")
+    return app.app.test_client()
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = RagPipeline(RAG_INDEX)
+    if pipeline.retriever is None:
+        pytest.skip("the RAG index could not be loaded here")
+    return pipeline
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_sources_come_first_then_the_tokens_then_done(client, ollama):
+    settings = ollama()
+
+    events = ndjson(client.post("/api/rag/query/stream", json={"question": "headache and neck pain"}))
+
+    assert events[0]["event"] == "sources" and events[0]["sources"]
+    tokens = events[1:-1]
+    assert tokens and all(e["event"] == "token" for e in tokens)
+    assert "".join(e["text"] for e in tokens) == stub_answer(settings.bodies[-1]["prompt"])
+
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["confidence"] > 0
+    assert isinstance(done["grounded"], bool)
+    assert done["tokens"] == len(tokens)
+    assert "error" not in done and "fallback" not in done
+
+
+def test_sse_framing_names_each_event(client, ollama):
+    ollama()
+
+    body = client.post("/api/rag/query/stream?format=sse",
+                       json={"question": "headache and neck pain"}).get_data(as_text=True)
+
+    frames = [frame for frame in body.split("\n\n") if frame]
+    assert frames[0].startswith("event: sources\ndata: ")
+    assert frames[1].startswith("event: token\ndata: ")
+    assert frames[-1].startswith("event: done\ndata: ")
+
+
+def test_ttft_and_tokens_per_second_reach_the_metrics(client, ollama):
+    ollama(delay_ms=20, tokens_per_s=200)
+    before = client.get("/api/rag/metrics").get_json()["streaming"]
+
+    client.post("/api/rag/query/stream", json={"question": "giddiness"}).get_data()
+
+    streaming = client.get("/api/rag/metrics").get_json()["streaming"]
+    assert streaming["streams"] == before["streams"] + 1
+    assert streaming["completed"] == before["completed"] + 1
+    assert streaming["ttft_ms"]["p50"] is not None
+    assert streaming["tokens_per_s"]["mean"] > 0
+
+
+def test_a_streamed_answer_is_cached_but_not_a_fallback(pipeline, ollama):
+    ollama()
+    events = list(pipeline.stream("what is utchi varmam"))
+    assert events[-1][1]["cached"] is False
+    assert list(pipeline.stream("what is utchi varmam"))[-1][1]["cached"] is True
+
+    ollama(fail_rate=1.0)
+    events = list(pipeline.stream("where is kondai kolli"))
+    assert events[-1][1]["fallback"] == "llm_error"
+    assert "Kondai Kolli" in events[1][1]["text"]
+    assert list(pipeline.stream("where is kondai kolli"))[-1][1]["cached"] is False
+
+
+def test_on_answer_is_skipped_on_errors_and_fallbacks():
+    answers = []
+
+    def run(chunks):
+        return list(stream_answer("prompt", ["Utchi_Varmam"], "context", 0.9,
+                                  on_answer=answers.append, chunks=iter(chunks)))
+
+    failed = run([{"response": "partial ", "done": False}, {"done": True, "error": "stream interrupted"}])
+    fallback = run([{"response": "from retrieval", "done": False}, {"done": True, "fallback": "circuit_open"}])
+    run([{"response": "Utchi Varmam ", "done": False}, {"response": "is on the head", "done": False},
+         {"done": True}])
+
+    assert failed[-1][1]["error"] == "stream interrupted" and failed[-1][1]["grounded"] is False
+    assert fallback[-1][1]["fallback"] == "circuit_open"
+    assert answers == ["Utchi Varmam is on the head"]
@@ -0,0 +1,103 @@
+import importlib
+import json
+
+import pytest
+
+from src.main.cascade import CascadePolicy
+from src.main.registry import SYMPTOM_DATASET, RetrieverRegistry
+from src.main.scoring_and_retrieval import VarmaRetriever
+
+VARMA_TO_SYMPTOM = {
+    "Utchi_Varmam": ["headache", "tinnitus", "loss of head control"],
+    "Pidari_Varmam": ["neck pain", "fever"],
+    "Thilartha_Varmam": ["giddiness", "headache", "vomiting"],
+}
+QUERY = "headache with ringing in ears"
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    symptom_to_varma = {}
+    for varma, symptoms in VARMA_TO_SYMPTOM.items():
+        for symptom in symptoms:
+            symptom_to_varma.setdefault(symptom, []).append(varma)
+    varma_path = tmp_path / "02_varma_to_symptom.json"
+    symptom_path = tmp_path / "02_symptom_to_varma.json"
+    varma_path.write_text(json.dumps(VARMA_TO_SYMPTOM), encoding="utf-8")
+    symptom_path.write_text(json.dumps(symptom_to_varma), encoding="utf-8")
+
+    retriever = VarmaRetriever(varma_path, symptom_path, parallel_stages=True, semantic_workers=1,
+                               cascade=CascadePolicy())
+    # Stand-in for PubMedBERT, so the semantic stage runs
+    retriever.semantic_matcher.semantic_available = True
+    retriever.semantic_matcher.find_matches = lambda query, top_k, threshold: [("tinnitus", 0.9)]
+    yield retriever
+    retriever._executor.shutdown(wait=True)
+
+
+@pytest.fixture(scope="module")
+def app_module(tmp_path_factory):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(app_module, retriever):
+    registry = RetrieverRegistry()
+    app = app_module.create_app(registry, eager=False)
+    registry.register(SYMPTOM_DATASET, lambda: retriever, replace=True)
+    return app.test_client()
+
+
+def symptoms(result):
+    return [m["symptom"] for m in result["matched_symptoms"]]
+
+
+def test_retrieve_stream_refines_the_lexical_ranking_and_ends_with_retrieve(retriever):
+    events = list(retriever.retrieve_stream(QUERY))
+    stages = [stage for stage, _ in events]
+    lexical, semantic, final = (result for _, result in events)
+
+    assert stages == ["lexical", "semantic", "final"]
+    assert (lexical["partial"], lexical["semantic_stage"]) == (True, "pending")
+    assert lexical["varma_points"][0]["varma_name"] == "Utchi_Varmam"
+    assert semantic["semantic_stage"] == "completed" and "varma_points" not in semantic
+    assert symptoms(final) == symptoms(semantic)
+    assert final["varma_points"] == retriever.retrieve(QUERY)["varma_points"]
+    assert final["varma_points"][0]["varma_name"] == "Utchi_Varmam"
+
+
+def test_stream_route_sends_one_ndjson_line_per_stage(client):
+    response = client.post("/api/symptom-search/stream", json={"query": QUERY})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    plain = client.post("/api/symptom-search", json={"query": QUERY}).get_json()
+
+    assert response.mimetype == "application/x-ndjson"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert [event["stage"] for event in events] == ["lexical", "semantic", "final"]
+    # Symptom-only refinements carry no points; 'final' is the /api/symptom-search body
+    assert "varma_points" not in events[1]
+    assert events[-1]["varma_points"] == plain["varma_points"]
+
+
+def test_stream_route_speaks_sse_when_asked(client):
+    by_query = client.post("/api/symptom-search/stream?format=sse", json={"query": QUERY, "compact": True})
+    blocks = by_query.get_data(as_text=True).strip().split("\n\n")
+    by_accept = client.post("/api/symptom-search/stream", json={"query": QUERY},
+                            headers={"Accept": "text/event-stream"})
+    by_accept.get_data()
+
+    names = [block.split("\n")[0] for block in blocks]
+    final = json.loads(blocks[-1].split("\n", 1)[1][len("data: "):])
+
+    assert by_query.mimetype == by_accept.mimetype == "text/event-stream"
+    assert names == ["event: lexical", "event: semantic", "event: final"]
+    assert final["compact"] is True and final["stage"] == "final"
+
+
+def test_stream_route_rejects_empty_queries(client):
+    assert client.post("/api/symptom-search/stream", json={"query": "  "}).status_code == 400
+    assert client.post("/api/symptom-search/stream", json={}).status_code == 400
@@ -0,0 +1,58 @@
+from response_utils import etag_matches
+from src.main.medical_synonyms import MedicalSynonymDict
+from src.main.symptom_suggest import SymptomSuggester
+
+SYMPTOM_TO_VARMA = {
+    "headache": ["Utchi_Varmam", "Thilartha_Varmam", "Pidari_Varmam"],
+    "head injury": ["Utchi_Varmam"],
+    "neck pain": ["Pidari_Varmam", "Kondai_Kolli"],
+    "pain in the chest": ["Adhipathi_Varmam"],
+    "giddiness": ["Thilartha_Varmam"],
+}
+
+
+def texts(suggestions):
+    return [s['text'] for s in suggestions]
+
+
+def test_prefix_results_rank_by_varma_count():
+    suggester = SymptomSuggester(SYMPTOM_TO_VARMA)
+
+    suggestions = suggester.suggest("Hea")
+
+    assert texts(suggestions) == ["headache", "head injury"]
+    assert suggestions[0]['varma_count'] == 3
+    assert suggestions[0]['match'] == 'prefix'
+
+
+def test_first_word_prefixes_rank_above_later_words():
+    suggester = SymptomSuggester(SYMPTOM_TO_VARMA)
+
+    assert texts(suggester.suggest("pain")) == ["pain in the chest", "neck pain"]
+
+
+def test_typos_fall_back_to_fuzzy_matches():
+    suggester = SymptomSuggester(SYMPTOM_TO_VARMA)
+
+    suggestions = suggester.suggest("hedach")
+
+    assert texts(suggestions)[0] == "headache"
+    assert suggestions[0]['match'] == 'fuzzy'
+    assert suggester.suggest("hx") == []
+
+
+def test_synonyms_suggest_the_symptom_they_stand_for():
+    suggester = SymptomSuggester(SYMPTOM_TO_VARMA, MedicalSynonymDict())
+
+    suggestion = suggester.suggest("vertig")[0]
+
+    assert (suggestion['text'], suggestion['symptom']) == ("vertigo", "giddiness")
+
+
+def test_etag_matches_compressed_and_weak_variants():
+    assert etag_matches('"abc123"', "abc123")
+    assert etag_matches('"abc123-gzip"', "abc123")
+    assert etag_matches('W/"abc123-br", "other"', "abc123")
+    assert etag_matches('*', "abc123")
+    assert not etag_matches('"abc124-gzip"', "abc123")
+    assert not etag_matches(None, "abc123")
@@ -0,0 +1,107 @@
+import importlib
+
+import pytest
+
+from src.main.varma_catalog import VarmaCatalog
+from src.main.varma_metadata import VarmaMetadataTable
+
+VARMA_DATA = {
+    "Utchi_Varmam": ["headache", "loss of head control"],
+    "Thilartha_Varmam": ["giddiness"],
+    "Pidari_Varmam": ["neck pain", "stiffness", "fever"],
+    "Pidari_Kalam": ["neck pain"],
+}
+
+
+@pytest.fixture
+def catalog():
+    return VarmaCatalog(VarmaMetadataTable(VARMA_DATA, "v1"), last_modified=1700000000.5)
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # The app builds its retriever at import; keep its snapshot out of data/
+    snapshot = tmp_path_factory.mktemp("snapshot") / "varma_retriever.snapshot"
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("VARMA_SNAPSHOT", str(snapshot))
+        app = importlib.import_module("app")
+    with app.app.app_context():
+        if app.get_retriever() is None:
+            pytest.skip("the symptom retriever could not be built here")
+    return app.app.test_client()
+
+
+def test_prefix_filter_and_pagination(catalog):
+    page = catalog.query(prefix="pidari", limit=1, fields=["name", "symptom_count", "unknown"])
+
+    assert page['total'] == 2
+    assert page['next_offset'] == 1
+    assert page['varma_points'] == [{"name": "Pidari_Varmam", "symptom_count": 3}]
+    assert catalog.query(prefix="pidari", offset=1)['next_offset'] is None
+
+
+def test_filters_intersect(catalog):
+    category = catalog.points[0]['category']
+
+    page = catalog.query(category=category.upper(), prefix=catalog.points[0]['name'][:4])
+
+    assert page['total'] >= 1
+    assert all(point['category'] == category for point in page['varma_points'])
+    assert catalog.query(category="no such category")['total'] == 0
+
+
+def test_region_filter_matches_whole_words_as_a_phrase():
+    catalog = VarmaCatalog(VarmaMetadataTable({
+        "Krikatika_Varmam": ["neck pain"],
+        "Janu_Varmam": ["knee pain"],
+        "Kurpara_Varmam": ["elbow pain"],
+        "Gulpha_Varmam": ["ankle sprain"],
+    }, "v1"))
+
+    def names(region):
+        return sorted(point["name"] for point in catalog.query(region=region)["varma_points"])
+
+    assert names("JOINT") == ["Gulpha_Varmam", "Janu_Varmam", "Kurpara_Varmam"]
+    assert names("knee joint") == ["Janu_Varmam"]
+    assert names("back of the neck") == ["Krikatika_Varmam"]
+    # Every word present, but not as one phrase; or only part of a word
+    assert names("joint knee") == [] and names("nec") == []
+
+
+def test_validators_follow_the_dataset_version(catalog):
+    assert catalog.etag == '"v1"'
+    assert catalog.last_modified == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+
+def test_encoded_pages_are_cached_per_query(catalog):
+    builds = []
+
+    first = catalog.cached(("a",), lambda: builds.append(1) or b"page")
+    second = catalog.cached(("a",), lambda: builds.append(1) or b"other")
+
+    assert first == second == b"page"
+    assert len(builds) == 1
+
+
+def test_conditional_get_answers_304(client):
+    response = client.get("/api/varma-points?limit=2")
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert client.get("/api/varma-points?limit=2", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/varma-points", headers={"If-None-Match": '"stale"'}).status_code == 200
+    since = client.get("/api/varma-points", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert since.status_code == 304
+
+
+def test_conditional_get_matches_the_compressed_etag(client):
+    headers = {"Accept-Encoding": "gzip"}
+    response = client.get("/api/varma-points", headers=headers)
+    assert response.headers.get("Content-Encoding") == "gzip"
+
+    revalidated = client.get("/api/varma-points", headers=dict(headers, **{"If-None-Match": response.headers["ETag"]}))
+
+    assert revalidated.status_code == 304
+    # The 304 names the gzip representation the client holds
+    assert revalidated.headers["ETag"] == response.headers["ETag"]
+    assert "Accept-Encoding" in revalidated.headers["Vary"]
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from src.main.registry import RetrieverRegistry
+from src.main.scoring_and_retrieval import VarmaRetriever
+from src.main.varma_metadata import metadata_table
+from varma_knowledge import VarmaKnowledgeStore
+
+VARMA_TO_SYMPTOM = {
+    "Utchi_Varmam": ["headache", "tinnitus"],
+    "Pidari_Varmam": ["neck pain", "headache"],
+}
+SYMPTOM_TO_VARMA = {
+    "headache": ["Utchi_Varmam", "Pidari Varmam"],
+    "tinnitus": "Utchi_Varmam",
+    "neck pain": "Pidari_Varmam",
+}
+RECORDS = {"varmas": [
+    {"varmaName": "Utchi Varmam", "varmamType": "Padu", "surfaceAnatomy": "Vertex of the skull",
+     "indications": "Headache", "signs": "Giddiness", "anatomicalRelations": {"nerves": "Occipital"}},
+    {"varmaName": "UTCHI_VARMAM", "varmamType": "Thodu", "surfaceAnatomy": "", "indications": "Tinnitus"},
+]}
+
+
+def write_sources(tmp_path, varma_to_symptom=VARMA_TO_SYMPTOM, records=RECORDS):
+    paths = (tmp_path / "02_varma_to_symptom.json", tmp_path / "02_symptom_to_varma.json",
+             tmp_path / "varma_data.json")
+    symptom_to_varma = dict(SYMPTOM_TO_VARMA)
+    for varma, symptoms in varma_to_symptom.items():
+        for symptom in symptoms:
+            symptom_to_varma.setdefault(symptom, [varma])
+    for path, content in zip(paths, (varma_to_symptom, symptom_to_varma, records)):
+        path.write_text(json.dumps(content), encoding="utf-8")
+    return paths
+
+
+@pytest.fixture
+def store(tmp_path):
+    return VarmaKnowledgeStore(*write_sources(tmp_path))
+
+
+def test_spelling_variants_share_one_interned_id(store):
+    assert len(store) == 2
+    assert store.varma_id("Utchi_Varmam") == store.varma_id("utchi varmam") == store.varma_id("UTCHI_VARMAM")
+    assert store.symptoms_of("Utchi Varmam") == ["headache", "tinnitus"]
+    assert store.varmas_for_symptom("Headache ") == ["Utchi_Varmam", "Pidari_Varmam"]
+    # Both records spelled differently belong to the same point
+    assert len(store.rows_for("Utchi_Varmam")) == 2
+    assert store.rows_for("Unknown_Varmam") == () and store.symptoms_of("Unknown_Varmam") == []
+
+
+def test_records_are_rebuilt_from_the_columns(store):
+    row = store.rows_for("Utchi_Varmam")[0]
+    record = store.record(row)
+
+    assert record["varmaName"] == "Utchi Varmam"
+    assert (record["varmamType"], record["signs"]) == ("Padu", "Giddiness")
+    assert store.field(row, "surfaceAnatomy") == "Vertex of the skull"
+    assert "Nerves: Occipital" in store.document_text(row)
+    assert store.document(row)["id"] == "Utchi Varmam"
+
+
+def test_retriever_reuses_the_store_mappings_for_the_same_files(tmp_path, store):
+    varma_path, symptom_path, _ = write_sources(tmp_path)
+    retriever = VarmaRetriever(varma_path, symptom_path, store=store)
+
+    assert retriever.store is store
+    assert retriever.varma_data is store.varma_data and retriever.symptom_to_varma is store.symptom_to_varma
+
+    other = tmp_path / "other"
+    other.mkdir()
+    separate = VarmaRetriever(*write_sources(other)[:2], store=store)
+    assert separate.varma_data is not store.varma_data and separate.varma_data == store.varma_data
+
+
+def test_registry_reload_brings_a_refreshed_store(tmp_path):
+    varma_path, symptom_path, records_path = write_sources(tmp_path)
+    stores = []
+
+    def current_store():
+        if not stores or not stores[-1].is_current():
+            stores.append(VarmaKnowledgeStore(varma_path, symptom_path, records_path))
+        return stores[-1]
+
+    registry = RetrieverRegistry()
+    registry.register_dataset("symptoms", varma_symptoms_path=varma_path, symptom_to_varma_path=symptom_path,
+                              store=current_store)
+    old = registry.get("symptoms")
+    assert old.store is stores[0] and stores[0].is_current()
+
+    write_sources(tmp_path, dict(VARMA_TO_SYMPTOM, Kondai_Kolli=["dizziness"]),
+                  {"varmas": RECORDS["varmas"] + [{"varmaName": "Kondai Kolli", "indications": "Dizziness"}]})
+    assert not stores[0].is_current()
+    assert registry.reload("symptoms", background=False)["swapped"]
+    new = registry.get("symptoms")
+
+    assert new.store is stores[1] and old.store is stores[0]
+    assert new.varma_data is stores[1].varma_data and "Kondai_Kolli" in new.varma_data
+    # Formatters read descriptions from the store that came with the data
+    assert metadata_table(new).get("kondai_kolli").description == "Indications: Dizziness"
@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+
+from src.main.varma_metadata import FALLBACK_X_RANGE, FALLBACK_Y_RANGE, VarmaMetadataTable, metadata_table
+from varma_knowledge import VarmaKnowledgeStore
+
+VARMA_DATA = {
+    "Adhipathi_Varmam": ["headache", "fainting"],
+    "Utchi_Varmam": ["headache", "tinnitus"],
+    "Kondai_Kolli": [],
+}
+RECORDS = {"varmas": [
+    {"varmaName": "Utchi Varmam", "varmamType": "Padu", "surfaceAnatomy": "Vertex of the skull",
+     "indications": "Headache"},
+]}
+
+
+def write_store(tmp_path):
+    varma_path = tmp_path / "02_varma_to_symptom.json"
+    symptom_path = tmp_path / "02_symptom_to_varma.json"
+    records_path = tmp_path / "varma_data.json"
+    varma_path.write_text(json.dumps(VARMA_DATA), encoding="utf-8")
+    symptom_path.write_text(json.dumps({"headache": ["Adhipathi_Varmam", "Utchi_Varmam"]}), encoding="utf-8")
+    records_path.write_text(json.dumps(RECORDS), encoding="utf-8")
+    return VarmaKnowledgeStore(varma_path, symptom_path, records_path)
+
+
+def test_table_is_resolved_once_with_deterministic_coordinates():
+    table = VarmaMetadataTable(VARMA_DATA, "v1")
+    again = VarmaMetadataTable(VARMA_DATA, "v1")
+    adhipathi = table.get("adhipathi_varmam")
+
+    assert len(table) == 3 and "utchi_varmam" in table
+    assert (adhipathi.location, adhipathi.category) == ("Crown of the head", "Head & Neck")
+    assert adhipathi.coordinates_dict() == {"x": 100, "y": 40}
+    # Unmapped points get the same position on every build, inside the fallback box
+    kondai = table.get("kondai_kolli")
+    assert kondai.coordinates == again.get("kondai_kolli").coordinates
+    assert FALLBACK_X_RANGE[0] <= kondai.coordinates[0] <= FALLBACK_X_RANGE[1]
+    assert FALLBACK_Y_RANGE[0] <= kondai.coordinates[1] <= FALLBACK_Y_RANGE[1]
+
+
+def test_lookup_falls_back_to_the_name_then_resolves_unknown_points():
+    table = VarmaMetadataTable(VARMA_DATA)
+
+    assert table.get("vp_001", "Utchi_Varmam") is table.get("utchi_varmam")
+    unknown = table.get("vp_002", "Janu_Varmam", ["knee pain"])
+    assert unknown.location == "Knee joint" and unknown.symptom_count == 1
+    assert "vp_002" not in table
+
+
+def test_descriptions_come_from_the_knowledge_store_records(tmp_path):
+    table = VarmaMetadataTable(VARMA_DATA, store=write_store(tmp_path))
+
+    assert table.get("utchi_varmam").description == (
+        "Type: Padu Location: Vertex of the skull Indications: Headache"
+    )
+    # Points without records are described by their symptoms
+    assert "2 signs and symptoms including: headache, fainting" in table.get("adhipathi_varmam").description
+    assert "Kondai_Kolli" in table.get("kondai_kolli").description
+
+
+def test_metadata_table_is_kept_on_its_retriever():
+    retriever = SimpleNamespace(varma_data=VARMA_DATA, dataset_version="v1")
+    table = metadata_table(retriever)
+
+    assert metadata_table(retriever) is table and table.dataset_version == "v1"
+    reloaded = SimpleNamespace(varma_data=dict(VARMA_DATA, Janu_Varmam=["knee pain"]), dataset_version="v2")
+    assert "janu_varmam" in metadata_table(reloaded) and "janu_varmam" not in table
+
+
+def test_format_for_ui_reads_location_and_description_from_the_table(tmp_path):
+    from src.rag.api_routes import format_for_ui
+
+    table = VarmaMetadataTable(VARMA_DATA, "v1", store=write_store(tmp_path))
+    result = {"varma_points": [{"varma_id": "utchi_varmam", "varma_name": "Utchi_Varmam", "weighted_score": 2.0,
+                                "exact_count": 1, "all_symptoms": VARMA_DATA["Utchi_Varmam"]}]}
+
+    point = format_for_ui(result, "headache", 0.01, table)["varma_points"][0]
+
+    meta = table.get("utchi_varmam")
+    assert point["description"] == meta.description
+    assert point["location"] == meta.location and point["coordinates"] == meta.coordinates_dict()
+    assert point["match_type"] == "lexical_exact"
@@ -0,0 +1,259 @@
+"""
+Process-wide Varma knowledge store shared by the symptom retriever
+(src/main), the RAG retriever (src/rag) and the response formatters.
+
+It is loaded once per process from the three source files:
+
+    data/processed/intermediate_outputs/02_varma_to_symptom.json
+    data/processed/intermediate_outputs/02_symptom_to_varma.json
+    src/rag/data/varma_data.json
+
+Varma names and symptoms are interned to small integer ids, so spelling
+variants across the files ("Chundothari_Varmam" / "Chundothari Varmam")
+resolve to the same point. The descriptive fields of varma_data.json are
+kept column-wise, and the symptom <-> Varma mapping is kept as id
+adjacency.
+
+This module sits at the backend root and imports nothing from `src`. The
+RAG service puts src/rag on sys.path, where `src` means a different
+package, so both services can import it and both retrievers have the
+store passed in.
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+DATA_DIR = BACKEND_ROOT / "data" / "processed" / "intermediate_outputs"
+VARMA_SYMPTOMS_JSON = DATA_DIR / "02_varma_to_symptom.json"
+SYMPTOM_TO_VARMA_JSON = DATA_DIR / "02_symptom_to_varma.json"
+VARMA_RECORDS_JSON = BACKEND_ROOT / "src" / "rag" / "data" / "varma_data.json"
+
+RECORD_FIELDS = (
+    'varmamType', 'surfaceAnatomy', 'indications', 'signs', 'pathognomicSign',
+    'laterality', 'synonyms', 'tamilLiterature'
+)
+
+
+def varma_key(name: str) -> str:
+    """Spelling-insensitive key for a Varma name ('Utchi_Varmam' -> 'utchi varmam')"""
+    text = str(name).lower().replace('_', ' ')
+    text = re.sub(r'[^\w\s]', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def symptom_key(symptom: str) -> str:
+    return re.sub(r'\s+', ' ', str(symptom).lower()).strip()
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class VarmaKnowledgeStore:
+    """
+    Columnar, read-only view of the Varma knowledge.
+
+    Varma ids index `names` and `symptoms_by_varma`. Record rows come from
+    varma_data.json, which can hold more than one record per name, and index
+    the field columns; `record_varma[row]` gives the row's Varma id.
+    """
+
+    def __init__(
+        self,
+        varma_symptoms_path: Path = VARMA_SYMPTOMS_JSON,
+        symptom_to_varma_path: Path = SYMPTOM_TO_VARMA_JSON,
+        varma_records_path: Path = VARMA_RECORDS_JSON
+    ):
+        self.varma_symptoms_path = Path(varma_symptoms_path)
+        self.symptom_to_varma_path = Path(symptom_to_varma_path)
+        self.varma_records_path = Path(varma_records_path)
+
+        self.names: List[str] = []
+        self._varma_ids: Dict[str, int] = {}
+        self.symptoms: List[str] = []
+        self._symptom_ids: Dict[str, int] = {}
+
+        # Parsed 02_* mappings, shared with the symptom retriever (see shared_sources)
+        self.source_hashes = {
+            'varma_symptoms': _sha256(self.varma_symptoms_path),
+            'symptom_to_varma': _sha256(self.symptom_to_varma_path)
+        }
+        self.records_hash = _sha256(self.varma_records_path) if self.varma_records_path.exists() else None
+        with open(self.varma_symptoms_path, 'r', encoding='utf-8') as f:
+            self.varma_data = json.load(f)
+        with open(self.symptom_to_varma_path, 'r', encoding='utf-8') as f:
+            self.symptom_to_varma = json.load(f)
+        self._intern_mappings()
+
+        symptoms_by_varma: Dict[int, List[int]] = {}
+        for varma_name, symptom_list in self.varma_data.items():
+            vid = self._varma_id(varma_name)
+            symptoms_by_varma[vid] = [self._symptom_id(s) for s in symptom_list]
+
+        varmas_by_symptom: Dict[int, List[int]] = {}
+        for symptom, varma_names in self.symptom_to_varma.items():
+            if isinstance(varma_names, str):
+                varma_names = [n for n in re.split(r'[;,]', varma_names) if n.strip()]
+            varmas_by_symptom[self._symptom_id(symptom)] = [self._varma_id(n) for n in varma_names]
+
+        # Record columns from varma_data.json
+        self.record_varma: List[int] = []
+        self.record_names: List[str] = []
+        self.columns: Dict[str, List[str]] = {field: [] for field in RECORD_FIELDS}
+        self.relations: List[Dict[str, str]] = []
+        if self.varma_records_path.exists():
+            with open(self.varma_records_path, 'r', encoding='utf-8') as f:
+                records = json.load(f).get('varmas', [])
+            for record in records:
+                name = record.get('varmaName', '')
+                self.record_varma.append(self._varma_id(name))
+                self.record_names.append(name)
+                for field in RECORD_FIELDS:
+                    self.columns[field].append(record.get(field, ''))
+                self.relations.append(record.get('anatomicalRelations', {}) or {})
+
+        self.records_by_varma: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(row for row, vid in enumerate(self.record_varma) if vid == v)
+            for v in range(len(self.names))
+        )
+        self.symptoms_by_varma: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(symptoms_by_varma.get(v, ())) for v in range(len(self.names))
+        )
+        self.varmas_by_symptom: Tuple[Tuple[int, ...], ...] = tuple(
+            tuple(varmas_by_symptom.get(s, ())) for s in range(len(self.symptoms))
+        )
+
+        print(f"Knowledge store: {len(self.names)} Varma points, {len(self.record_varma)} records, "
+              f"{len(self.symptoms)} symptoms")
+
+    def _intern_mappings(self):
+        """Make both mappings share one str object per distinct symptom"""
+        for varma_name, symptom_list in self.varma_data.items():
+            if isinstance(symptom_list, list):
+                self.varma_data[varma_name] = [sys.intern(s) for s in symptom_list]
+        self.symptom_to_varma = {sys.intern(k): v for k, v in self.symptom_to_varma.items()}
+
+    def _varma_id(self, name: str) -> int:
+        key = varma_key(name)
+        vid = self._varma_ids.get(key)
+        if vid is None:
+            vid = len(self.names)
+            self._varma_ids[key] = vid
+            self.names.append(name)
+        return vid
+
+    def _symptom_id(self, symptom: str) -> int:
+        key = symptom_key(symptom)
+        sid = self._symptom_ids.get(key)
+        if sid is None:
+            sid = len(self.symptoms)
+            self._symptom_ids[key] = sid
+            self.symptoms.append(sys.intern(symptom))
+        return sid
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def is_current(self) -> bool:
+        """Whether the three source files still hold what this store was loaded from"""
+        records_hash = _sha256(self.varma_records_path) if self.varma_records_path.exists() else None
+        return records_hash == self.records_hash and self.source_hashes == {
+            'varma_symptoms': _sha256(self.varma_symptoms_path),
+            'symptom_to_varma': _sha256(self.symptom_to_varma_path)
+        }
+
+    def varma_id(self, name: str) -> Optional[int]:
+        return self._varma_ids.get(varma_key(name))
+
+    def symptoms_of(self, name: str) -> List[str]:
+        vid = self.varma_id(name)
+        return [] if vid is None else [self.symptoms[s] for s in self.symptoms_by_varma[vid]]
+
+    def varmas_for_symptom(self, symptom: str) -> List[str]:
+        sid = self._symptom_ids.get(symptom_key(symptom))
+        return [] if sid is None else [self.names[v] for v in self.varmas_by_symptom[sid]]
+
+    def rows_for(self, name: str) -> Tuple[int, ...]:
+        vid = self.varma_id(name)
+        return () if vid is None else self.records_by_varma[vid]
+
+    def record(self, row: int) -> Dict:
+        """A varma_data.json record rebuilt from the columns"""
+        record = {'varmaName': self.record_names[row]}
+        for field in RECORD_FIELDS:
+            record[field] = self.columns[field][row]
+        record['anatomicalRelations'] = self.relations[row]
+        return record
+
+    def field(self, row: int, field: str) -> str:
+        return self.columns[field][row]
+
+    def document_text(self, row: int) -> str:
+        """RAG document for a record row (same layout as ingestion.load_json)"""
+        anatomy = self.relations[row]
+        column = self.columns
+        return (
+            f"Varma Name: {self.record_names[row]}\n\n"
+            f"Signs:\n{column['signs'][row]}\n\n"
+            f"Pathognomic Sign:\n{column['pathognomicSign'][row]}\n\n"
+            f"Indications:\n{column['indications'][row]}\n\n"
+            f"Surface Anatomy:\n{column['surfaceAnatomy'][row]}\n\n"
+            f"Varmam Type:\n{column['varmamType'][row]}\n\n"
+            f"Laterality:\n{column['laterality'][row]}\n\n"
+            f"Synonyms:\n{column['synonyms'][row]}\n\n"
+            f"Tamil Literature:\n{column['tamilLiterature'][row]}\n\n"
+            f"Anatomical Relations:\n"
+            f"Muscles: {anatomy.get('muscles', '')}\n"
+            f"Arteries: {anatomy.get('arteries', '')}\n"
+            f"Veins: {anatomy.get('veins', '')}\n"
+            f"Nerves: {anatomy.get('nerves', '')}"
+        )
+
+    def document(self, row: int) -> Dict:
+        return {"id": self.record_names[row], "text": self.document_text(row)}
+
+    def shared_sources(
+        self,
+        varma_symptoms_path: Path,
+        symptom_to_varma_path: Path,
+        hashes: Dict[str, str]
+    ) -> Optional[Tuple[Dict, Dict]]:
+        """
+        The parsed 02_* mappings when a retriever asks for the same files with
+        the same content, so the process keeps a single copy; None otherwise.
+        """
+        same_files = (
+            Path(varma_symptoms_path).resolve() == self.varma_symptoms_path.resolve()
+            and Path(symptom_to_varma_path).resolve() == self.symptom_to_varma_path.resolve()
+        )
+        if same_files and hashes == self.source_hashes:
+            return self.varma_data, self.symptom_to_varma
+        return None
+
+
+_default_store: Optional[VarmaKnowledgeStore] = None
+_default_lock = threading.Lock()
+
+
+def current_store() -> VarmaKnowledgeStore:
+    """
+    The store for the default data files, loaded once per process and
+    reloaded when they have changed since. Retrievers are built with it (see
+    RetrieverRegistry), so a dataset reload brings a fresh store; readers of
+    the old one keep theirs.
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None or not _default_store.is_current():
+            _default_store = VarmaKnowledgeStore()
+        return _default_store
@@ -0,0 +1,23 @@
+"""
+WSGI entry point for the symptom-search backend.
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+With preload_app (see gunicorn.conf.py) this module is imported once in the
+gunicorn master: the retriever, PubMedBERT weights and the memory-mapped
+snapshot embeddings are loaded before the workers are forked, so every
+worker shares those pages copy-on-write instead of loading its own copy.
+"""
+
+import gc
+
+from app import app
+
+application = app
+
+# Move everything allocated during start-up into the permanent generation so
+# the cyclic GC in each worker never touches (and thereby un-shares) the
+# pages holding the master's long-lived objects.
+gc.collect()
+gc.freeze()